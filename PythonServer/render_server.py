@@ -0,0 +1,241 @@
+#!/usr/bin/env python
+# encoding: utf-8
+"""Persistent render server for the Python based diagram extensions.
+
+Starting a fresh interpreter for every fenced block (mocodo, blockdiag family,
+schemdraw, railroad) costs far more than rendering the diagram itself. This
+server keeps the libraries imported and answers one request per line:
+
+    request:  {"id": 1, "kind": "nwdiag", "source": "...", "options": {...}}
+    response: {"id": 1, "ok": true, "svg": "<svg ...>"}
+              {"id": 1, "ok": false, "error": "..."}
+
+Supported kinds: mocodo, blockdiag, nwdiag, rackdiag, packetdiag, schemdraw,
+railroad. The special kinds "ping" and "shutdown" are also accepted. The SVG
+travels in the response body: no temporary file is written.
+
+Anything printed by the libraries is redirected to stderr, so that stdout only
+carries the JSON responses.
+"""
+
+from __future__ import print_function
+
+import argparse
+import io
+import json
+import os
+import sys
+import traceback
+
+KINDS = ("mocodo", "blockdiag", "nwdiag", "rackdiag", "packetdiag", "schemdraw", "railroad")
+BLOCKDIAG_FAMILY = ("blockdiag", "nwdiag", "rackdiag", "packetdiag")
+
+
+def default_vendors_directory():
+    base = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+    return os.path.join(base, "vendors")
+
+
+def extend_sys_path(vendors):
+    schemdraw_zip = os.path.join(vendors, "schemdraw.zip")
+    candidates = [
+        os.path.join(vendors, "mocodo"),
+        os.path.join(vendors, "nwdiag"),
+        os.path.join(vendors, "railroad"),
+        schemdraw_zip if os.path.exists(schemdraw_zip) else os.path.join(vendors, "schemdraw"),
+    ]
+    for path in reversed(candidates):
+        if os.path.exists(path) and path not in sys.path:
+            sys.path.insert(0, path)
+
+
+class MocodoRenderer:
+
+    def __init__(self):
+        from mocodo.api import render, get_default_params
+        self.default_relations = get_default_params()["relations"]
+        self.render_mocodo = render
+
+    def render(self, source, options):
+        options = dict(options)
+        svg_diagram = options.pop("svg_diagram", False)
+        if svg_diagram:
+            relations = options.get("relations", self.default_relations)
+            if not isinstance(relations, (list, tuple)):
+                relations = relations.split()
+            options["relations"] = list(relations) + (["diagram"] if "diagram" not in relations else [])
+        result = self.render_mocodo(source, **options)
+        if svg_diagram:
+            result["svg_diagram"] = self.render_mocodo(result["mld"]["diagram"], **dict(options, relations=[]))["svg"]
+        return result
+
+
+class BlockdiagRenderer:
+
+    def __init__(self, name):
+        import importlib
+        from blockdiag.utils.bootstrap import Options, create_fontmap
+        self.module = importlib.import_module(name)
+        for submodule in ("builder", "drawer", "parser"):
+            importlib.import_module("%s.%s" % (name, submodule))
+        self.options = Options(self.module).parse(["-Tsvg", "-"])
+        self.fontmap = create_fontmap(self.options)
+
+    def reset(self):
+        """ Element classes store their instances in class-level namespaces:
+            forget everything so that the next diagram starts from scratch. """
+        from blockdiag import elements, plugins
+        from blockdiag.utils import images
+        module_elements = getattr(self.module, "elements", elements)
+        for class_name in ("DiagramNode", "DiagramEdge", "NodeGroup", "Diagram", "Network", "Rack", "RackItem"):
+            for module in (module_elements, elements):
+                cls = getattr(module, class_name, None)
+                if cls is not None:
+                    cls.clear()
+        images.cleanup()
+        plugins.cleanup()
+
+    def render(self, source, options):
+        ScreenNodeBuilder = self.module.builder.ScreenNodeBuilder
+        DiagramDraw = self.module.drawer.DiagramDraw
+        self.reset()
+        try:
+            tree = self.module.parser.parse_string(source)
+            try:
+                diagram = ScreenNodeBuilder.build(tree, self.options)
+            except TypeError:
+                diagram = ScreenNodeBuilder.build(tree)  # old interface
+            drawer = DiagramDraw("SVG", diagram, None, fontmap=self.fontmap, code=source,
+                                 nodoctype=options.get("nodoctype", False))
+            drawer.draw()
+            return {"svg": drawer.save()}
+        finally:
+            self.reset()
+
+
+class SchemdrawRenderer:
+
+    def __init__(self):
+        os.environ.setdefault("MPLBACKEND", "Agg")
+        import schemdraw
+        import schemdraw.elements
+        import schemdraw.dsp
+        import schemdraw.logic
+        import schemdraw.flow
+        import matplotlib
+        import matplotlib.pyplot
+        self.schemdraw = schemdraw
+        self.matplotlib = matplotlib
+        self.pyplot = matplotlib.pyplot
+        self.globals = {
+            "schemdraw": schemdraw,
+            "elm": schemdraw.elements,
+            "dsp": schemdraw.dsp,
+            "logic": schemdraw.logic,
+            "flow": schemdraw.flow,
+        }
+
+    def render(self, source, options):
+        namespace = dict(self.globals)
+        drawing = options.get("drawing", "d")
+        namespace[drawing] = self.schemdraw.Drawing(**options.get("attributes", {}))
+        try:
+            exec(compile(source, "<schemdraw>", "exec"), namespace)
+            buffer = io.StringIO()
+            with self.matplotlib.rc_context({"savefig.format": "svg"}):
+                namespace[drawing].save(buffer)  # same rendering as the d.save() of the generated scripts
+            return {"svg": buffer.getvalue()}
+        finally:
+            self.pyplot.close("all")
+
+
+class RailroadRenderer:
+
+    def __init__(self):
+        import railroad
+        self.globals = dict((k, v) for (k, v) in vars(railroad).items() if not k.startswith("_"))
+
+    def render(self, source, options):
+        diagram = eval(compile("Diagram(\n%s\n)" % source, "<railroad>", "eval"), dict(self.globals))
+        buffer = io.StringIO()
+        diagram.writeSvg(buffer.write)
+        return {"svg": buffer.getvalue()}
+
+
+class RenderServer:
+
+    def __init__(self, preload=()):
+        self.renderers = {}
+        for kind in preload:
+            try:
+                self.get_renderer(kind)
+            except Exception as err:
+                print("Unable to preload %s: %s" % (kind, err), file=sys.stderr)
+
+    def get_renderer(self, kind):
+        if kind not in self.renderers:
+            if kind == "mocodo":
+                self.renderers[kind] = MocodoRenderer()
+            elif kind in BLOCKDIAG_FAMILY:
+                self.renderers[kind] = BlockdiagRenderer(kind)
+            elif kind == "schemdraw":
+                self.renderers[kind] = SchemdrawRenderer()
+            elif kind == "railroad":
+                self.renderers[kind] = RailroadRenderer()
+            else:
+                raise ValueError("Unknown diagram kind: %r" % kind)
+        return self.renderers[kind]
+
+    def handle(self, request):
+        response = {"id": request.get("id")}
+        try:
+            renderer = self.get_renderer(request.get("kind"))
+            response.update(renderer.render(request.get("source", ""), request.get("options") or {}))
+            response["ok"] = True
+        except Exception as err:
+            response["ok"] = False
+            response["error"] = str(err) or err.__class__.__name__
+            traceback.print_exc(file=sys.stderr)
+        return response
+
+    def serve(self, stdin, stdout):
+        for line in stdin:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                request = json.loads(line)
+            except ValueError as err:
+                response = {"id": None, "ok": False, "error": "Invalid request: %s" % err}
+            else:
+                if request.get("kind") == "shutdown":
+                    self.write(stdout, {"id": request.get("id"), "ok": True})
+                    return
+                if request.get("kind") == "ping":
+                    response = {"id": request.get("id"), "ok": True}
+                else:
+                    response = self.handle(request)
+            self.write(stdout, response)
+
+    @staticmethod
+    def write(stdout, response):
+        stdout.write(json.dumps(response, ensure_ascii=False))
+        stdout.write("\n")
+        stdout.flush()
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description="Persistent SVG render server (one JSON request per line on stdin).")
+    parser.add_argument("--vendors", metavar="PATH", default=default_vendors_directory(), help="directory containing the vendored Python libraries")
+    parser.add_argument("--preload", metavar="KIND", nargs="*", default=list(KINDS), choices=KINDS, help="diagram kinds to import at startup")
+    options = parser.parse_args(args)
+    extend_sys_path(options.vendors)
+    stdin = io.TextIOWrapper(sys.stdin.buffer, encoding="utf-8")
+    stdout = io.TextIOWrapper(sys.stdout.buffer, encoding="utf-8")
+    sys.stdout = sys.stderr  # keep the protocol channel clean
+    server = RenderServer(options.preload)
+    server.serve(stdin, stdout)
+
+
+if __name__ == "__main__":
+    main()
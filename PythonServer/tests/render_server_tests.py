@@ -0,0 +1,258 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+from __future__ import print_function
+import os
+import sys
+sys.path[0:0] = [os.path.dirname(os.path.dirname(os.path.realpath(__file__)))]
+
+import io
+import json
+import subprocess
+import unittest
+
+import render_server
+from render_server import RenderServer
+
+SERVER_PATH = os.path.realpath(render_server.__file__)
+render_server.extend_sys_path(render_server.default_vendors_directory())
+
+def can_import(name):
+    try:
+        __import__(name)
+    except Exception:
+        return False
+    return True
+
+HAS_BLOCKDIAG = can_import("blockdiag.utils.bootstrap") and can_import("nwdiag")
+HAS_SCHEMDRAW = can_import("matplotlib") and can_import("schemdraw")
+
+def serve(server, *requests):
+    """ Feed the given requests (dicts, or raw strings sent as is) to the server and
+        return the list of decoded responses. """
+    lines = [r if isinstance(r, str) else json.dumps(r) for r in requests]
+    stdout = io.StringIO()
+    server.serve(io.StringIO("\n".join(lines) + "\n"), stdout)
+    output = stdout.getvalue()
+    assert output.endswith("\n")
+    return [json.loads(line) for line in output.splitlines()]
+
+
+class Framing(unittest.TestCase):
+
+    def setUp(self):
+        self.server = RenderServer()
+
+    def test_one_response_line_per_request(self):
+        responses = serve(self.server,
+            {"id": 1, "kind": "ping"},
+            {"id": "two", "kind": "ping"},
+            {"kind": "ping"},
+        )
+        self.assertEqual(responses, [
+            {"id": 1, "ok": True},
+            {"id": "two", "ok": True},
+            {"id": None, "ok": True},
+        ])
+
+    def test_blank_lines_are_ignored(self):
+        responses = serve(self.server, "", {"id": 1, "kind": "ping"}, "   ", "", {"id": 2, "kind": "ping"})
+        self.assertEqual([r["id"] for r in responses], [1, 2])
+
+    def test_invalid_json(self):
+        responses = serve(self.server, "{not json", {"id": 2, "kind": "ping"})
+        self.assertEqual(len(responses), 2)
+        self.assertEqual(responses[0]["id"], None)
+        self.assertFalse(responses[0]["ok"])
+        self.assertTrue(responses[0]["error"].startswith("Invalid request: "))
+        self.assertEqual(responses[1], {"id": 2, "ok": True})
+
+    def test_svg_with_newlines_stays_on_one_line(self):
+        responses = serve(self.server, {"id": 1, "kind": "railroad", "source": 'Terminal("é")'})
+        self.assertEqual(len(responses), 1)
+        self.assertTrue(responses[0]["ok"])
+        self.assertIn("\n", responses[0]["svg"])
+        self.assertIn(u"é", responses[0]["svg"])
+
+    def test_shutdown_stops_reading(self):
+        responses = serve(self.server,
+            {"id": 1, "kind": "ping"},
+            {"id": 2, "kind": "shutdown"},
+            {"id": 3, "kind": "ping"},
+        )
+        self.assertEqual(responses, [{"id": 1, "ok": True}, {"id": 2, "ok": True}])
+
+
+class ErrorResponses(unittest.TestCase):
+
+    def setUp(self):
+        self.server = RenderServer()
+        self.stderr = sys.stderr
+        sys.stderr = io.StringIO() # swallow the tracebacks
+
+    def tearDown(self):
+        sys.stderr = self.stderr
+
+    def test_unknown_kind(self):
+        responses = serve(self.server, {"id": 1, "kind": "graphviz", "source": "digraph {}"}, {"id": 2, "kind": "ping"})
+        self.assertEqual(responses[0], {"id": 1, "ok": False, "error": "Unknown diagram kind: 'graphviz'"})
+        self.assertEqual(responses[1], {"id": 2, "ok": True})
+        self.assertIn("Unknown diagram kind", sys.stderr.getvalue())
+
+    def test_missing_kind(self):
+        (response,) = serve(self.server, {"id": 1, "source": "A -> B"})
+        self.assertFalse(response["ok"])
+        self.assertEqual(response["error"], "Unknown diagram kind: None")
+
+    def test_bad_railroad_source(self):
+        responses = serve(self.server,
+            {"id": 1, "kind": "railroad", "source": "Terminal("},
+            {"id": 2, "kind": "railroad", "source": 'Terminal("x")'},
+        )
+        self.assertFalse(responses[0]["ok"])
+        self.assertNotIn("svg", responses[0])
+        self.assertTrue(responses[0]["error"])
+        self.assertTrue(responses[1]["ok"])
+
+    def test_bad_mocodo_source(self):
+        responses = serve(self.server,
+            {"id": 1, "kind": "mocodo", "source": "A: a\nR, 1N A, 11 UNDEFINED"},
+            {"id": 2, "kind": "mocodo", "source": "A: a\nB: b\nR, 0N A, 11 B"},
+        )
+        self.assertFalse(responses[0]["ok"])
+        self.assertIn("UNDEFINED", responses[0]["error"])
+        self.assertTrue(responses[1]["ok"])
+        self.assertIn("<svg", responses[1]["svg"])
+
+    @unittest.skipUnless(HAS_BLOCKDIAG, "blockdiag cannot be imported from the vendors directory")
+    def test_bad_blockdiag_source(self):
+        responses = serve(self.server,
+            {"id": 1, "kind": "blockdiag", "source": "blockdiag { A -> "},
+            {"id": 2, "kind": "blockdiag", "source": "blockdiag { A -> B; }"},
+        )
+        self.assertFalse(responses[0]["ok"])
+        self.assertTrue(responses[0]["error"])
+        self.assertTrue(responses[1]["ok"])
+
+
+@unittest.skipUnless(HAS_BLOCKDIAG, "blockdiag cannot be imported from the vendors directory")
+class BlockdiagIsolation(unittest.TestCase):
+
+    def setUp(self):
+        self.server = RenderServer()
+        self.stderr = sys.stderr
+        sys.stderr = io.StringIO() # swallow the tracebacks
+
+    def tearDown(self):
+        sys.stderr = self.stderr
+
+    def render(self, kind, source):
+        (response,) = serve(self.server, {"id": 1, "kind": kind, "source": source})
+        self.assertTrue(response["ok"], response.get("error"))
+        return response["svg"]
+
+    def test_nodes_do_not_leak(self):
+        self.render("blockdiag", 'blockdiag { A -> B -> C; }')
+        svg = self.render("blockdiag", 'blockdiag { X -> Y; }')
+        self.assertIn(">X<", svg)
+        for label in "ABC":
+            self.assertNotIn(">%s<" % label, svg)
+
+    def test_attributes_do_not_leak(self):
+        first = self.render("blockdiag", 'blockdiag { A [color = "#FF0000"]; A -> B; }')
+        self.assertIn("rgb(255,0,0)", first)
+        second = self.render("blockdiag", 'blockdiag { A -> B; }')
+        self.assertNotIn("rgb(255,0,0)", second)
+
+    def test_same_source_gives_same_svg(self):
+        source = 'blockdiag { A -> B; B -> C; group { A; B; } }'
+        self.assertEqual(self.render("blockdiag", source), self.render("blockdiag", source))
+
+    def test_networks_do_not_leak(self):
+        self.render("nwdiag", 'nwdiag { network lan { address = "10.0.0.x"; web; db; } }')
+        svg = self.render("nwdiag", 'nwdiag { network wan { app; } }')
+        self.assertIn(">app<", svg)
+        for label in ("lan", "web", "db", "10.0.0.x"):
+            self.assertNotIn(label, svg)
+
+    def test_classes_do_not_leak(self):
+        # the nwdiag builder does not clear the classes defined by a previous blockdiag
+        self.render("blockdiag", 'blockdiag { class emphasis [color = "#FF0000"]; A [class = emphasis]; }')
+        (response,) = serve(self.server, {"id": 1, "kind": "nwdiag", "source": 'nwdiag { network n { A [class = emphasis]; } }'})
+        self.assertFalse(response["ok"])
+        self.assertEqual(response["error"], "Unknown class: emphasis")
+
+    def test_family_members_do_not_interfere(self):
+        self.render("nwdiag", 'nwdiag { network lan { web; } }')
+        svg = self.render("blockdiag", 'blockdiag { web -> db; }')
+        self.assertIn(">db<", svg)
+        self.assertNotIn(">lan<", svg)
+
+
+@unittest.skipUnless(HAS_SCHEMDRAW, "schemdraw or matplotlib cannot be imported")
+class Schemdraw(unittest.TestCase):
+
+    def test_same_svg_as_drawing_save(self):
+        import re
+        import tempfile
+        import schemdraw
+        import schemdraw.elements as elm
+        source = "d.add(elm.Resistor(label='R1'))\nd.add(elm.Capacitor(d='down'))\n"
+        (response,) = serve(RenderServer(), {"id": 1, "kind": "schemdraw", "source": source})
+        self.assertTrue(response["ok"], response.get("error"))
+        drawing = schemdraw.Drawing()
+        exec(source, {"d": drawing, "elm": elm})
+        (handle, path) = tempfile.mkstemp(suffix=".svg")
+        os.close(handle)
+        try:
+            drawing.save(path)
+            with io.open(path, encoding="utf8") as f:
+                expected = f.read()
+        finally:
+            os.remove(path)
+        normalize = lambda svg: re.sub(r"<dc:date>.*?</dc:date>|\bp[0-9a-f]{10}\b", "", svg)
+        self.assertEqual(normalize(response["svg"]), normalize(expected))
+
+
+class Shutdown(unittest.TestCase):
+
+    def start(self):
+        return subprocess.Popen(
+            [sys.executable, SERVER_PATH, "--preload"],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+        )
+
+    def test_shutdown_request(self):
+        process = self.start()
+        requests = [{"id": 1, "kind": "ping"}, {"id": 2, "kind": "shutdown"}]
+        data = "".join(json.dumps(r) + "\n" for r in requests).encode("utf-8")
+        (stdout, stderr) = process.communicate(data, timeout=60)
+        self.assertEqual(process.returncode, 0, stderr)
+        responses = [json.loads(line) for line in stdout.decode("utf-8").splitlines()]
+        self.assertEqual(responses, [{"id": 1, "ok": True}, {"id": 2, "ok": True}])
+
+    def test_end_of_input(self):
+        process = self.start()
+        (stdout, stderr) = process.communicate(b'{"id": 1, "kind": "ping"}\n', timeout=60)
+        self.assertEqual(process.returncode, 0, stderr)
+        self.assertEqual(json.loads(stdout.decode("utf-8")), {"id": 1, "ok": True})
+
+    def test_library_output_does_not_reach_stdout(self):
+        process = self.start()
+        requests = [
+            {"id": 1, "kind": "railroad", "source": 'Terminal("x") if print("noise") is None else None'},
+            {"id": 2, "kind": "shutdown"},
+        ]
+        data = "".join(json.dumps(r) + "\n" for r in requests).encode("utf-8")
+        (stdout, stderr) = process.communicate(data, timeout=60)
+        self.assertEqual(process.returncode, 0, stderr)
+        responses = [json.loads(line) for line in stdout.decode("utf-8").splitlines()]
+        self.assertEqual([r["id"] for r in responses], [1, 2])
+        self.assertTrue(responses[0]["ok"], responses[0].get("error"))
+        self.assertIn(b"noise", stderr)
+
+
+if __name__ == '__main__':
+    unittest.main()
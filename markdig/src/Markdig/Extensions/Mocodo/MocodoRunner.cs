@@ -60,6 +60,12 @@ public class MocodoRunner
             {"image_format", "svg" }
         };
 
+        //The render server does not rearrange the layout: let mocodo.py do it
+        private readonly static string[] AttributesNotRenderedOnServer = { "arrange", "flip", "fit", "obfuscate" };
+
+        //Relational outputs, in the order of FindRelevantFiles
+        private readonly static string[] RelationOutputs = { "html", "html_verbose", "latex", "markdown", "text", "txt2tags" };
+
         public MocodoRunner(MocodoEnvironment mocodoEnvironment)
         {
             this.mocodoEnvironment = mocodoEnvironment;
@@ -119,6 +125,14 @@ public string Run(LeafBlock dataIn)
 
             var mocodoAttr = GetIdentifiedAttrs(dataIn.GetAttributes().Properties, tempMocodoFile);
 
+            //Render with the shared Python server when available, else fall back on mocodo.py
+            var serverData = RunOnServer(mocodoAttr, File.ReadAllText(tempMocodoFile));
+            if (!(serverData is null))
+            {
+                File.Delete(tempMocodoFile);
+                return serverData;
+            }
+
             //In all case, need to generate the basic files
             RunMocodoCmd(mocodoAttr.ToString());
 
@@ -301,6 +315,122 @@ private void GenerateSvgDiagram(in MocodoAttributes attr)
             RunMocodoCmd(svgDiagAttr.ToString());
         }
 
+        /// <summary>
+        /// Render the MCD with the shared Python render server. The outputs are the same as those
+        /// of the files retrieved by GetMocodoFiles after one or two calls to mocodo.py.
+        /// Return null if the server is not available or fails, so that the caller runs mocodo.py.
+        /// </summary>
+        /// <param name="attr"></param>
+        /// <param name="source"></param>
+        /// <returns></returns>
+        private string RunOnServer(MocodoAttributes attr, string source)
+        {
+            if (!RenderServerClient.IsVendored(mocodoEnvironment.MocodoPath) || AttributesNotRenderedOnServer.Any(attr.ContainsKey))
+                return null;
+
+            var client = RenderServerClient.GetOrStart(mocodoEnvironment.PythonPath);
+            if (client is null)
+                return null;
+
+            var options = GetServerOptions(attr);
+            var response = client.Render("mocodo", source, options);
+            if (!IsRendered(response))
+                return null;
+
+            List<string> contents = new List<string>();
+            if (attr.ContainsKey("relations"))
+            {
+                RenderServerResponse diagramResponse = null;
+                if (attr.RequestMldSvgDiagram)
+                {//same as GenerateSvgDiagram: render the MLD diagram without generating it again
+                    options["relations"] = ((string[])options["relations"]).Where(r => r != "diagram").ToArray();
+                    response.Mld.TryGetValue("diagram", out string diagram);
+                    diagramResponse = client.Render("mocodo", diagram ?? "", options);
+                    if (!IsRendered(diagramResponse))
+                        return null;
+                }
+
+                if (attr.RequestMcdSvg)
+                    AddServerContents(contents, attr, response, false);
+
+                if (attr.RequestMldSvgDiagram && !attr.MldNameOverridesMcdName)
+                    AddServerContents(contents, attr, diagramResponse, false); //the diagram outputs replace the MCD ones
+
+                if (attr.RequestMldSvgDiagram && attr.MldNameOverridesMcdName)
+                    AddServerContents(contents, attr, diagramResponse, true);
+            }
+
+            if (contents.Count == 0)
+                return "<p>No MCD generated.</p>";
+
+            StringBuilder sb = new StringBuilder();
+            foreach (var content in contents)
+            {
+                sb.AppendLine(content);
+            }
+            return sb.ToString();
+        }
+
+        private static bool IsRendered(RenderServerResponse response)
+        {
+            if (response is null)
+                return false;
+
+            if (!response.Ok)
+                Console.WriteLine(response.Error);
+            return response.Ok;
+        }
+
+        /// <summary>
+        /// Convert the identified attributes in options of the mocodo render function.
+        /// </summary>
+        /// <param name="attr"></param>
+        /// <returns></returns>
+        private static Dictionary<string, object> GetServerOptions(MocodoAttributes attr)
+        {
+            var options = new Dictionary<string, object>();
+            foreach (var keyValue in attr)
+            {
+                if (!allowedAttributes.TryGetValue(keyValue.Key, out var expectedValue) || keyValue.Key.Equals("encoding") || keyValue.Key.Equals("image_format"))
+                    continue; //input, or not an option of the render function
+
+                if (keyValue.Key.Equals("relations"))
+                    options[keyValue.Key] = keyValue.Value.Split(new[] { ' ' }, StringSplitOptions.RemoveEmptyEntries);
+                else if (expectedValue is string[] && ((string[])expectedValue).Contains("true"))
+                    options[keyValue.Key] = keyValue.Value.Equals("true");
+                else if (expectedValue is string && expectedValue.Equals("integer"))
+                    options[keyValue.Key] = int.Parse(keyValue.Value);
+                else if (expectedValue is string && expectedValue.Equals("float"))
+                    options[keyValue.Key] = double.Parse(keyValue.Value.Replace(',', '.'), NumberStyles.Any, CultureInfo.InvariantCulture);
+                else
+                    options[keyValue.Key] = keyValue.Value;
+            }
+            return options;
+        }
+
+        /// <summary>
+        /// Same selection as FindRelevantFiles, on the outputs of the render server.
+        /// </summary>
+        /// <param name="contents"></param>
+        /// <param name="attr"></param>
+        /// <param name="response"></param>
+        /// <param name="imageOnly"></param>
+        private static void AddServerContents(List<string> contents, MocodoAttributes attr, RenderServerResponse response, bool imageOnly)
+        {
+            if (!(response.Svg is null))
+                contents.Add(response.Svg);
+
+            if (imageOnly)
+                return;
+
+            var relations = attr["relations"].Split();
+            foreach (var relation in RelationOutputs)
+            {
+                if (relations.Contains(relation) && response.Mld.TryGetValue(relation, out string text))
+                    contents.Add(text);
+            }
+        }
+
         private void RunMocodoCmd(string args)
         {
             ProcessStartInfo start = new ProcessStartInfo();
@@ -29,6 +29,11 @@ public NwdiagRunner(NwdiagEnvironment environment)
 
         public string Run(LeafBlock dataIn)
         {
+            //Render with the shared Python server when available, else fall back on nwdiag.exe
+            var svg = RunOnServer(dataIn);
+            if (!(svg is null))
+                return svg;
+
             //We use temporary files to avoid possible read/write problems
             var tempNwdiagFile = Path.GetTempFileName();
             //generate a temp file to transfer the data
@@ -50,24 +55,52 @@ public string Run(LeafBlock dataIn)
 
         private static void WriteContentInFile(string path, LeafBlock leafBlock)
         {
-            StreamWriter tw = new StreamWriter(path, false, new UTF8Encoding());
-
-            tw.WriteLine("nwdiag{"); //add the nwdiag header
+            File.WriteAllText(path, GetSource(leafBlock), new UTF8Encoding());
+        }
 
+        private static string GetSource(LeafBlock leafBlock)
+        {
             if (leafBlock == null) ThrowHelper.ArgumentNullException_leafBlock();
 
+            StringBuilder sb = new StringBuilder();
+            sb.AppendLine("nwdiag{"); //add the nwdiag header
+
             if (leafBlock.Lines.Lines != null)
             {
                 var lines = leafBlock.Lines;
                 var slices = lines.Lines;
                 for (int i = 0; i < lines.Count; i++)
                 {
-                    tw.WriteLine(@slices[i].Slice.ToString());
+                    sb.AppendLine(@slices[i].Slice.ToString());
                 }
-                tw.WriteLine("}");
-                tw.Flush();
-                tw.Close();
             }
+            sb.AppendLine("}");
+
+            return sb.ToString();
+        }
+
+        /// <summary>
+        /// Render the diagram with the shared Python render server.
+        /// Return null if the executable is not the vendored one, or if the server is not available or fails, so that the caller runs nwdiag.exe.
+        /// </summary>
+        /// <param name="leafBlock"></param>
+        /// <returns></returns>
+        private string RunOnServer(LeafBlock leafBlock)
+        {
+            if (!RenderServerClient.IsVendored(nwdiagEnvironment.NwdiagPath))
+                return null;
+
+            var response = RenderServerClient.GetOrStart()?.Render("nwdiag", GetSource(leafBlock));
+            if (response is null)
+                return null;
+
+            if (!response.Ok || response.Svg is null)
+            {
+                Console.WriteLine(response.Error);
+                return null;
+            }
+
+            return Helpers.SvgHelper.KeepOnlySvgDefinition(response.Svg);
         }
 
         private string GetFilesContent(string filePath)
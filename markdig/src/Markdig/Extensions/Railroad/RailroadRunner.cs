@@ -30,6 +30,11 @@ public RailroadRunner(RailroadEnvironment railroadEnvironment)
 
         public string Run(LeafBlock dataIn)
         {
+            //Render with the shared Python server when available, else fall back on a generated script
+            var svg = RunOnServer(dataIn);
+            if (!(svg is null))
+                return svg;
+
             //We use temporary files to avoid possible read/write problems
 
             var tempRailroadPythonFile = Path.Combine(Path.GetTempPath(), "railroad_gen.py");
@@ -59,6 +64,42 @@ private string GetFilesContent(string svgFile)
             return File.ReadAllText(svgFile);
         }
 
+        /// <summary>
+        /// Render the diagram with the shared Python render server.
+        /// Return null if the server is not available or fails, so that the caller runs its own script.
+        /// </summary>
+        /// <param name="leafBlock"></param>
+        /// <returns></returns>
+        private string RunOnServer(LeafBlock leafBlock)
+        {
+            if (leafBlock == null) ThrowHelper.ArgumentNullException_leafBlock();
+            if (!RenderServerClient.IsVendored(this.railroadEnvironment.RailroadPath))
+                return null;
+
+            StringBuilder sb = new StringBuilder();
+            if (leafBlock.Lines.Lines != null)
+            {
+                var lines = leafBlock.Lines;
+                var slices = lines.Lines;
+                for (int i = 0; i < lines.Count; i++)
+                {
+                    sb.AppendLine(@slices[i].Slice.ToString());
+                }
+            }
+
+            var response = RenderServerClient.GetOrStart(this.railroadEnvironment.PythonPath)?.Render("railroad", sb.ToString());
+            if (response is null)
+                return null;
+
+            if (!response.Ok || response.Svg is null)
+            {
+                Console.WriteLine(response.Error);
+                return null;
+            }
+
+            return response.Svg;
+        }
+
         private void RunRailroadCmd(string pythonFile)
         {
             ProcessStartInfo start = new ProcessStartInfo();
@@ -117,10 +117,7 @@ public string Run(LeafBlock dataIn)
         {
 #nullable enable
             if (leafBlock == null) ThrowHelper.ArgumentNullException_leafBlock();
-            //retrieve the python header content
-            var pythonHeader = File.ReadAllText(this.schemdrawEnvironment.HeaderPath);
-            //replace the keyWord ${schemdraw_path_zip} by the value
-            pythonHeader = pythonHeader.Replace("${schemdraw_path_zip}", Path.GetFullPath(this.schemdrawEnvironment.SchemdrawPath).Replace(@"\", "/"));
+            var pythonHeader = GetPythonHeader();
 
             //set the writer, to record the content of the Python file
             StreamWriter tw = new StreamWriter(path, false, new UTF8Encoding());
@@ -177,6 +174,17 @@ public string Run(LeafBlock dataIn)
         }
 
 
+        /// <summary>
+        /// Retrieve the python header content.
+        /// </summary>
+        /// <returns></returns>
+        private string GetPythonHeader()
+        {
+            var pythonHeader = File.ReadAllText(this.schemdrawEnvironment.HeaderPath);
+            //replace the keyWord ${schemdraw_path_zip} by the value
+            return pythonHeader.Replace("${schemdraw_path_zip}", Path.GetFullPath(this.schemdrawEnvironment.SchemdrawPath).Replace(@"\", "/"));
+        }
+
         /// <summary>
         /// Generate the schematic from the PythonFile  and stores the result in the outFile.
         /// If error, return a HTML compatible ErrorLog.
@@ -189,8 +197,8 @@ private string GenerateSchematic(string pythonFile, string outFile, LeafBlock da
         {
             string feedBack = "";
             if (!String.IsNullOrEmpty(globalAttrs.FormatType))
-                //Generate the schematic
-                feedBack = RunSchemdrawCmd(pythonFile);
+                //Generate the schematic, with the shared Python server when available
+                feedBack = RunOnServer(pythonFile, outFile) ?? RunSchemdrawCmd(pythonFile);
             else
                 return string.Empty;
 
@@ -203,6 +211,42 @@ private string GenerateSchematic(string pythonFile, string outFile, LeafBlock da
             return string.Empty;
         }
 
+        /// <summary>
+        /// Execute the Python file with the shared Python render server, and write the SVG in the outFile.
+        /// Return null if the server is not available or fails, so that the caller runs the Python file itself.
+        /// </summary>
+        /// <param name="pythonFile"></param>
+        /// <param name="outFile"></param>
+        /// <returns></returns>
+        private string RunOnServer(string pythonFile, string outFile)
+        {
+            if (!globalAttrs.FormatType.ToLower().Equals("svg") || !RenderServerClient.IsVendored(this.schemdrawEnvironment.SchemdrawPath))
+                return null;
+
+            //Schemdraw is already imported by the server: drop the header, and let the server save the drawing
+            var script = File.ReadAllText(pythonFile);
+            var pythonHeader = GetPythonHeader();
+            if (script.StartsWith(pythonHeader))
+                script = script.Substring(pythonHeader.Length);
+            var savePos = script.LastIndexOf("d.save(");
+            if (savePos >= 0)
+                script = script.Substring(0, savePos);
+
+            var options = new Dictionary<string, object> { { "drawing", "d" } };
+            var response = RenderServerClient.GetOrStart(schemdrawEnvironment.PythonPath)?.Render("schemdraw", script, options);
+            if (response is null)
+                return null;
+
+            if (!response.Ok || response.Svg is null)
+            {
+                Console.WriteLine(response.Error);
+                return null;
+            }
+
+            File.WriteAllText(outFile, response.Svg, new UTF8Encoding());
+            return string.Empty;
+        }
+
         /// <summary>
         /// Execute Python File. Errors will be return, else return empty string.
         /// </summary>
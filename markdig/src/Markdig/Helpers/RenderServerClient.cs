@@ -0,0 +1,302 @@
+// Copyright (c) Vincent DETROYAT. All rights reserved.
+// This file is licensed under the BSD-Clause 2 license.
+// See the license.txt file in the project root for more information.
+
+using System;
+using System.Collections.Generic;
+using System.Diagnostics;
+using System.IO;
+using System.Text;
+using System.Text.Json;
+
+namespace Markdig.Helpers
+{
+    /// <summary>
+    /// Response of the Python render server to one request.
+    /// </summary>
+    public class RenderServerResponse
+    {
+        public bool Ok { get; set; }
+
+        public string Error { get; set; }
+
+        public string Svg { get; set; }
+
+        /// <summary>
+        /// Relational outputs of Mocodo, keyed by relation template name.
+        /// </summary>
+        public Dictionary<string, string> Mld { get; } = new Dictionary<string, string>();
+    }
+
+    /// <summary>
+    /// Client of PythonServer/render_server.py.
+    /// The server is started once per Python executable, on the first request, and is kept alive
+    /// until the end of the process: each diagram is then sent as one JSON line on its standard input,
+    /// and the SVG is read back as one JSON line on its standard output.
+    /// </summary>
+    public sealed class RenderServerClient : IDisposable
+    {
+        private static readonly Dictionary<string, RenderServerClient> clients = new Dictionary<string, RenderServerClient>();
+        private static string defaultPythonPath;
+        private static bool isExitHandlerSet = false;
+
+        private readonly object syncRoot = new object();
+        private Process process;
+        private StreamWriter input;
+        private StreamReader output;
+        private int lastId;
+        private bool hasFailed = false;
+
+        /// <summary>
+        /// Path to the server script, copied next to the application.
+        /// </summary>
+        public static string ServerPath => Path.Combine(AppDomain.CurrentDomain.BaseDirectory, "PythonServer", "render_server.py");
+
+        public string PythonPath { get; }
+
+        public bool IsRunning => !(process is null) && !process.HasExited;
+
+        private RenderServerClient(string pythonPath)
+        {
+            this.PythonPath = pythonPath;
+        }
+
+        /// <summary>
+        /// Retrieve the server bound to the given Python executable, and start it if needed.
+        /// If no Python executable is given, the first one found in the PATH is used.
+        /// Return null if the server can not be started: the caller then runs its own process.
+        /// </summary>
+        /// <param name="pythonPath"></param>
+        /// <returns></returns>
+        public static RenderServerClient GetOrStart(string pythonPath = null)
+        {
+            lock (clients)
+            {
+                if (string.IsNullOrEmpty(pythonPath))
+                    pythonPath = defaultPythonPath ??= FindPython();
+
+                if (string.IsNullOrEmpty(pythonPath) || !File.Exists(ServerPath))
+                    return null;
+
+                if (!clients.TryGetValue(pythonPath, out var client))
+                {
+                    client = new RenderServerClient(pythonPath);
+                    clients.Add(pythonPath, client);
+                }
+
+                if (!isExitHandlerSet)
+                {
+                    AppDomain.CurrentDomain.ProcessExit += (sender, e) => ShutdownAll();
+                    isExitHandlerSet = true;
+                }
+
+                return client.EnsureStarted() ? client : null;
+            }
+        }
+
+        /// <summary>
+        /// Stop all the servers started by this process.
+        /// </summary>
+        public static void ShutdownAll()
+        {
+            lock (clients)
+            {
+                foreach (var client in clients.Values)
+                    client.Dispose();
+                clients.Clear();
+            }
+        }
+
+        /// <summary>
+        /// Search a Python executable in the PATH environment variable.
+        /// </summary>
+        /// <returns>Path to the executable, or null if none is found.</returns>
+        public static string FindPython()
+        {
+            var paths = Environment.GetEnvironmentVariable("PATH") ?? "";
+            foreach (var pth in paths.Split(Path.PathSeparator))
+            {
+                if (string.IsNullOrWhiteSpace(pth) || pth.Contains(@"\Scripts"))
+                    continue;
+
+                foreach (var name in new[] { "python.exe", "python3", "python" })
+                {
+                    var candidate = Path.Combine(pth.Trim(), name);
+                    if (File.Exists(candidate))
+                        return candidate;
+                }
+            }
+
+            return null;
+        }
+
+        /// <summary>
+        /// The server only imports the libraries shipped in the vendors directory:
+        /// a library configured elsewhere must still be run by its own process.
+        /// </summary>
+        /// <param name="path">Path to a library, as defined in an environment.</param>
+        /// <returns></returns>
+        public static bool IsVendored(string path)
+        {
+            if (string.IsNullOrEmpty(path))
+                return false;
+
+            var vendors = Path.GetFullPath(Path.Combine(AppDomain.CurrentDomain.BaseDirectory, "vendors")) + Path.DirectorySeparatorChar;
+            return Path.GetFullPath(path).StartsWith(vendors, StringComparison.OrdinalIgnoreCase);
+        }
+
+        /// <summary>
+        /// Send one diagram to the server and wait for its response.
+        /// Return null if the server is not available anymore.
+        /// </summary>
+        /// <param name="kind">mocodo, blockdiag, nwdiag, rackdiag, packetdiag, schemdraw or railroad.</param>
+        /// <param name="source">Diagram definition.</param>
+        /// <param name="options">Options specific to the kind of diagram.</param>
+        /// <returns></returns>
+        public RenderServerResponse Render(string kind, string source, IDictionary<string, object> options = null)
+        {
+            lock (syncRoot)
+            {
+                if (!EnsureStarted())
+                    return null;
+
+                var request = new Dictionary<string, object>
+                {
+                    { "id", ++lastId },
+                    { "kind", kind },
+                    { "source", source },
+                    { "options", options ?? new Dictionary<string, object>() }
+                };
+
+                string line;
+                try
+                {
+                    input.WriteLine(JsonSerializer.Serialize(request));
+                    input.Flush();
+                    line = output.ReadLine();
+                }
+                catch (IOException)
+                {
+                    line = null;
+                }
+
+                if (line is null)
+                {//the server died: do not restart it, the runners use their own process from now on
+                    Stop();
+                    hasFailed = true;
+                    return null;
+                }
+
+                return ParseResponse(line);
+            }
+        }
+
+        private static RenderServerResponse ParseResponse(string line)
+        {
+            using var document = JsonDocument.Parse(line);
+            var root = document.RootElement;
+            var response = new RenderServerResponse();
+
+            if (root.TryGetProperty("ok", out var ok))
+                response.Ok = ok.ValueKind == JsonValueKind.True;
+            if (root.TryGetProperty("error", out var error) && error.ValueKind == JsonValueKind.String)
+                response.Error = error.GetString();
+            if (root.TryGetProperty("svg", out var svg) && svg.ValueKind == JsonValueKind.String)
+                response.Svg = svg.GetString();
+            if (root.TryGetProperty("mld", out var mld) && mld.ValueKind == JsonValueKind.Object)
+            {
+                foreach (var relation in mld.EnumerateObject())
+                {
+                    if (relation.Value.ValueKind == JsonValueKind.String)
+                        response.Mld[relation.Name] = relation.Value.GetString();
+                }
+            }
+
+            return response;
+        }
+
+        private bool EnsureStarted()
+        {
+            lock (syncRoot)
+            {
+                if (IsRunning)
+                    return true;
+
+                Stop();
+                if (hasFailed)
+                    return false;
+
+                ProcessStartInfo start = new ProcessStartInfo();
+                start.FileName = PythonPath;
+                start.Arguments = $"\"{ServerPath}\" --preload"; //import the libraries on their first use only
+                start.UseShellExecute = false;
+                start.CreateNoWindow = true;
+                start.RedirectStandardInput = true;
+                start.RedirectStandardOutput = true;
+                start.RedirectStandardError = true;
+                start.StandardOutputEncoding = new UTF8Encoding(false);
+                start.StandardErrorEncoding = new UTF8Encoding(false);
+
+                try
+                {
+                    process = Process.Start(start);
+                }
+                catch (Exception e) when (e is System.ComponentModel.Win32Exception || e is InvalidOperationException)
+                {
+                    Console.WriteLine($"Unable to start the render server: {e.Message}");
+                    process = null;
+                    hasFailed = true;
+                    return false;
+                }
+
+                //the libraries may be verbose: do not let stderr fill its pipe
+                process.ErrorDataReceived += (sender, e) =>
+                {
+                    if (!(e.Data is null))
+                        Console.Error.WriteLine(e.Data);
+                };
+                process.BeginErrorReadLine();
+
+                input = new StreamWriter(process.StandardInput.BaseStream, new UTF8Encoding(false));
+                output = process.StandardOutput;
+                return true;
+            }
+        }
+
+        private void Stop()
+        {
+            if (process is null)
+                return;
+
+            try
+            {
+                if (!process.HasExited)
+                {
+                    input.WriteLine("{\"kind\": \"shutdown\"}");
+                    input.Flush();
+                    if (!process.WaitForExit(5000))
+                        process.Kill();
+                }
+            }
+            catch (Exception e) when (e is IOException || e is InvalidOperationException)
+            {
+                //already gone
+            }
+            finally
+            {
+                process.Dispose();
+                process = null;
+                input = null;
+                output = null;
+            }
+        }
+
+        public void Dispose()
+        {
+            lock (syncRoot)
+            {
+                Stop();
+            }
+        }
+    }
+}
@@ -0,0 +1,8 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+def render(source_text, **options):
+    """ Render a conceptual diagram and its relational schemas as strings.
+        See mocodo.api.render for the details. """
+    from .api import render
+    return render(source_text, **options)
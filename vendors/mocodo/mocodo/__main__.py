@@ -10,16 +10,17 @@ if sys.version < "2.7":
 
 import os
 from .common import Common, safe_print_for_PHP
-from .file_helpers import write_contents
+from .file_helpers import read_contents, write_contents
 from .argument_parser import parsed_arguments
-from .mcd import Mcd
-from .relations import Relations
 from .font_metrics import font_metrics_factory
 from .mocodo_error import MocodoError
 
 def main():
     try:
         params = parsed_arguments()
+        if params["batch"]:
+            from .batch import run_batch
+            return run_batch(params)
         common = Common(params)
         clauses = common.load_input_file()
         get_font_metrics = font_metrics_factory(params)
@@ -37,6 +38,15 @@ def main():
         if params["obfuscate"]:
             from .obfuscate import obfuscate
             return safe_print_for_PHP(obfuscate(clauses, params))
+        render_cache = None
+        if params["render_cache"] and params["image_format"] == "svg" and not (params["extract"] or params["guess_title"] or params["fit"] is not None or params["flip"] or params["arrange"]):
+            from .render_cache import RenderCache
+            render_cache = RenderCache(params["render_cache"], params["render_cache_size"] * 1024 * 1024)
+            render_cache_key = render_cache.get_key(common, clauses)
+            entry = render_cache_key and render_cache.load(render_cache_key)
+            if entry:
+                return common.dump_cached_files(entry)
+        from .mcd import Mcd
         mcd = Mcd(clauses, params, get_font_metrics)
         if params["fit"] is not None:
             return safe_print_for_PHP(mcd.get_reformatted_clauses(params["fit"]))
@@ -55,14 +65,25 @@ def main():
                 from .arrange_bb import arrange
             elif params["arrange"] == "lp":
                 from .arrange_lp import arrange
-            result = arrange(**params)
+            if params["layout_cache"]:
+                from .layout_cache import LayoutCache
+                result = LayoutCache(params["layout_cache"]).arrange(mcd, params, arrange)
+            else:
+                result = arrange(**params)
             if result:
                 mcd.set_layout(**result)
                 return safe_print_for_PHP(mcd.get_clauses())
             raise MocodoError(9, _('Failed to calculate a planar layout.'))
+        from .relations import Relations
         relations = Relations(mcd, params)
-        common.dump_mld_files(relations)
+        mld = common.dump_mld_files(relations)
         if params["image_format"] == "svg":
+            if not params["extract"]:
+                from .mcd_to_svg import dump_svg_file
+                dump_svg_file(mcd, common)
+                if render_cache and render_cache_key:
+                    render_cache.save(render_cache_key, read_contents(u"%(output_name)s.svg" % params), mld)
+                return
             from .mcd_to_svg import main
             import runpy
             main(mcd, common)
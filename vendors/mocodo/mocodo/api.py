@@ -0,0 +1,73 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+from __future__ import division
+
+import os
+import random
+from .argument_parser import parsed_arguments, has_expired
+from .common import Common
+from .font_metrics import font_metrics_factory
+from .mocodo_error import MocodoError
+
+cache = {}
+
+def get_default_params():
+    """ Default values of the command line options, computed once. No input
+        file nor parameter file is read. """
+    if "params" not in cache:
+        script_directory = os.path.dirname(os.path.realpath(__file__))
+        cache["params"] = parsed_arguments(["--input", os.path.join(script_directory, "pristine_sandbox.mcd"), "--params_path", ""])
+    return cache["params"]
+
+def get_font_metrics(params):
+    key = ("font_metrics", bool(params["tkinter"]))
+    if key not in cache:
+        cache[key] = font_metrics_factory(params)
+    return cache[key]
+
+def render(source_text, **options):
+    """ Render the given clauses without touching the disk (except for the optional
+        `render_cache` directory). Return a dictionary with the SVG of the conceptual
+        diagram ("svg", None if `no_mcd` is set) and the relational schemas ("mld"),
+        keyed by relation template name. """
+    params = dict(get_default_params())
+    params["added_keys"] = list(params["added_keys"])
+    params.update(options)
+    if not isinstance(params["relations"], (list, tuple)):
+        params["relations"] = params["relations"].split()
+    params["has_expired"] = has_expired(params["timeout"])
+    if params["seed"] is not None:
+        random.seed(params["seed"])
+    common = Common(params)
+    clauses = source_text.replace('"', '').splitlines()
+    templates = []
+    for name in params["relations"]:
+        try:
+            templates.append(common.load_relation_template(name))
+        except (IOError, ValueError):
+            raise MocodoError(23, _('Problem with template {template}.').format(template=name + ".json"))
+    render_cache = None
+    if params["render_cache"] and not params["guess_title"]:
+        from .render_cache import RenderCache
+        render_cache = RenderCache(params["render_cache"], params["render_cache_size"] * 1024 * 1024)
+        render_cache_key = render_cache.get_key(common, clauses, not params["no_mcd"])
+        entry = render_cache.load(render_cache_key)
+        if entry:
+            return {"svg": entry["svg"], "mld": dict(zip(params["relations"], entry["mld"]))}
+    from .mcd import Mcd
+    from .relations import Relations
+    mcd = Mcd(clauses, params, get_font_metrics(params))
+    relations = Relations(mcd, params)
+    texts = [text for (template, text) in relations.get_texts(templates)]
+    if params["no_mcd"]:
+        svg = None
+    else:
+        from . import mcd_to_svg
+        svg = mcd_to_svg.render(mcd, common)
+    if render_cache:
+        render_cache.save(render_cache_key, svg, texts)
+    return {
+        "svg": svg,
+        "mld": dict(zip(params["relations"], texts)),
+    }
@@ -83,9 +83,11 @@ def has_expired(timeout):
         timeout += time()
         def inner_function():
             return time() > timeout
+        inner_function.deadline = timeout # for the processes of arrange_bb, which cannot call it
     else:
         def inner_function():
             return False
+        inner_function.deadline = None
     return inner_function
 
 def rate(string):
@@ -132,7 +134,7 @@ def positive_integer(string):
         raise argparse.ArgumentTypeError(msg)
     return value
 
-def parsed_arguments():
+def parsed_arguments(args=None):
     
     def add_key(key, value):
         params[key] = value
@@ -178,7 +180,7 @@ def parsed_arguments():
     mocodo_group.add_argument("--language", metavar="CODE", type=str, help="override the automatic localization of the messages with the given language code (e.g., 'fr', 'en', ...)")
     io_group.add_argument("--params_path", metavar="PATH", default="params.json", help="the path of the parameter file. If omitted, use 'params.json' in the input directory. If non existent, use default parameters.")
     io_group.add_argument("--input", metavar="PATH", help="the path of the input file. By default, the output files will be generated in the same directory")
-    (args, remaining_args) = parser.parse_known_args()
+    (args, remaining_args) = parser.parse_known_args(args)
     
     text_type = (unicode if sys.version_info.major == 2 else str)
     
@@ -208,22 +210,28 @@ def parsed_arguments():
     aspect_group.add_argument("--colors", metavar="PATH", default="bw", help="the color palette to use when generating the drawing. Name (without extension) of a file located in the directory 'colors', or path to a personal file")
     aspect_group.add_argument("--shapes", metavar="PATH", help="specification of the fonts, dimensions, etc. Name (without extension) of a file located in the directory 'shapes', or path to a personal file")
     aspect_group.add_argument("--scale", metavar="RATE", type=scale, default=1, help="scale the diagram by the given factor")
+    aspect_group.add_argument("--layout_engine", choices=["sweep", "naive"], default="sweep", help="algorithm compressing the boxes vertically: 'naive' compares each box with the whole previous row (same result, kept for regression testing)")
     aspect_group.add_argument("--hide_annotations", action="store_true", help="ignore the hovering of annotated elements")
     
     relational_group.add_argument("--relations", metavar="NAME", nargs="*", default=["html", "text"], help="one or several templates for the generated relational schemas. Cf. directory 'relation_templates'")
     relational_group.add_argument("--disambiguation", choices=["numbers_only", "annotations"], default="annotations", help="specify the way to disambiguate foreign attributes")
-    relational_group.add_argument("--title", metavar="STR", default=_(u'Untitled').encode("utf8"), type=str, help="database name (used for SQL output)")
+    relational_group.add_argument("--title", metavar="STR", default=_(u'Untitled').encode("utf8") if sys.version_info.major == 2 else _(u'Untitled'), type=str, help="database name (used for SQL output)")
     relational_group.add_argument("--guess_title", action="store_true", help="use the name of the most referred entity as title")
 
     io_group.add_argument("--output_dir", metavar="PATH", help="the directory of the output files")
     io_group.add_argument("--encodings", metavar="STR", nargs="*", help="one or several encodings to be tried successively when reading the input file")
-    io_group.add_argument("--extract", action="store_true", help="create a separated JSON file for the geometric parameters")
+    io_group.add_argument("--extract", action="store_true", help="instead of drawing the SVG directly, generate an editable Python script, with a separated JSON file for the geometric parameters")
     io_group.add_argument("--image_format", choices=["svg", "nodebox"], help="override the automatic selection (depending on your installation) of the image format produced by the generated script")
+    io_group.add_argument("--batch", metavar="PATH", nargs="?", const="-", help="render the records {id, source, params} of the given manifest (by default, the standard input, one JSON object per line), and write the SVG and the relational schemas of each one as a line of JSON on the standard output")
+    io_group.add_argument("--render_cache", metavar="PATH", nargs="?", const="render_cache", help="store the SVG and the relational schemas in the given directory, and reuse them when neither the source text nor the options have changed")
+    io_group.add_argument("--render_cache_size", metavar="NAT*", type=positive_integer, default=64, help="maximal size (in MB) of the render cache, beyond which the least recently used outputs are evicted")
     io_group.add_argument("--print_params", action="store_true", help="display the contents of the parameter file, then exit")
     
     source_group.add_argument("--arrange", nargs="?", const="bb", choices=["bb", "ga", "lp"], help="rearrange the layout with either a Branch & Bound, a Genetic Algorithm, or a Linear Program solver, then exit")
+    source_group.add_argument("--layout_cache", metavar="PATH", nargs="?", const="layout_cache", help="store the rearranged layouts in the given directory, and reuse them for a diagram of the same topology")
     source_group.add_argument("--timeout", metavar="SECONDS", type=int, help="limit the duration of the layout rearrangement")
     source_group.add_argument("--verbose", action="store_true", help="display some gory details during the layout rearrangement")
+    source_group.add_argument("--workers", metavar="NAT*", type=positive_integer, default=1, help="number of processes used by the layout rearrangement (bb or ga), or by --batch")
     source_group.add_argument("--fit", metavar="INT", type=int, const=0, nargs="?", help="fit the layout in the nth smallest grid")
     source_group.add_argument("--flip", choices=["h", "v", "d"], help="display an horizontal / vertical / diagonal flip of the input file, then exit")
     source_group.add_argument("--obfuscate", metavar="PATH", type=os.path.abspath, nargs="?", const="lorem_ipsum.txt", help="display an obfuscated version of the input file, then exit. Cf. directory 'lorem'")
@@ -242,8 +250,10 @@ def parsed_arguments():
     ga_group.add_argument("--sample_size", metavar="NAT*", type=positive_integer, default=7, help="the sample size in tournaments")
     ga_group.add_argument("--max_generations", metavar="NAT*", type=positive_integer, default=300, help="maximal number of generations")
     ga_group.add_argument("--plateau", metavar="NAT*", type=positive_integer, default=30, help="maximal number of consecutive generations without improvement")
+    ga_group.add_argument("--islands", metavar="NAT*", type=positive_integer, default=1, help="number of sub-populations evolving independently")
+    ga_group.add_argument("--migration_interval", metavar="NAT*", type=positive_integer, default=10, help="number of generations between two migrations of the best individuals across islands")
     
-    lp_group.add_argument("--engine", nargs="?", const="cplex", choices=["cplex", "gurobi"], help="solver for the linear program")
+    lp_group.add_argument("--engine", nargs="?", const="cplex", choices=["cplex", "gurobi", "highs"], help="solver for the linear program (by default, HiGHS through SciPy)")
     
     nb_group.add_argument("--mld", action="store_true", help="display the HTML relational model in the cell output")
     nb_group.add_argument("--no_mcd", action="store_true", help="do not display the conceptual diagram in the cell output")
@@ -4,21 +4,108 @@
 from __future__ import division
 
 from itertools import product, count
-from random import random, shuffle, randrange, choice
-from .cross import cross, memoize
+import random
+from time import time
+from .cross import cross
+from .memo import memoize
 from math import hypot, sqrt
 from .mocodo_error import MocodoError
 
-def arrange(col_count, row_count, successors, multiplicity, organic, min_objective, max_objective, call_limit, verbose, has_expired, **kwargs):
+searchers = {} # search function of the current process, cf. init_searcher()
+
+
+class Expired(Exception):
+    """ Raised when the layout calculation time is exceeded during a search. """
+
+
+class Hull:
+    """ The free cells adjacent to the placed boxes, maintained incrementally as the boxes are placed
+        and removed. With no grid dimensions, the grid is unbounded (organic layout). """
     
-    @memoize
-    def bounded_neighborhood(x1, y1):
-        result = set()
-        for x2 in range(max(0, x1 - radius), min(col_count, x1 + radius + 1)):
-            for y2 in range(max(0, y1 - radius + abs(x1 - x2)), min(row_count, y1 + radius - abs(x1 - x2) + 1)):
-                if x1 != x2 or y1 != y2:
-                    result.add((x2, y2))
-        return result
+    def __init__(self, col_count=None, row_count=None):
+        self.col_count = col_count
+        self.row_count = row_count
+        self.adjacent_count = {} # number of placed neighbors of each cell
+        self.occupied = set()
+        self.size = 0
+    
+    def neighbors(self, x, y):
+        result = [(x - 1, y), (x + 1, y), (x, y - 1), (x, y + 1)]
+        if self.col_count is None:
+            return result
+        return [(x, y) for (x, y) in result if 0 <= x < self.col_count and 0 <= y < self.row_count]
+    
+    def place(self, x, y):
+        if self.adjacent_count.get((x, y)):
+            self.size -= 1
+        self.occupied.add((x, y))
+        for cell in self.neighbors(x, y):
+            self.adjacent_count[cell] = self.adjacent_count.get(cell, 0) + 1
+            if self.adjacent_count[cell] == 1 and cell not in self.occupied:
+                self.size += 1
+    
+    def remove(self, x, y):
+        self.occupied.remove((x, y))
+        for cell in self.neighbors(x, y):
+            self.adjacent_count[cell] -= 1
+            if self.adjacent_count[cell] == 0 and cell not in self.occupied:
+                self.size -= 1
+        if self.adjacent_count.get((x, y)):
+            self.size += 1
+
+
+class Bitboards:
+    """ Precomputed masks of a bounded grid, whose cell (x, y) is numbered x + y * col_count. The
+        segments joining two cells at a distance not exceeding the radius are numbered too, and the
+        segments crossing a given one form a mask, computed on demand. """
+    
+    def __init__(self, col_count, row_count, radius, distances):
+        cell_count = col_count * row_count
+        self.coords = [(cell % col_count, cell // col_count) for cell in range(cell_count)]
+        self.all_cells = (1 << cell_count) - 1
+        self.neighborhoods = [0] * cell_count
+        self.adjacent_cells = [0] * cell_count
+        self.links = [{} for _ in range(cell_count)] # cell_2 -> (segment id, distance) of cell_1
+        self.segments = []
+        self.crossing_masks = {}
+        for (cell_1, (x1, y1)) in enumerate(self.coords):
+            for x2 in range(max(0, x1 - radius), min(col_count, x1 + radius + 1)):
+                for y2 in range(max(0, y1 - radius + abs(x1 - x2)), min(row_count, y1 + radius - abs(x1 - x2) + 1)):
+                    cell_2 = x2 + y2 * col_count
+                    if cell_2 == cell_1:
+                        continue
+                    self.neighborhoods[cell_1] |= 1 << cell_2
+                    if abs(x1 - x2) + abs(y1 - y2) == 1:
+                        self.adjacent_cells[cell_1] |= 1 << cell_2
+                    if cell_2 < cell_1:
+                        self.links[cell_1][cell_2] = self.links[cell_2][cell_1] = (len(self.segments), distances[abs(x1 - x2)][abs(y1 - y2)])
+                        self.segments.append((x1, y1, x2, y2))
+    
+    def get_crossing_mask(self, segment_id):
+        if segment_id not in self.crossing_masks:
+            (x1, y1, x2, y2) = self.segments[segment_id]
+            (min_x, max_x, min_y, max_y) = (min(x1, x2), max(x1, x2), min(y1, y2), max(y1, y2))
+            mask = 0
+            for (other_id, (x3, y3, x4, y4)) in enumerate(self.segments):
+                if max(x3, x4) < min_x or min(x3, x4) > max_x or max(y3, y4) < min_y or min(y3, y4) > max_y:
+                    continue
+                if cross(x1, y1, x2, y2, x3, y3, x4, y4):
+                    mask |= 1 << other_id
+            self.crossing_masks[segment_id] = mask
+        return self.crossing_masks[segment_id]
+
+
+try:
+    popcount = int.bit_count # Python 3.10+
+except AttributeError:
+    def popcount(mask):
+        return bin(mask).count("1")
+
+
+def branch_and_bound(col_count, row_count, successors, multiplicity, organic, call_limit, has_expired):
+    """ Return (by closure) a function searching, from a given first box, a layout whose cumulated
+        distances do not exceed a given objective. All random choices are made through the generator
+        passed as third argument. """
     
     @memoize
     def organic_neighborhood(x1, y1):
@@ -29,155 +116,283 @@ def arrange(col_count, row_count, successors, multiplicity, organic, min_objecti
                     result.add((x2, y2))
         return result
     
-    @memoize
-    def bounded_hull(coords):
-        result = set()
-        for (x, y) in coords:
-            if x - 1 >= 0:
-                result.add((x - 1, y))
-            if x + 1 < col_count:
-                result.add((x + 1, y))
-            if y - 1 >= 0:
-                result.add((x, y - 1))
-            if y + 1 < row_count:
-                result.add((x, y + 1))
-        return result.difference(coords)
-    
-    @memoize
-    def organic_hull(coords):
-        result = set()
-        for (x, y) in coords:
-            result.add((x - 1, y))
-            result.add((x + 1, y))
-            result.add((x, y - 1))
-            result.add((x, y + 1))
-        return result.difference(coords)
-    
-    def recurs(box_coords, next_boxes, already_placed_segments, cumulated_distances):
-        if cumulated_distances > objective:
-            # print "cut"
-            return None
-        if len(next_boxes) == 0:
-            return {
-                "coords": box_coords,
-                "crossings": 0,
-                "distances": cumulated_distances,
-            }
-        outside_hull_count = len(next_boxes) - len(hull(frozenset(box_coords.values())))
-        if outside_hull_count * outside_hull_minimal_distance + cumulated_distances > objective:
-            # print "Lower bound cut"
-            return None
-        if has_expired():
-            raise MocodoError(10, _('Layout calculation time exceeded.'))
-        if next(iteration) > call_limit:
-            # print "call limit exceeded"
-            return None
-        box_to_place = next_boxes[0]
-        already_placed_successors = {box_coords[box]: box for box in successors[box_to_place] if box in box_coords}
-        if already_placed_successors:
-            already_placed_successor_coords = iter(already_placed_successors)
-            (x1, y1) = next(already_placed_successor_coords)
-            possible_coords = neighborhood(x1, y1).copy()
-            # print already_placed_successors[0], possible_coords
-            for (x1, y1) in already_placed_successor_coords:
-                possible_coords.intersection_update(neighborhood(x1, y1))
-                if not possible_coords:
-                    # print "neighborhood intersection is empty"
-                    return None
-        else:
-            # print "the box to place has no successors: all empty coords are possible"
-            possible_coords = set(product(range(col_count), range(row_count)))
-        possible_coords.difference_update(box_coords.values())
-        if not possible_coords:
-            # print "neighborhood intersection is not free"
-            return None
-        non_crossing_possible_coords = []
-        for (x1, y1) in possible_coords:
-            for ((x2, y2), (x3, y3, x4, y4)) in product(already_placed_successors, already_placed_segments):
-                if cross(x1, y1, x2, y2, x3, y3, x4, y4):
-                    break
+    def search(objective, first_box, rng):
+        
+        def recurs(box_coords, next_boxes, already_placed_segments, cumulated_distances):
+            if cumulated_distances > objective:
+                # print "cut"
+                return None
+            if len(next_boxes) == 0:
+                return {
+                    "coords": box_coords,
+                    "crossings": 0,
+                    "distances": cumulated_distances,
+                }
+            outside_hull_count = len(next_boxes) - hull.size
+            if outside_hull_count * outside_hull_minimal_distance + cumulated_distances > objective:
+                # print "Lower bound cut"
+                return None
+            if has_expired():
+                raise Expired
+            if next(iteration) > call_limit:
+                # print "call limit exceeded"
+                return None
+            box_to_place = next_boxes[0]
+            already_placed_successors = {box_coords[box]: box for box in successors[box_to_place] if box in box_coords}
+            if already_placed_successors:
+                already_placed_successor_coords = iter(already_placed_successors)
+                (x1, y1) = next(already_placed_successor_coords)
+                possible_coords = neighborhood(x1, y1).copy()
+                # print already_placed_successors[0], possible_coords
+                for (x1, y1) in already_placed_successor_coords:
+                    possible_coords.intersection_update(neighborhood(x1, y1))
+                    if not possible_coords:
+                        # print "neighborhood intersection is empty"
+                        return None
             else:
-                non_crossing_possible_coords.append((x1, y1))
-        if not non_crossing_possible_coords:
-            # print "all possible coords result in a crossing with existing segment"
-            return None
-        weighted_possible_coords = []
-        for (x1, y1) in non_crossing_possible_coords:
-            cumulated_distance = 0
-            for ((x2, y2), placed_box) in already_placed_successors.items():
-                cumulated_distance += distances[abs(x1-x2)][abs(y1-y2)] * multiplicity[(box_to_place, placed_box)]
-            weighted_possible_coords.append((cumulated_distance, random(), x1, y1))
-        weighted_possible_coords.sort()
-        for (cumulated_distance, _, x1, y1) in weighted_possible_coords:
-            box_coords[box_to_place] = (x1, y1)
-            new_segments = [(x1, y1, x2, y2) for (x2, y2) in already_placed_successors]
-            new_next_boxes = list(successors[box_to_place].difference(box_coords).difference(next_boxes))
-            if len(next_boxes) == 1 and len(new_next_boxes) == 0 and len(box_coords) != box_count:
-                # print "the placed boxes have no more non placed successors"
-                new_next_boxes = list(set(range(box_count)).difference(box_coords))
-                if new_next_boxes:
-                    new_next_boxes = [choice(new_next_boxes)]
-            shuffle(new_next_boxes)
+                # print "the box to place has no successors: all empty coords are possible"
+                possible_coords = set(product(range(col_count), range(row_count)))
+            possible_coords.difference_update(box_coords.values())
+            if not possible_coords:
+                # print "neighborhood intersection is not free"
+                return None
+            non_crossing_possible_coords = []
+            for (x1, y1) in possible_coords:
+                for ((x2, y2), (x3, y3, x4, y4)) in product(already_placed_successors, already_placed_segments):
+                    if cross(x1, y1, x2, y2, x3, y3, x4, y4):
+                        break
+                else:
+                    non_crossing_possible_coords.append((x1, y1))
+            if not non_crossing_possible_coords:
+                # print "all possible coords result in a crossing with existing segment"
+                return None
+            weighted_possible_coords = []
+            for (x1, y1) in non_crossing_possible_coords:
+                cumulated_distance = 0
+                for ((x2, y2), placed_box) in already_placed_successors.items():
+                    cumulated_distance += distances[abs(x1-x2)][abs(y1-y2)] * multiplicity[(box_to_place, placed_box)]
+                weighted_possible_coords.append((cumulated_distance, rng.random(), x1, y1))
+            weighted_possible_coords.sort()
+            for (cumulated_distance, _, x1, y1) in weighted_possible_coords:
+                box_coords[box_to_place] = (x1, y1)
+                hull.place(x1, y1)
+                new_segments = [(x1, y1, x2, y2) for (x2, y2) in already_placed_successors]
+                new_next_boxes = list(successors[box_to_place].difference(box_coords).difference(next_boxes))
+                if len(next_boxes) == 1 and len(new_next_boxes) == 0 and len(box_coords) != box_count:
+                    # print "the placed boxes have no more non placed successors"
+                    new_next_boxes = list(set(range(box_count)).difference(box_coords))
+                    if new_next_boxes:
+                        new_next_boxes = [rng.choice(new_next_boxes)]
+                rng.shuffle(new_next_boxes)
+                result = recurs(
+                    box_coords,
+                    next_boxes[1:] + new_next_boxes,
+                    already_placed_segments + new_segments,
+                    cumulated_distances + cumulated_distance
+                )
+                if result:
+                    return result
+                del box_coords[box_to_place]
+                hull.remove(x1, y1)
+        
+        def recurs_on_bitboards(box_cells, next_boxes, occupied, adjacent, forbidden, cumulated_distances):
+            """ Same search on a bounded grid, with the occupied cells, the cells adjacent to them and
+                the segments crossing the already placed ones represented as bit masks. """
+            if cumulated_distances > objective:
+                return None
+            if len(next_boxes) == 0:
+                return {
+                    "coords": dict((box, grid.coords[cell]) for (box, cell) in box_cells.items()),
+                    "crossings": 0,
+                    "distances": cumulated_distances,
+                }
+            outside_hull_count = len(next_boxes) - popcount(adjacent & ~occupied)
+            if outside_hull_count * outside_hull_minimal_distance + cumulated_distances > objective:
+                return None
+            if has_expired():
+                raise Expired
+            if next(iteration) > call_limit:
+                return None
+            box_to_place = next_boxes[0]
+            already_placed_successors = [(box_cells[box], box) for box in successors[box_to_place] if box in box_cells]
+            possible_cells = all_cells & ~occupied
+            for (cell, _) in already_placed_successors:
+                possible_cells &= neighborhoods[cell]
+            weighted_possible_cells = []
+            while possible_cells:
+                bit = possible_cells & -possible_cells
+                possible_cells ^= bit
+                cell_1 = bit.bit_length() - 1
+                links = cell_links[cell_1]
+                cumulated_distance = 0
+                for (cell_2, placed_box) in already_placed_successors:
+                    (segment_id, distance) = links[cell_2]
+                    if forbidden >> segment_id & 1:
+                        break
+                    cumulated_distance += distance * multiplicity[(box_to_place, placed_box)]
+                else:
+                    weighted_possible_cells.append((cumulated_distance, rng.random(), cell_1))
+            weighted_possible_cells.sort()
+            for (cumulated_distance, _, cell_1) in weighted_possible_cells:
+                box_cells[box_to_place] = cell_1
+                links = cell_links[cell_1]
+                new_forbidden = forbidden
+                for (cell_2, _) in already_placed_successors:
+                    new_forbidden |= get_crossing_mask(links[cell_2][0])
+                new_next_boxes = list(successors[box_to_place].difference(box_cells).difference(next_boxes))
+                if len(next_boxes) == 1 and len(new_next_boxes) == 0 and len(box_cells) != box_count:
+                    new_next_boxes = list(set(range(box_count)).difference(box_cells))
+                    if new_next_boxes:
+                        new_next_boxes = [rng.choice(new_next_boxes)]
+                rng.shuffle(new_next_boxes)
+                result = recurs_on_bitboards(
+                    box_cells,
+                    next_boxes[1:] + new_next_boxes,
+                    occupied | 1 << cell_1,
+                    adjacent | adjacent_cells[cell_1],
+                    new_forbidden,
+                    cumulated_distances + cumulated_distance
+                )
+                if result:
+                    return result
+                del box_cells[box_to_place]
+        
+        iteration = count()
+        if organic:
+            hull = Hull()
+            hull.place(0, 0)
             result = recurs(
-                box_coords,
-                next_boxes[1:] + new_next_boxes,
-                already_placed_segments + new_segments,
-                cumulated_distances + cumulated_distance
+                {first_box: (0, 0)},
+                list(successors[first_box]),
+                [],
+                0
+            )
+        else:
+            result = recurs_on_bitboards(
+                {first_box: 0},
+                list(successors[first_box]),
+                1,
+                grid.adjacent_cells[0],
+                0,
+                0
             )
-            if result:
-                return result
-            del box_coords[box_to_place]
+        if result:
+            coords = result["coords"]
+            (layout_col_count, layout_row_count) = (col_count, row_count)
+            if organic:
+                min_x = min(x for (x, y) in coords.values())
+                max_x = max(x for (x, y) in coords.values())
+                min_y = min(y for (x, y) in coords.values())
+                max_y = max(y for (x, y) in coords.values())
+                for (box_index, (x, y)) in coords.items():
+                    coords[box_index] = (x - min_x, y - min_y)
+                result["row_count"] = layout_row_count = max_y - min_y + 1
+                result["col_count"] = layout_col_count = max_x - min_x + 1
+            result["layout"] = [None] * layout_row_count * layout_col_count
+            for (box_index, (x, y)) in coords.items():
+                result["layout"][x + y * layout_col_count] = box_index
+        return result
     
     box_count = col_count * row_count
-    neighborhood = organic_neighborhood if organic else bounded_neighborhood
-    hull = organic_hull if organic else bounded_hull
-    neighborhood_cache = {}
+    neighborhood = organic_neighborhood
     radius = 3
     distances = [[hypot(i, j) - 1 for j in range(radius + 1)] for i in range(radius + 1)]
     outside_hull_minimal_distance = distances[1][2]
+    if not organic:
+        grid = Bitboards(col_count, row_count, radius, distances)
+        (all_cells, neighborhoods, adjacent_cells, cell_links, get_crossing_mask) = (grid.all_cells, grid.neighborhoods, grid.adjacent_cells, grid.links, grid.get_crossing_mask)
+    return search
+
+
+def init_searcher(settings, deadline):
+    """ Build the search function of a worker of the pool. The deadline replaces `has_expired`, which
+        cannot be sent to another process. """
+    searchers["search"] = branch_and_bound(has_expired=lambda: deadline is not None and time() > deadline, **settings)
+
+
+def search_in_worker(task):
+    """ Run a search with its own random generator. Return a pair (expired, result). """
+    (objective, first_box, seed) = task
+    try:
+        return (False, searchers["search"](objective, first_box, random.Random(seed)))
+    except Expired:
+        return (True, None)
+
+
+def arrange(col_count, row_count, successors, multiplicity, organic, min_objective, max_objective, call_limit, verbose, has_expired, workers=1, timeout=None, **kwargs):
+    
+    def sequential_search():
+        """ Try the objectives in increasing order and, for each of them, the starting boxes one by one. """
+        search = branch_and_bound(has_expired=has_expired, **settings)
+        for objective in range(min_objective, max_objective + 1):
+            if verbose:
+                print("Objective %s." % objective)
+            boxes = list(range(box_count))
+            random.shuffle(boxes)
+            for first_box in boxes:
+                if successors[first_box]:
+                    if verbose:
+                        print("  Starting from box %s." % first_box)
+                    result = search(objective, first_box, random)
+                    if result:
+                        return result
+                    if organic:
+                        break
+    
+    def portfolio_search():
+        """ Distribute the (objective, first box, seed) combinations over a pool of processes. The results
+            are consumed in the order of the sequential search, and the first layout found stops the
+            remaining workers: the result only depends on the seed, not on the speed of the workers. """
+        tasks = []
+        for objective in range(min_objective, max_objective + 1):
+            boxes = list(range(box_count))
+            random.shuffle(boxes)
+            boxes = [box for box in boxes if successors[box]]
+            for first_box in boxes[:1] if organic else boxes: # organic: only the first linked box, as in sequential_search()
+                tasks.append((objective, first_box, random.getrandbits(64)))
+        deadline = getattr(has_expired, "deadline", None) # the time budget started with the command
+        if deadline is None and timeout:
+            deadline = time() + timeout
+        from multiprocessing import Pool
+        pool = Pool(workers, init_searcher, (settings, deadline))
+        try:
+            for ((objective, first_box, _), (expired, result)) in zip(tasks, pool.imap(search_in_worker, tasks)):
+                if verbose:
+                    print("Objective %s, starting from box %s: %s." % (objective, first_box, "success" if result else "failure"))
+                if expired:
+                    raise Expired
+                if result:
+                    return result
+        finally:
+            pool.terminate()
+            pool.join()
+    
+    box_count = col_count * row_count
     if all(not successor for successor in successors):
         # print "no link: return a random layout"
         layout = list(range(box_count))
-        shuffle(layout)
+        random.shuffle(layout)
         return {
             "layout": layout,
             "crossings": 0,
             "distances": 0,
         }
-    for objective in range(min_objective, max_objective + 1):
+    settings = {
+        "col_count": col_count,
+        "row_count": row_count,
+        "successors": successors,
+        "multiplicity": multiplicity,
+        "organic": organic,
+        "call_limit": call_limit,
+    }
+    try:
+        return portfolio_search() if workers > 1 else sequential_search()
+    except Expired:
+        raise MocodoError(10, _('Layout calculation time exceeded.'))
+    finally:
         if verbose:
-            print("Objective %s." % objective)
-        boxes = list(range(box_count))
-        shuffle(boxes)
-        for first_box in boxes:
-            iteration = count()
-            if successors[first_box]:
-                if verbose:
-                    print("  Starting from box %s." % first_box)
-                result = recurs(
-                    {first_box: (0, 0)},
-                    list(successors[first_box]),
-                    [],
-                    0
-                )
-                if result:
-                    coords = result["coords"]
-                    if organic:
-                        min_x = min(x for (x, y) in coords.values())
-                        max_x = max(x for (x, y) in coords.values())
-                        min_y = min(y for (x, y) in coords.values())
-                        max_y = max(y for (x, y) in coords.values())
-                        for (box_index, (x, y)) in coords.items():
-                            coords[box_index] = (x - min_x, y - min_y)
-                        result["row_count"] = row_count = max_y - min_y + 1
-                        result["col_count"] = col_count = max_x - min_x + 1
-                    result["layout"] = [None] * row_count * col_count
-                    for (box_index, (x, y)) in coords.items():
-                        result["layout"][x + y * col_count] = box_index
-                    return result
-                if organic:
-                    break
-        objective += 1
+            print("Memoized crossings: %s." % (cross.cache_info(),))
+        cross.cache_clear()
 
     
 if __name__ == "__main__":
@@ -3,22 +3,31 @@
 
 from __future__ import division
 
-from .fitness import fitness
-from random import randrange, choice, random, sample
+from .fitness import incremental_fitness
+from .cross import cross
+import random
 from collections import namedtuple
+from operator import itemgetter
+from time import time
 
+Individual = namedtuple("Individual", ["score", "state", "chromosome"])
+by_score_and_chromosome = itemgetter(0, 2)
+operators = {} # genetic operators of the current process, cf. init_operators()
 
-def arrange(links, successors, multiplicity, col_count, row_count, verbose, has_expired,
-            population_size, max_generations, plateau, crossover_rate, mutation_rate, sample_size,
-            **kwargs):
+
+def genetic_operators(links, successors, multiplicity, col_count, row_count,
+                      crossover_rate, mutation_rate, sample_size):
+    """ Return (by closure) the functions creating and evolving a population. All random choices are
+        made through the generator passed as first argument, so that several populations can evolve
+        independently and reproducibly, in the current process or in another one. """
     
-    def make_individual():
+    def make_individual(rng):
         """ Construct a chromosome. Select a random node for the first gene. The next ones are chosen
             sequentially. When a gene has another gene to the west, the corresponding node is preferably
             selected among the successors of the latter. NB: Applying the same technic for the north and
             nortwest directions produces better individual, but worse final results. """
         pool = list(range(box_count))
-        chromosome = [pool.pop(randrange(box_count))]
+        chromosome = [pool.pop(rng.randrange(box_count))]
         (x, y) = (0, 0)
         for i in range(1, box_count):
             x += 1
@@ -28,61 +37,192 @@ def arrange(links, successors, multiplicity, col_count, row_count, verbose, has_
                 candidates = set()
             else:
                 candidates = successors[chromosome[i-1]].intersection(pool)
-            chromosome.append(pool.pop(pool.index(choice(tuple(candidates))) if candidates else randrange(len(pool))))
-        return Individual(evaluate(chromosome), chromosome)
+            chromosome.append(pool.pop(pool.index(rng.choice(tuple(candidates))) if candidates else rng.randrange(len(pool))))
+        return Individual(*evaluate(chromosome), chromosome=chromosome)
 
-    def crossover(chromosome_1, chromosome_2):
+    def crossover(rng, individual_1, individual_2):
         """ Produce two children for a given pair of individuals. A random rectangular zone is first selected.
             The corresponding genes in the first individual are copied in the first child. The remaining places
             are filled with the genes of the second individual taken one by one. Symmetrical operations for the
             second child. """
-        (x1, y1) = (randrange(col_count), randrange(row_count))
-        (x2, y2) = (randrange(x1+1, col_count+1), randrange(y1+1, row_count+1))
+        (x1, y1) = (rng.randrange(col_count), rng.randrange(row_count))
+        (x2, y2) = (rng.randrange(x1+1, col_count+1), rng.randrange(y1+1, row_count+1))
         def mate(chromosome_1, chromosome_2):
             used = set(chromosome_1[x+y*col_count] for x in range(x1, x2) for y in range(y1, y2))
             not_used = (allele for allele in chromosome_2 if allele not in used)
             return [chromosome_1[x+y*col_count] if x1 <= x < x2 and y1 <= y < y2 else next(not_used) for y in range(row_count) for x in range(col_count)]
-        return (mate(chromosome_1, chromosome_2), mate(chromosome_2, chromosome_1))
+        (chromosome_1, chromosome_2) = (individual_1.chromosome, individual_2.chromosome)
+        parent_states = (individual_1.state, individual_2.state)
+        return ((mate(chromosome_1, chromosome_2), parent_states), (mate(chromosome_2, chromosome_1), parent_states))
 
-    def next_population():
+    def next_population(rng, population, evaluate_all=None):
         """ Evolve the population. The best individual is kept. The others are selected by tournament.
             Some selected pairs produce two children. Each selected individual may mutate at certain
-            places. Mutation of a gene simply consists in swapping it with another one. """
-        result = [best]
-        while len(result) < population_size:
-            chromosomes = crossover(tournament(), tournament()) if random() < crossover_rate else [tournament()]
-            for chromosome in chromosomes:
+            places. Mutation of a gene simply consists in swapping it with another one. Each child is
+            evaluated incrementally from the state of the parent it is the closest to, unless a function
+            scoring a whole list of chromosomes is provided. """
+        children = []
+        while len(children) < len(population) - 1:
+            if rng.random() < crossover_rate:
+                offspring = crossover(rng, tournament(rng, population), tournament(rng, population))
+            else:
+                parent = tournament(rng, population)
+                offspring = [(parent.chromosome[:], (parent.state,))]
+            for (chromosome, _) in offspring:
                 for i in range(box_count):
-                    if random() < mutation_rate:
-                        j = randrange(box_count)
+                    if rng.random() < mutation_rate:
+                        j = rng.randrange(box_count)
                         (chromosome[i], chromosome[j]) = (chromosome[j], chromosome[i])
-                result.append(Individual(evaluate(chromosome), chromosome))
-        return result[:population_size]
+            children.extend(offspring)
+        children = children[:len(population) - 1]
+        if evaluate_all:
+            scores = evaluate_all([chromosome for (chromosome, _) in children])
+            children = [Individual(*score, chromosome=chromosome) for (score, (chromosome, _)) in zip(scores, children)]
+        else:
+            children = [Individual(*evaluate_child(chromosome, *parent_states), chromosome=chromosome) for (chromosome, parent_states) in children]
+        return sorted([population[0]] + children, key=by_score_and_chromosome)
 
-    def tournament():
-        """ Return a COPY of the best chromosome selected among a random sample. """
-        return min(sample(population, sample_size)).chromosome[:]
+    def tournament(rng, population):
+        """ Return the best individual selected among a random sample. """
+        return min(rng.sample(population, sample_size), key=by_score_and_chromosome)
     
-    evaluate = fitness(links, multiplicity, col_count, row_count)
-    Individual = namedtuple("Individual", ["score", "chromosome"])
+    (evaluate, evaluate_child) = incremental_fitness(links, multiplicity, col_count, row_count)
     box_count = col_count * row_count
-    patience = plateau
-    previous_best_score = None
-    population = sorted([make_individual() for _ in range(population_size)])
-    best = population[0]
-    for generation in range(max_generations):
-        if best.score == previous_best_score:
-            patience -= 1
-        else:
-            if verbose:
-                print("% 3d: %s" % (generation, best.score))
-            previous_best_score = best.score
-            patience = plateau
-        if best.score == (0, 0) or patience == 0 or has_expired():
+    return {
+        "evaluate": evaluate,
+        "make_individual": make_individual,
+        "next_population": next_population,
+    }
+
+
+def init_operators(settings):
+    """ Build the genetic operators of the current process (the main one or a worker of the pool). """
+    operators.clear()
+    operators.update(genetic_operators(**settings))
+
+
+def evaluate_chromosome(chromosome):
+    return operators["evaluate"](chromosome)
+
+
+def evolve_island(task):
+    """ Create an island if needed, and evolve it during a given number of generations. Return its
+        population and the state of its random generator. """
+    (population, size, rng_state, generation_count) = task
+    rng = random.Random()
+    rng.setstate(rng_state)
+    if population is None:
+        population = sorted([operators["make_individual"](rng) for _ in range(size)], key=by_score_and_chromosome)
+    for _ in range(generation_count):
+        if population[0].score == (0, 0):
             break
-        population = sorted(next_population())
+        population = operators["next_population"](rng, population)
+    return (population, rng.getstate())
+
+
+def arrange(links, successors, multiplicity, col_count, row_count, verbose, has_expired,
+            population_size, max_generations, plateau, crossover_rate, mutation_rate, sample_size,
+            workers=1, islands=1, migration_interval=10, initial_layouts=(), **kwargs):
+    
+    def evolve_population():
+        """ Evolve a single population. When several workers are available, the offspring of each
+            generation is scored by the pool. """
+        if pool:
+            chunk_size = max(1, population_size // (4 * workers))
+            evaluate_all = lambda chromosomes: pool.map(evaluate_chromosome, chromosomes, chunk_size)
+        else:
+            evaluate_all = None
+        patience = plateau
+        previous_best_score = None
+        population = with_initial_layouts(sorted([operators["make_individual"](random) for _ in range(population_size)], key=by_score_and_chromosome))
         best = population[0]
-        generation += 1
+        generation = 0
+        for generation in range(max_generations):
+            if best.score == previous_best_score:
+                patience -= 1
+            else:
+                if verbose:
+                    print("% 3d: %s" % (generation, best.score))
+                previous_best_score = best.score
+                patience = plateau
+            if best.score == (0, 0) or patience == 0 or has_expired():
+                break
+            population = operators["next_population"](random, population, evaluate_all)
+            best = population[0]
+            generation += 1
+        return (best, generation)
+    
+    def evolve_islands():
+        """ Split the population into islands evolving independently, in parallel when several workers
+            are available. Every `migration_interval` generations, the best individual of each island
+            replaces the worst one of the next island. Each island has its own random generator, seeded
+            from the global one: the result depends on the seed, but not on the number of workers. """
+        island_size = population_size // island_count
+        tasks = [(None, island_size, random.Random(random.getrandbits(64)).getstate(), 0) for _ in range(island_count)]
+        patience = plateau
+        previous_best_score = None
+        (generation, epoch) = (0, 0)
+        while True:
+            results = list(pool.map(evolve_island, tasks) if pool else map(evolve_island, tasks))
+            generation += epoch
+            populations = [population for (population, _) in results]
+            if not epoch:
+                populations[0] = with_initial_layouts(populations[0])
+            best = min([population[0] for population in populations], key=by_score_and_chromosome)
+            if best.score == previous_best_score:
+                patience -= epoch
+            else:
+                if verbose:
+                    print("% 3d: %s" % (generation, best.score))
+                previous_best_score = best.score
+                patience = plateau
+            if best.score == (0, 0) or patience <= 0 or generation == max_generations or has_expired():
+                break
+            migrants = [population[0] for population in populations]
+            for (population, migrant) in zip(populations, migrants[-1:] + migrants[:-1]):
+                population[-1] = migrant
+                population.sort(key=by_score_and_chromosome)
+            epoch = min(migration_interval, max_generations - generation)
+            tasks = [(population, island_size, rng_state, epoch) for (population, (_, rng_state)) in zip(populations, results)]
+        return (best, generation)
+    
+    def with_initial_layouts(population):
+        """ Replace the worst individuals of a population by the given initial layouts (warm start). """
+        if not initial_layouts:
+            return population
+        initial_individuals = [Individual(*operators["evaluate"](list(layout)), chromosome=list(layout)) for layout in initial_layouts]
+        return sorted(population[:len(population) - len(initial_individuals)] + initial_individuals, key=by_score_and_chromosome)
+    
+    settings = {
+        "links": links,
+        "successors": successors,
+        "multiplicity": multiplicity,
+        "col_count": col_count,
+        "row_count": row_count,
+        "crossover_rate": crossover_rate,
+        "mutation_rate": mutation_rate,
+        "sample_size": sample_size,
+    }
+    init_operators(settings)
+    island_count = max(1, min(islands, population_size // sample_size))
+    pool = None
+    if workers > 1:
+        from multiprocessing import Pool
+        pool = Pool(workers, init_operators, (settings,))
+    starting_time = time()
+    try:
+        (best, generation) = evolve_islands() if island_count > 1 else evolve_population()
+    finally:
+        if pool:
+            pool.terminate()
+            pool.join()
+        if verbose:
+            print("Memoized crossings: %s." % (cross.cache_info(),))
+        cross.cache_clear()
+        operators.clear() # release the crossings memoized by the fitness function
+    if verbose:
+        duration = time() - starting_time
+        print("%d generations in %.2f s (%.1f generations/s)" % (generation, duration, generation / duration if duration else 0))
     return {
         "distances": best.score[1],
         "crossings": best.score[0],
@@ -1,8 +1,10 @@
 #!/usr/bin/env python
 # encoding: utf-8
 
-from .cross import cross
+from .cross import crossing_pairs
+from .mocodo_error import MocodoError
 from math import hypot
+from time import time
 import os
 import itertools
 
@@ -11,7 +13,7 @@ MAX_LENGTH = 2
 def dump_lp(path, col_count, row_count, links, successors, multiplicity, **kwargs):
     
     def push(constraint):
-        result.append("c%s: %s" % (counter.next(), constraint))
+        result.append("c%s: %s" % (next(counter), constraint))
     
     summation = " + ".join
     result = []
@@ -32,11 +34,7 @@ def dump_lp(path, col_count, row_count, links, successors, multiplicity, **kwarg
     # pprint(S)
 
     # print "Crossing segments"
-    S2X = []
-    for (((i1, j1), (i2, j2)), ((i3, j3), (i4, j4))) in itertools.combinations(S, 2):
-        if cross(i1, j1, i2, j2, i3, j3, i4, j4):
-            S2X.append((((i1, j1), (i2, j2)), ((i3, j3), (i4, j4))))
-    S2X = set(S2X)
+    S2X = set((S[k1], S[k2]) for (k1, k2) in crossing_pairs([(i1, j1, i2, j2) for ((i1, j1), (i2, j2)) in S]))
     # pprint(S2X)
     
     lengths = [str(hypot(abs(i1-i2), abs(j1-j2)) - 1) for ((i1, j1), (i2, j2)) in S]
@@ -104,18 +102,144 @@ def dump_lp(path, col_count, row_count, links, successors, multiplicity, **kwarg
     with open("%s.lp" % path, "w") as f:
         f.write("\n".join(result))
 
+def build_model(col_count, row_count, links, successors, decomposed=None, **kwargs):
+    """ In-process counterpart of dump_lp(): the same variables (with the same names) and constraints,
+        stored in a sparse matrix. On large grids, the constraints forbidding two adjacent vertices to
+        be placed too far away (one per edge and per non admissible pair of positions) outnumber the
+        admissible segments. The linear program is then decomposed as in arrange_lp_large: each edge
+        is assigned to exactly one admissible segment, whose extremities must hold its two vertices.
+        The choice can be forced with the argument `decomposed`. """
+    
+    def add_variable(name, cost=0):
+        names.append(name)
+        costs.append(cost)
+        return len(names) - 1
+    
+    def push(coefficients, lower, upper):
+        for (column, coefficient) in coefficients:
+            rows.append(len(lower_bounds))
+            columns.append(column)
+            values.append(coefficient)
+        lower_bounds.append(lower)
+        upper_bounds.append(upper)
+    
+    (names, costs, rows, columns, values, lower_bounds, upper_bounds) = ([], [], [], [], [], [], [])
+    V = range(len(successors))
+    E = list(links)
+    P = list(itertools.product(range(col_count), range(row_count)))
+    S = [((i1, j1), (i2, j2)) for ((i1, j1), (i2, j2)) in itertools.combinations(P, 2) if hypot(abs(i1-i2), abs(j1-j2))-1 <= MAX_LENGTH]
+    if decomposed is None:
+        decomposed = 2 * len(S) < len(P) * (len(P) - 1) // 2
+    x = dict(((v, p), add_variable("x_{v}_{p[0]}_{p[1]}".format(v=v, p=p))) for v in V for p in P)
+    y = dict((s, add_variable("y_{s[0][0]}_{s[0][1]}_{s[1][0]}_{s[1][1]}".format(s=s), hypot(abs(s[0][0]-s[1][0]), abs(s[0][1]-s[1][1])) - 1)) for s in S)
+    
+    # each vertex is placed at exactly one position
+    for v in V:
+        push([(x[v, p], 1) for p in P], 1, 1)
+    
+    # at most one vertex per position
+    for p in P:
+        push([(x[v, p], 1) for v in V], 0, 1)
+    
+    if decomposed:
+        e = dict(((edge, s), add_variable("e_{v1}_{v2}_{s[0][0]}_{s[0][1]}_{s[1][0]}_{s[1][1]}".format(v1=edge[0], v2=edge[1], s=s))) for edge in E for s in S)
+        
+        # each edge is assigned to exactly one segment
+        for edge in E:
+            push([(e[edge, s], 1) for s in S], 1, 1)
+        
+        # a segment is active if and only if it is assigned an edge
+        for s in S:
+            push([(e[edge, s], 1) for edge in E] + [(y[s], -1)], 0, 0)
+        
+        # the vertices of an edge are placed on the extremities of its segment
+        for (v1, v2) in E:
+            for (p1, p2) in S:
+                for v in (v1, v2):
+                    push([(e[(v1, v2), (p1, p2)], 1), (x[v, p1], -1), (x[v, p2], -1)], None, 0)
+    else:
+        # as much active segments around a point as successors of the vertex placed on this point
+        segments_around = dict((p, [s for s in S if p in s]) for p in P)
+        for p in P:
+            for v in V:
+                push([(y[s], 1) for s in segments_around[p]] + [(x[v, p], -len(successors[v]))], 0, None)
+        
+        # if two adjacent vertices are placed, then the corresponding segment is active
+        for (v1, v2) in E:
+            for (p1, p2) in S:
+                push([(x[v1, p1], 1), (x[v2, p2], 1), (x[v2, p1], 1), (x[v1, p2], 1), (y[p1, p2], -1)], None, 1)
+        
+        # two adjacent vertices cannot be placed on points too far away
+        for (v1, v2) in E:
+            for (p1, p2) in set(itertools.combinations(P, 2)).difference(S):
+                push([(x[v1, p1], 1), (x[v2, p2], 1), (x[v2, p1], 1), (x[v1, p2], 1)], None, 1)
+        
+        # as much active segments as edges
+        push([(y[s], 1) for s in S], len(E), len(E))
+    
+    # the active segments do not cross each other
+    for (k1, k2) in crossing_pairs([(i1, j1, i2, j2) for ((i1, j1), (i2, j2)) in S]):
+        push([(y[S[k1]], 1), (y[S[k2]], 1)], None, 1)
+    
+    # symmetry static cuts
+    for v in (1, 2):
+        if v < len(V):
+            push([(x[0, (i, j)], i + j * col_count) for (i, j) in P] + [(x[v, (i, j)], -(i + j * col_count)) for (i, j) in P], None, 0)
+    
+    return {
+        "names": names,
+        "costs": costs,
+        "rows": rows,
+        "columns": columns,
+        "values": values,
+        "lower_bounds": lower_bounds,
+        "upper_bounds": upper_bounds,
+        "decomposed": decomposed,
+    }
+
+def solve_with_highs(model, timeout=None, verbose=False):
+    """ Solve the model with the MILP solver HiGHS, shipped with SciPy. """
+    import numpy
+    from scipy.optimize import milp, Bounds, LinearConstraint
+    from scipy.sparse import csr_matrix
+    matrix = csr_matrix((model["values"], (model["rows"], model["columns"])), shape=(len(model["lower_bounds"]), len(model["names"])))
+    lower_bounds = numpy.array([-numpy.inf if bound is None else bound for bound in model["lower_bounds"]], dtype=float)
+    upper_bounds = numpy.array([numpy.inf if bound is None else bound for bound in model["upper_bounds"]], dtype=float)
+    options = {"disp": verbose}
+    if timeout:
+        options["time_limit"] = timeout
+    starting_time = time()
+    solution = milp(
+        numpy.array(model["costs"], dtype=float),
+        integrality=numpy.ones(len(model["names"])),
+        bounds=Bounds(0, 1),
+        constraints=LinearConstraint(matrix, lower_bounds, upper_bounds),
+        options=options,
+    )
+    if solution.x is not None:
+        return {
+            "distances": solution.fun,
+            "names": model["names"],
+            "assigned": [int(round(value)) for value in solution.x],
+            "time": time() - starting_time,
+            "gap": getattr(solution, "mip_gap", None),
+        }
+
 def solve_with_cplex(path):
     import cplex
     problem = cplex.Cplex()
     problem.parameters.read.datacheck.set(0)
     problem.set_results_stream("%s_cplex.log" % path)
     problem.read(("%s.lp" % path).encode("utf8")) # unicode conversion required by CPLEX (undocumented)
+    starting_time = time()
     problem.solve()
     if problem.solution.get_status() != 103: # No solution exists
         return {
             "distances": problem.solution.get_objective_value(),
             "names": problem.variables.get_names(),
             "assigned": problem.solution.get_values(),
+            "time": time() - starting_time,
+            "gap": problem.solution.MIP.get_mip_relative_gap(),
         }
 
 def solve_with_gurobi(path):
@@ -128,23 +252,37 @@ def solve_with_gurobi(path):
             "distances": problem.objVal,
             "names": [var.varName for var in problem.getVars()],
             "assigned": [var.X for var in problem.getVars()],
+            "time": problem.Runtime,
+            "gap": problem.MIPGap,
         }
 
 
 def arrange(**params):
-    (folder, filename) = os.path.split(params["output_name"])
-    folder = os.path.join(folder, "cache")
-    if not os.path.isdir(folder):
-        os.mkdir(folder)
-    path = os.path.join(folder, filename)
-    dump_lp(path, **params)
-    solution = None
-    if params["engine"] == "cplex":
-        solution = solve_with_cplex(path)
-    elif params["engine"] == "gurobi":
-        solution = solve_with_gurobi(path)
+    if params["engine"] in (None, "highs"):
+        try:
+            from scipy.optimize import milp # SciPy 1.9 or later
+        except ImportError:
+            raise MocodoError(24, _('The default solver HiGHS requires SciPy 1.9 or later. Install it, or use "--engine cplex" or "--engine gurobi".'))
+        model = build_model(**params)
+        if params["verbose"]:
+            print("%s variables, %s constraints%s." % (len(model["names"]), len(model["lower_bounds"]), " (decomposed)" if model["decomposed"] else ""))
+        solution = solve_with_highs(model, params["timeout"], params["verbose"])
+    else:
+        (folder, filename) = os.path.split(params["output_name"])
+        folder = os.path.join(folder, "cache")
+        if not os.path.isdir(folder):
+            os.mkdir(folder)
+        path = os.path.join(folder, filename)
+        dump_lp(path, **params)
+        solution = None
+        if params["engine"] == "cplex":
+            solution = solve_with_cplex(path)
+        elif params["engine"] == "gurobi":
+            solution = solve_with_gurobi(path)
     if not solution:
         return
+    if params["verbose"]:
+        print("Solved in %.2f s (gap: %s)." % (solution["time"], solution["gap"]))
     result = {}
     result["crossings"] = 0
     result["distances"] = solution["distances"]
@@ -11,7 +11,7 @@ MAX_LENGTH = 2
 def arrange(col_count, row_count, links, multiplicity, **kwargs):
     
     def push(constraint):
-        result.append("c%s: %s" % (counter.next(), constraint))
+        result.append("c%s: %s" % (next(counter), constraint))
     
     summation = " + ".join
     result = ["enter %s" % filename]
@@ -34,7 +34,7 @@ def arrange(col_count, row_count, links, multiplicity, **kwargs):
     print("Crossing segments")
     S2X = []
     for (((i1, j1), (i2, j2)), ((i3, j3), (i4, j4))) in itertools.combinations(S, 2):
-        if cross((i1, j1, i2, j2, i3, j3, i4, j4)):
+        if cross(i1, j1, i2, j2, i3, j3, i4, j4):
             S2X.append((((i1, j1), (i2, j2)), ((i3, j3), (i4, j4))))
     S2X = set(S2X)
     # pprint(S2X)
@@ -59,7 +59,7 @@ def arrange(col_count, row_count, links, multiplicity, **kwargs):
     lengths = ["" if s == "1.0" else (s[:-2] + "" if s.endswith(".0") else s + "") for s in lengths]
     
     result.append("Minimize")
-    result.append(" obj: " + summation("{length}x_{s[0][0]}_{s[0][1]}_{s[1][0]}_{s[1][1]}".format(length=length, s=s) for (length, s) in itertools.izip(lengths, S) if length != "0"))
+    result.append(" obj: " + summation("{length}x_{s[0][0]}_{s[0][1]}_{s[1][0]}_{s[1][1]}".format(length=length, s=s) for (length, s) in zip(lengths, S) if length != "0"))
     result.append("Subject To")
     
     result.append(u"\\ Each edge is assigned to exactly one segment")
@@ -0,0 +1,92 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+from __future__ import division
+
+import io
+import sys
+import json
+from .api import render
+from .mocodo_error import MocodoError
+
+base_params = {}
+
+def init_worker(params):
+    base_params.clear()
+    base_params.update(params)
+
+def render_record(record):
+    """ Render a record {id, source, params}. Return a response {id, ok, svg, mld}, or {id, ok, errno,
+        error} on failure. """
+    if isinstance(record, ValueError):
+        return {"id": None, "ok": False, "errno": None, "error": "Invalid record: %s" % record}
+    if not isinstance(record, dict):
+        return {"id": None, "ok": False, "errno": None, "error": "Invalid record: %s" % json.dumps(record)}
+    response = {"id": record.get("id")}
+    try:
+        options = dict(base_params)
+        options.update(record.get("params") or {})
+        response.update(render(record.get("source", u""), **options))
+        response["ok"] = True
+    except MocodoError as err:
+        response.update(ok=False, errno=err.errno, error=str(err))
+    except Exception as err:
+        response.update(ok=False, errno=None, error=str(err) or err.__class__.__name__)
+    return response
+
+def read_records(stream):
+    """ Yield the records of a manifest, either a JSON list or one JSON object per line. """
+    first_line = None
+    for line in stream:
+        if line.strip():
+            first_line = line
+            break
+    if first_line is None:
+        return
+    if first_line.lstrip().startswith("["):
+        for record in json.loads(first_line + stream.read()):
+            yield record
+        return
+    yield parse_line(first_line)
+    for line in stream:
+        if line.strip():
+            yield parse_line(line)
+
+def parse_line(line):
+    try:
+        return json.loads(line)
+    except ValueError as err:
+        return err
+
+def run_batch(params, stdin=None, stdout=None):
+    """ Render all the records of the manifest params["batch"] ("-" for the standard input), and write
+        one JSON response per line, in the same order. The styles, fonts and relation templates are
+        loaded once for all. With several workers, the records are distributed over a pool of
+        processes. """
+    stdout = stdout or sys.stdout
+    options = dict((k, v) for (k, v) in params.items() if k not in params["added_keys"] and k != "batch")
+    if params["batch"] != "-":
+        stdin = io.open(params["batch"], encoding="utf8")
+    elif stdin is None:
+        stdin = sys.stdin
+    try:
+        records = read_records(stdin)
+        if params["workers"] > 1:
+            import multiprocessing
+            options["workers"] = 1
+            pool = multiprocessing.Pool(params["workers"], init_worker, (options,))
+            responses = pool.imap(render_record, records)
+        else:
+            pool = None
+            init_worker(options)
+            responses = (render_record(record) for record in records)
+        try:
+            for response in responses:
+                stdout.write(json.dumps(response) + "\n")
+                stdout.flush()
+        finally:
+            if pool:
+                pool.terminate()
+    finally:
+        if stdin is not sys.stdin:
+            stdin.close()
@@ -4,13 +4,13 @@
 from __future__ import division, print_function
 
 import time
-from .relations import Relations
 from .version_number import version
 import os
 import sys
 import json
 import re
 import numbers
+import copy
 from .file_helpers import read_contents, write_contents
 from .mocodo_error import MocodoError
 
@@ -22,6 +22,18 @@ def safe_print_for_PHP(s):
     except UnicodeEncodeError:
         print(s.encode("utf8"), file=sys.stdout)
 
+style_cache = {} # loaded styles, shared by all the Common instances of the process
+relation_template_cache = {}
+
+def file_signature(path):
+    """ Identify the current version of a file, so that a cached copy is reloaded when it is edited. """
+    path = os.path.realpath(path)
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return (path, None, None)
+    return (path, stat.st_mtime, stat.st_size)
+
 class Common:
 
     def __init__(self, params):
@@ -43,15 +55,22 @@ class Common:
         raise MocodoError(5, _('Unable to read "{filename}" with any of the following encodings: "{encodings}".').format(filename=self.params["input"], encodings= ", ".join(self.params["encodings"])))
 
     def load_style(self):
+        key = (file_signature(self.find_style_file("colors")), file_signature(self.find_style_file("shapes")), self.params["scale"])
+        if key not in style_cache:
+            style_cache[key] = self.read_style()
+        return copy.deepcopy(style_cache[key])
+
+    def find_style_file(self, name):
+        """ Return the path of the colors or shapes file, either as given or in the script directory. """
+        path = self.params[name] + ("" if self.params[name].endswith(".json") else ".json")
+        if os.path.exists(path):
+            return path
+        return os.path.join(self.params["script_directory"], name, path)
+
+    def read_style(self):
         
         def load_by_name(name):
-            path = self.params[name] + ("" if self.params[name].endswith(".json") else ".json") 
-            if os.path.exists(path):
-                try:
-                    return json.loads(read_contents(path))
-                except:
-                    raise MocodoError(3, _('Problem with "{name}" file "{path}.json".').format(name=name, path=path))
-            path = os.path.join(self.params["script_directory"], name, path)
+            path = self.find_style_file(name)
             try:
                 return json.loads(read_contents(path))
             except:
@@ -87,25 +106,56 @@ class Common:
         write_contents(path, result)
         safe_print_for_PHP(self.output_success_message(path))
 
+    def load_relation_template(self, name):
+        path = os.path.join(self.params["script_directory"], "relation_templates", "%s.json" % name)
+        key = file_signature(path)
+        if key not in relation_template_cache:
+            relation_template_cache[key] = json.loads(read_contents(path))
+        return copy.deepcopy(relation_template_cache[key])
+
     def dump_mld_files(self, relations):
+        """ Write a file for each relation template. Return the generated texts. """
         relation_templates = []
         for relation_template in self.params["relations"]:
             try:
-                path = os.path.join(self.params["script_directory"], "relation_templates", "%s.json" % relation_template)
-                contents = json.loads(read_contents(path))
-                relation_templates.append(contents)
+                relation_templates.append(self.load_relation_template(relation_template))
             except:
                 safe_print_for_PHP(_('Problem with template {template}.').format(template=relation_template + ".json"))
-        for relation_template in relation_templates:
-            path = os.path.join(self.params["output_name"] + relation_template["extension"])
+        texts = relations.get_texts(relation_templates)
+        result = []
+        while True:
             try:
-                text = relations.get_text(relation_template)
-                safe_print_for_PHP(self.output_success_message(path))
+                (relation_template, text) = next(texts)
+            except StopIteration:
+                break
             except:
-                text = _("Problem during the generation of the relational schema.")
-                safe_print_for_PHP(text)
+                safe_print_for_PHP(_("Problem during the generation of the relational schema."))
                 raise
+            path = os.path.join(self.params["output_name"] + relation_template["extension"])
+            safe_print_for_PHP(self.output_success_message(path))
             write_contents(path, text)
+            result.append(text)
+        return result
+
+    def dump_cached_files(self, entry):
+        """ Write the files of a render cache entry, as if they were generated. """
+        for (name, text) in zip(self.params["relations"], entry["mld"]):
+            path = os.path.join(self.params["output_name"] + self.load_relation_template(name)["extension"])
+            safe_print_for_PHP(self.output_success_message(path))
+            write_contents(path, text)
+        path = u"%(output_name)s.svg" % self.params
+        write_contents(path, entry["svg"])
+        safe_print_for_PHP(self.output_success_message(path))
+
+    def geometry(self, mcd, style):
+        return [
+            ("size", (mcd.w, mcd.h)),
+            ("cx", [(box.name, box.x + box.w // 2) for row in mcd.rows for box in row if box.kind != "phantom"]),
+            ("cy", [(box.name, box.y + box.h // 2) for row in mcd.rows for box in row if box.kind != "phantom"]),
+            ("shift", [(leg.identifier, 0) for row in mcd.rows for box in row for leg in box.legs]),
+            ("ratio", [(leg.identifier, 1.0) for row in mcd.rows for box in row for leg in box.legs if leg.arrow]),
+            ("colors", [((c, style[c]) if style[c] else (c, None)) for c in sorted(style.keys()) if c.endswith("_color")]),
+        ]
 
     def process_geometry(self, mcd, style):
         
@@ -117,14 +167,7 @@ class Common:
             except IOError:
                 safe_print_for_PHP(_('Unable to generate file "{filename}"!').format(filename=os.path.basename(path)))
         
-        l = [
-            ("size", (mcd.w, mcd.h)),
-            ("cx", [(box.name, box.x + box.w // 2) for row in mcd.rows for box in row if box.kind != "phantom"]),
-            ("cy", [(box.name, box.y + box.h // 2) for row in mcd.rows for box in row if box.kind != "phantom"]),
-            ("shift", [(leg.identifier, 0) for row in mcd.rows for box in row for leg in box.legs]),
-            ("ratio", [(leg.identifier, 1.0) for row in mcd.rows for box in row for leg in box.legs if leg.arrow]),
-            ("colors", [((c, style[c]) if style[c] else (c, None)) for c in sorted(style.keys()) if c.endswith("_color")]),
-        ]
+        l = self.geometry(mcd, style)
         if self.params.get("extract"): # Generate a separated JSON file for the geometry
             dump_geo_file(dict(l))
             result = []
@@ -3,16 +3,14 @@
 
 from __future__ import division
 
-class memoize(dict):
-    def __init__(self, func):
-        self.func = func
- 
-    def __call__(self, *args):
-        return self[args]
- 
-    def __missing__(self, key):
-        result = self[key] = self.func(*key)
-        return result
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from .memo import memoize
+
+CROSS_BLOCK_SIZE = 256 # number of segments compared at once with all the others by the NumPy kernel
 
 crossed_strings = frozenset(["-++-", "-++0", "-+0-", "-0+-", "0++-", "+--+", "0--+", "+0-+", "+-0+", "+--0"])
 
@@ -49,3 +47,69 @@ def cross(x1, y1, x2, y2, x3, y3, x4, y4):
                     return x1 > x3 and x2 < x4
                 else:
                     return x1 > x4 and x2 < x3
+
+
+def sign_code(signs):
+    """ Encode a string of four signs among "-", "0", "+" as an integer between 0 and 80. """
+    return sum("-0+".index(sign) * 3 ** (3 - i) for (i, sign) in enumerate(signs))
+
+def python_cross_matrix(segments):
+    return [[cross(x1, y1, x2, y2, x3, y3, x4, y4) for (x3, y3, x4, y4) in segments] for (x1, y1, x2, y2) in segments]
+
+def numpy_cross(x1, y1, x2, y2, x3, y3, x4, y4):
+    """ Same computation as cross(), performed element-wise on arrays of coordinates. The signs of the
+        four determinants are encoded as an integer and looked up in a table of crossing configurations. """
+    a = (x4-x3)*(y1-y3) - (y4-y3)*(x1-x3)
+    b = (x4-x3)*(y2-y3) - (y4-y3)*(x2-x3)
+    c = (x2-x1)*(y3-y1) - (y2-y1)*(x3-x1)
+    d = (x2-x1)*(y4-y1) - (y2-y1)*(x4-x1)
+    codes = ((numpy.sign(a) + 1) * 27 + (numpy.sign(b) + 1) * 9 + (numpy.sign(c) + 1) * 3 + numpy.sign(d) + 1).astype(numpy.intp)
+    collinear = (a == 0) & (b == 0) & (c == 0) & (d == 0)
+    overlapping_abscissas = (numpy.minimum(x1, x2) < numpy.maximum(x3, x4)) & (numpy.minimum(x3, x4) < numpy.maximum(x1, x2))
+    overlapping_ordinates = (numpy.minimum(y1, y2) < numpy.maximum(y3, y4)) & (numpy.minimum(y3, y4) < numpy.maximum(y1, y2))
+    return numpy.where(collinear, numpy.where(x1 == x2, overlapping_ordinates, overlapping_abscissas), crossed_codes[codes])
+
+def numpy_cross_matrix(segments):
+    """ Same computation as cross(), performed on all the pairs of segments at once. """
+    segments = numpy.asarray(segments).reshape(-1, 4)
+    return numpy_cross(*([segments[:, k, None] for k in range(4)] + [segments[None, :, k] for k in range(4)]))
+
+def numpy_crossing_pairs(segments):
+    """ Yield the indexes (i, j), i < j, of the intersecting segments by blocks of rows, as two arrays.
+        In each block, the signs are only computed for the pairs whose bounding boxes overlap, which
+        keeps the memory linear in the number of segments. """
+    segments = numpy.asarray(segments).reshape(-1, 4)
+    (left, right) = (segments[:, [0, 2]].min(axis=1), segments[:, [0, 2]].max(axis=1))
+    (bottom, top) = (segments[:, [1, 3]].min(axis=1), segments[:, [1, 3]].max(axis=1))
+    for start in range(0, len(segments), CROSS_BLOCK_SIZE):
+        rows = slice(start, start + CROSS_BLOCK_SIZE)
+        columns = slice(start + 1, None)
+        candidates = numpy.triu(
+            (left[None, columns] <= right[rows, None]) & (left[rows, None] <= right[None, columns]) &
+            (bottom[None, columns] <= top[rows, None]) & (bottom[rows, None] <= top[None, columns])
+        )
+        (i, j) = numpy.nonzero(candidates)
+        (i, j) = (i + start, j + start + 1)
+        crossed = numpy_cross(*([segments[i, k] for k in range(4)] + [segments[j, k] for k in range(4)]))
+        yield (i[crossed], j[crossed])
+
+def cross_matrix(segments):
+    """ Given a list of segments (x1, y1, x2, y2), return the matrix telling whether the i-th and the j-th
+        segments intersect, as cross() would. Computed by NumPy when available. """
+    return (numpy_cross_matrix if numpy else python_cross_matrix)(segments)
+
+def crossing_pairs(segments):
+    """ Return the list of the pairs of indexes (i, j), i < j, of the intersecting segments. """
+    if numpy:
+        return [pair for (rows, columns) in numpy_crossing_pairs(segments) for pair in zip(rows.tolist(), columns.tolist())]
+    return [(i, j) for (i, (x1, y1, x2, y2)) in enumerate(segments) for (j, (x3, y3, x4, y4)) in enumerate(segments[i+1:], i+1) if cross(x1, y1, x2, y2, x3, y3, x4, y4)]
+
+def count_crossings(segments):
+    """ Return the number of pairs of intersecting segments. """
+    if numpy:
+        return sum(len(rows) for (rows, _) in numpy_crossing_pairs(segments))
+    return len(crossing_pairs(segments))
+
+if numpy:
+    crossed_codes = numpy.zeros(81, dtype=bool)
+    crossed_codes[[sign_code(signs) for signs in crossed_strings]] = True
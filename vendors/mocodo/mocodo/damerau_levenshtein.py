@@ -45,4 +45,58 @@ def damerau_levenshtein(seq1, seq2):
             if (x > 0 and y > 0 and seq1[x] == seq2[y - 1]
                 and seq1[x-1] == seq2[y] and seq1[x] != seq2[y]):
                 this_row[y] = min(this_row[y], two_ago[y - 2] + 1)
-    return this_row[len(seq2) - 1]
\ No newline at end of file
+    return this_row[len(seq2) - 1]
+
+def bounded_damerau_levenshtein(seq1, seq2, bound):
+    """Calculate the Damerau-Levenshtein distance between sequences, up to a given bound.
+
+    Return the same distance as damerau_levenshtein() when it does not
+    exceed the bound, and bound + 1 otherwise. Only the diagonal band
+    of the matrix where the distance may not exceed the bound is
+    calculated, and the calculation stops as soon as no cell of the
+    two last rows can lead to a distance within the bound. This is
+    O(N*bound) time at worst.
+
+    >>> bounded_damerau_levenshtein('fee', 'deed', 2)
+    2
+    >>> bounded_damerau_levenshtein('fee', 'deed', 1)
+    2
+    >>> bounded_damerau_levenshtein('foo', 'foobar', 2)
+    3
+    """
+    cap = bound + 1
+    if abs(len(seq1) - len(seq2)) > bound:
+        return cap
+    # Here, the leftmost column is stored at index 0, and every value exceeding
+    # the bound is replaced with cap: both the cells outside the band and the
+    # cells which cannot be reached at a lower cost.
+    two_ago = None
+    one_ago = [min(y, cap) for y in range(len(seq2) + 1)]
+    one_ago_min = 0
+    for x in range(1, len(seq1) + 1):
+        this_row = [cap] * (len(seq2) + 1)
+        this_row[0] = this_row_min = x if x < cap else cap
+        item = seq1[x - 1]
+        for y in range(max(1, x - bound), min(len(seq2), x + bound) + 1):
+            cost = one_ago[y - 1]
+            if item != seq2[y - 1]:
+                cost += 1
+                if one_ago[y] < cost:
+                    cost = one_ago[y] + 1
+                if this_row[y - 1] < cost:
+                    cost = this_row[y - 1] + 1
+                # This block deals with transpositions
+                if (x > 1 and y > 1 and item == seq2[y - 2] and seq1[x - 2] == seq2[y - 1]
+                    and two_ago[y - 2] < cost):
+                    cost = two_ago[y - 2] + 1
+                if cost > cap:
+                    cost = cap
+            this_row[y] = cost
+            if cost < this_row_min:
+                this_row_min = cost
+        # Any further cell derives from a cell of this row, or from a cell of
+        # the previous one through a transposition.
+        if this_row_min > bound and one_ago_min >= bound:
+            return cap
+        two_ago, one_ago, one_ago_min = one_ago, this_row, this_row_min
+    return one_ago[len(seq2)]
@@ -6,6 +6,7 @@ from __future__ import division
 from itertools import product
 from math import hypot
 from collections import Counter
+from operator import itemgetter
 from .cross import cross
 
 def fitness(links, multiplicity, col_count, row_count, max_distance = 4):
@@ -32,3 +33,114 @@ def fitness(links, multiplicity, col_count, row_count, max_distance = 4):
     coordinates = [(0, 0)] * (row_count * col_count)
     link_count = len(links)
     return evaluate
+
+
+def incremental_fitness(links, multiplicity, col_count, row_count, max_distance = 4):
+    """ Same evaluation as fitness(), but returning the score along with a state from which the
+        score of a slightly different layout can be deduced. Only the links touching a box which
+        has moved are re-scored. Crossings are only tested between segments whose bounding boxes
+        overlap, by sweeping the segments sorted by their leftmost abscissa. """
+    
+    def positions_of(layout):
+        positions = [0] * box_count
+        for (position, index) in enumerate(layout):
+            positions[index] = position
+        return positions
+    
+    def segment_of(positions, link_index):
+        """ Return the segment of a given link if it is short enough, and its weighted length. A
+            segment is represented by the identifier of its extremities and its bounding box. """
+        (p1, p2) = links[link_index]
+        (position_1, position_2) = (positions[p1], positions[p2])
+        ((y1, x1), (y2, x2)) = (coordinates[position_1], coordinates[position_2])
+        distance = distances[abs(x1-x2)][abs(y1-y2)] * link_multiplicities[link_index]
+        if distance > max_distance:
+            return (None, distance)
+        return ((position_1 * box_count + position_2, min(x1, x2), max(x1, x2), min(y1, y2), max(y1, y2)), distance)
+    
+    def crosses(segment_1, segment_2):
+        """ Compute and memoize whether two segments cross, in both orders. """
+        ((y1, x1), (y2, x2)) = (coordinates[segment_1 // box_count], coordinates[segment_1 % box_count])
+        ((y3, x3), (y4, x4)) = (coordinates[segment_2 // box_count], coordinates[segment_2 % box_count])
+        result = crossings[segment_1 * segment_count + segment_2] = crossings[segment_2 * segment_count + segment_1] = cross(x1, y1, x2, y2, x3, y3, x4, y4)
+        return result
+    
+    def sweep(segments):
+        """ Count the crossings between the given segments. """
+        result = 0
+        segments = sorted(segments, key=itemgetter(1))
+        for (i, (segment_1, _, right, bottom, top)) in enumerate(segments):
+            for (segment_2, left, _, bottom_2, top_2) in segments[i+1:]:
+                if left > right:
+                    break
+                if bottom_2 <= top and bottom <= top_2:
+                    crossing = get_crossing(segment_1 * segment_count + segment_2)
+                    result += crosses(segment_1, segment_2) if crossing is None else crossing
+        return result
+    
+    def crossings_with(segments, others):
+        """ Count the crossings between any segment of the first list and any of the second one. """
+        result = 0
+        for (segment_1, left, right, bottom, top) in segments:
+            for (segment_2, left_2, right_2, bottom_2, top_2) in others:
+                if left_2 <= right and left <= right_2 and bottom_2 <= top and bottom <= top_2:
+                    crossing = get_crossing(segment_1 * segment_count + segment_2)
+                    result += crosses(segment_1, segment_2) if crossing is None else crossing
+        return result
+    
+    def score(state):
+        (_, segments, link_distances, crossing_count) = state
+        short_count = link_count - segments.count(None)
+        return ((link_count - short_count) * link_count + crossing_count, sum(link_distances))
+    
+    def evaluate(layout):
+        """ Return the score of the given layout, and its state. """
+        positions = positions_of(layout)
+        (segments, link_distances) = ([], [])
+        for link_index in range(link_count):
+            (segment, distance) = segment_of(positions, link_index)
+            segments.append(segment)
+            link_distances.append(distance)
+        state = (positions, segments, link_distances, sweep([s for s in segments if s]))
+        return (score(state), state)
+    
+    def evaluate_child(layout, *parent_states):
+        """ Return the score of the given layout, and its state, knowing the state of one or several
+            layouts which presumably differ only by a few boxes. The closest one is used. """
+        positions = positions_of(layout)
+        candidates = []
+        for parent_state in parent_states:
+            parent_positions = parent_state[0]
+            moved = [index for index in range(box_count) if positions[index] != parent_positions[index]]
+            candidates.append((len(moved), moved, parent_state))
+        (_, moved, (_, parent_segments, parent_distances, crossing_count)) = min(candidates, key=itemgetter(0))
+        dirty = set()
+        for index in moved:
+            dirty.update(links_of_box[index])
+        if 2 * len(dirty) > link_count:
+            return evaluate(layout)
+        segments = parent_segments[:]
+        link_distances = parent_distances[:]
+        for link_index in dirty:
+            (segments[link_index], link_distances[link_index]) = segment_of(positions, link_index)
+        clean_segments = [s for (i, s) in enumerate(segments) if s and i not in dirty]
+        old_dirty_segments = [parent_segments[i] for i in dirty if parent_segments[i]]
+        new_dirty_segments = [segments[i] for i in dirty if segments[i]]
+        crossing_count -= crossings_with(old_dirty_segments, clean_segments) + sweep(old_dirty_segments)
+        crossing_count += crossings_with(new_dirty_segments, clean_segments) + sweep(new_dirty_segments)
+        state = (positions, segments, link_distances, crossing_count)
+        return (score(state), state)
+    
+    distances = [[hypot(i, j) - 1 for j in range(row_count)] for i in range(col_count)]
+    box_count = row_count * col_count
+    coordinates = [divmod(position, col_count) for position in range(box_count)]
+    segment_count = box_count * box_count
+    crossings = {}
+    get_crossing = crossings.get
+    link_count = len(links)
+    link_multiplicities = [multiplicity[p1, p2] for (p1, p2) in links]
+    links_of_box = [[] for _ in range(box_count)]
+    for (link_index, (p1, p2)) in enumerate(links):
+        links_of_box[p1].append(link_index)
+        links_of_box[p2].append(link_index)
+    return (evaluate, evaluate_child)
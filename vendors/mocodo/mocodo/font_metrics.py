@@ -5,6 +5,7 @@ from __future__ import division
 
 import sys
 from .file_helpers import read_contents
+from .memo import memoize
 import os
 import json
 
@@ -34,31 +35,61 @@ def font_metrics_factory(params):
             return FontMetricsWithTk
         
         sys.stderr.write(u"Warning: Tkinter is not correctly installed or Mocodo is run on server side with no display. Option 'tkinter' ignored.\n")
-    path = os.path.join(params["script_directory"], "font_metrics.json")
-    text = read_contents(path)
-    
-    class FontMetricsWithoutTk():
-
-        def __init__(self, font):
-            if font["family"] not in self.static_data["fonts"]:
-                # sys.stderr.write(u"Warning: Missing metrics for font '%s'. If it is installed on your system, you may run update_font_metrics.py to add it (require Tkinter). In the meantime, I will replace it by Courier New.\n" % font["family"])
-                font["family"] = u"Courier New"
-            ref_size = self.static_data["size"]
-            metrics = self.static_data["fonts"][font["family"]]
-            self.font_height = int(round(metrics["height"] * font["size"] / ref_size))
-            self.width = dict((c, ord(x)) for (c, x) in zip(self.static_data["alphabet"], metrics.get("widths", [])))
-            self.ratio = font["size"] * metrics.get("correction", 1) / ref_size
-            self.default_width = metrics["default"]
-
-        def get_pixel_height(self):
-            return self.font_height
-
-        def get_pixel_width(self, string):
-            return int(round(self.ratio * sum(self.width.get(c, self.default_width) for c in string))) + 1
-    
-    FontMetricsWithoutTk.static_data = json.loads(text)
-    return FontMetricsWithoutTk
+    return font_metrics_without_tk(os.path.join(params["script_directory"], "font_metrics.json"))
+
+
+static_data = {} # contents of the font metrics files, loaded on first use
+width_tables = {} # compiled metrics per font file and family
+shared_metrics = {} # one FontMetricsWithoutTk instance per font file, family and size
+WIDTH_MEMO_MAXSIZE = 1 << 12 # number of label widths kept by each shared instance
+
+
+def load_static_data(path):
+    if path not in static_data:
+        static_data[path] = json.loads(read_contents(path))
+    return static_data[path]
+
 
+def get_width_table(path, family):
+    """ Return the metrics of a family, with its widths compiled into a dictionary
+        mapping each character to its width at the reference size. """
+    if (path, family) not in width_tables:
+        data = load_static_data(path)
+        metrics = data["fonts"][family]
+        width_tables[(path, family)] = (
+            metrics["height"],
+            dict((c, ord(x)) for (c, x) in zip(data["alphabet"], metrics.get("widths", []))),
+            metrics.get("correction", 1),
+            metrics["default"],
+            data["size"],
+        )
+    return width_tables[(path, family)]
 
 
+class FontMetricsWithoutTk():
 
+    def __init__(self, path, family, size):
+        (height, self.width, correction, self.default_width, ref_size) = get_width_table(path, family)
+        self.font_height = int(round(height * size / ref_size))
+        self.ratio = size * correction / ref_size
+        self.get_pixel_width = memoize(self.measure, maxsize=WIDTH_MEMO_MAXSIZE)
+
+    def get_pixel_height(self):
+        return self.font_height
+
+    def measure(self, string):
+        return int(round(self.ratio * sum(self.width.get(c, self.default_width) for c in string))) + 1
+
+
+def font_metrics_without_tk(path):
+    
+    def get_font_metrics(font):
+        if font["family"] not in load_static_data(path)["fonts"]:
+            # sys.stderr.write(u"Warning: Missing metrics for font '%s'. If it is installed on your system, you may run update_font_metrics.py to add it (require Tkinter). In the meantime, I will replace it by Courier New.\n" % font["family"])
+            font["family"] = u"Courier New"
+        key = (path, font["family"], font["size"])
+        if key not in shared_metrics:
+            shared_metrics[key] = FontMetricsWithoutTk(path, font["family"], font["size"])
+        return shared_metrics[key]
+    
+    return get_font_metrics
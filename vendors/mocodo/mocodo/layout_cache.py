@@ -0,0 +1,151 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+from __future__ import division
+
+import os
+import json
+import hashlib
+from .file_helpers import read_contents, write_contents
+
+ALGORITHM_PARAMS = {
+    "bb": ["organic", "min_objective", "max_objective", "call_limit", "seed"],
+    "ga": ["population_size", "crossover_rate", "mutation_rate", "sample_size", "max_generations", "plateau", "islands", "migration_interval", "seed"],
+    "lp": ["engine"],
+}
+WARM_START_MAX_ADDED_RATIO = 0.25 # at most one new box out of four for reusing a previous layout
+
+
+class LayoutCache:
+    """ On-disk cache of the rearranged layouts. An entry is keyed by a hash of the topology of the
+        diagram (which only depends on the links between boxes, their multiplicity and the size of
+        the grid) and of the parameters of the algorithm. It also records the names of the boxes, so
+        that a layout computed for a diagram may serve as a starting point for a slightly larger one. """
+
+    def __init__(self, directory):
+        self.directory = directory
+
+    def get_algorithm_params(self, params):
+        result = dict((key, params.get(key)) for key in ALGORITHM_PARAMS[params["arrange"]])
+        result["arrange"] = params["arrange"]
+        if params["arrange"] == "bb":
+            result["portfolio"] = params.get("workers", 1) > 1 # the portfolio does not explore in the same order
+        return result
+
+    def get_key(self, layout_data, algorithm_params):
+        topology = {
+            "links": sorted(list(link) for link in layout_data["links"]),
+            "multiplicity": sorted([p1, p2, m] for ((p1, p2), m) in layout_data["multiplicity"].items()),
+            "col_count": layout_data["col_count"],
+            "row_count": layout_data["row_count"],
+            "algorithm": algorithm_params,
+        }
+        return hashlib.sha1(json.dumps(topology, sort_keys=True).encode("utf8")).hexdigest()
+
+    def get_path(self, key):
+        return os.path.join(self.directory, "%s.json" % key)
+
+    def load(self, key):
+        try:
+            return json.loads(read_contents(self.get_path(key)))
+        except (IOError, OSError, ValueError):
+            return None
+
+    def save(self, key, entry):
+        if not os.path.isdir(self.directory):
+            os.makedirs(self.directory)
+        path = self.get_path(key)
+        write_contents(path + ".tmp", json.dumps(entry, ensure_ascii=False))
+        if os.path.exists(path):
+            os.remove(path)
+        os.rename(path + ".tmp", path)
+
+    def entries(self):
+        if not os.path.isdir(self.directory):
+            return
+        for filename in sorted(os.listdir(self.directory)):
+            if filename.endswith(".json"):
+                entry = self.load(filename[:-len(".json")])
+                if entry:
+                    yield entry
+
+    def find_nearest(self, names, algorithm_params):
+        """ Return the cached entry computed with the same algorithm parameters for a diagram whose boxes
+            are all present in the current one, with the fewest added boxes. None if there are too many. """
+        names = set(name for name in names if not name.startswith(" ")) # ignore the phantoms
+        best = None
+        for entry in self.entries():
+            if entry["algorithm"] != algorithm_params:
+                continue
+            cached_names = set(name for name in entry["names"] if not name.startswith(" "))
+            if not cached_names.issubset(names) or cached_names == names:
+                continue
+            added_count = len(names) - len(cached_names)
+            if added_count > WARM_START_MAX_ADDED_RATIO * len(names):
+                continue
+            if best is None or added_count < best[0]:
+                best = (added_count, entry)
+        return best and best[1]
+
+    def get_warm_layout(self, entry, names, col_count, row_count):
+        """ Transpose the cached layout onto the current grid: the known boxes keep their coordinates
+            when possible, the other ones fill the remaining cells. """
+        indexes = dict((name, index) for (index, name) in enumerate(names))
+        cached_col_count = entry["result"].get("col_count") or entry["col_count"]
+        layout = [None] * (col_count * row_count)
+        pending = set(range(len(names)))
+        for (position, cached_index) in enumerate(entry["result"]["layout"]):
+            if cached_index is None:
+                continue
+            name = entry["names"][cached_index]
+            (y, x) = divmod(position, cached_col_count)
+            if name in indexes and not name.startswith(" ") and x < col_count and y < row_count:
+                layout[x + y * col_count] = indexes[name]
+                pending.discard(indexes[name])
+        pending = sorted(pending)
+        for (position, index) in enumerate(layout):
+            if index is None and pending:
+                layout[position] = pending.pop(0)
+        return layout
+
+    def is_subgraph(self, entry, named_links):
+        return set(tuple(link) for link in entry["named_links"]).issubset(named_links)
+
+    def has_larger_grid(self, entry, layout_data):
+        return entry["col_count"] >= layout_data["col_count"] and entry["row_count"] >= layout_data["row_count"]
+
+    def arrange(self, mcd, params, arrange):
+        """ Return the cached layout of the current diagram if any. Otherwise, run the given algorithm,
+            possibly warm-started from the nearest cached layout, and store its result. """
+        layout_data = mcd.get_layout_data()
+        algorithm_params = self.get_algorithm_params(params)
+        key = self.get_key(layout_data, algorithm_params)
+        entry = self.load(key)
+        if entry:
+            if params["verbose"]:
+                print("Layout found in cache (%s)." % key)
+            return entry["result"]
+        names = [box.name for box in mcd.boxes]
+        named_links = set(tuple(sorted((names[p1], names[p2]))) for (p1, p2) in layout_data["links"])
+        nearest = self.find_nearest(names, algorithm_params)
+        params = dict(params)
+        if nearest:
+            if params["verbose"]:
+                print("Warm start from a cached layout of %s boxes." % len(nearest["names"]))
+            if params["arrange"] == "ga":
+                params["initial_layouts"] = [self.get_warm_layout(nearest, names, layout_data["col_count"], layout_data["row_count"])]
+            elif params["arrange"] == "bb" and self.is_subgraph(nearest, named_links) and self.has_larger_grid(nearest, layout_data):
+                # the objectives which failed for a subgraph would fail for the current graph too, unless
+                # the current grid offers room the subgraph had not
+                params["min_objective"] = max(params["min_objective"], int(nearest["result"]["distances"]))
+        result = arrange(**params)
+        if result:
+            self.save(key, {
+                "algorithm": algorithm_params,
+                "names": names,
+                "named_links": sorted(list(link) for link in named_links),
+                "col_count": layout_data["col_count"],
+                "row_count": layout_data["row_count"],
+                "result": dict((k, result[k]) for k in ("layout", "distances", "crossings", "col_count", "row_count") if k in result),
+            })
+        return result
@@ -9,6 +9,7 @@ from .entity import Entity
 from .phantom import Phantom
 from .diagram_link import DiagramLink
 import itertools
+from bisect import bisect_left, bisect_right
 from collections import defaultdict
 from .grid import Grid
 from .mocodo_error import MocodoError
@@ -179,6 +180,7 @@ class Mcd:
         make_boxes()
         tweak_straight_cards()
         self.title = params["title"]
+        self.layout_engine = params.get("layout_engine", "sweep")
     
     def get_layout_data(self):
         successors = [set() for i in range(self.box_count)] # use `set` to deduplicate reflexive associations
@@ -346,6 +348,29 @@ class Mcd:
                     box.y -= dy
             self.h -= dy
         #
+        def compress_vertically_with_sweep():
+            # Same result as compress_vertically(). The boxes of a row being sorted and separated
+            # by join_width, the only boxes of the previous row which may overlap a given box
+            # horizontally are found by bisection.
+            dy = 0
+            for j in range(1, self.row_count):
+                dy = SYS_MAXINT
+                previous_row = self.rows[j-1]
+                lefts = [b1.x for b1 in previous_row]
+                rights = [b1.x + b1.w + join_width for b1 in previous_row]
+                for (i2, b2) in enumerate(self.rows[j]):
+                    y1_max = max(0, previous_row[i2].y + previous_row[i2].h)
+                    start = max(0, bisect_right(rights, b2.x) - 1)
+                    stop = min(self.col_count, bisect_left(lefts, b2.x + b2.w + join_width) + 1)
+                    for b1 in previous_row[start:stop]:
+                        if (b1.x < b2.x < b1.x + b1.w + join_width) or (b1.x - join_width < b2.x + b2.w < b1.x + b1.w):
+                            y1_max = max(y1_max, b1.y + b1.h)
+                    space = b2.y - y1_max - join_height
+                    dy = min(dy, space)
+                for box in self.rows[j]:
+                    box.y -= dy
+            self.h -= dy
+        #
 
         style["card_max_width"] = card_max_width()
         style["card_max_height"] = self.get_font_metrics(style["card_font"]).get_pixel_height()
@@ -356,7 +381,10 @@ class Mcd:
         make_horizontal_layout()
         compress_horizontally()
         make_vertical_layout()
-        compress_vertically()
+        if self.layout_engine == "naive":
+            compress_vertically()
+        else:
+            compress_vertically_with_sweep()
     
     def description(self):
         result = []
@@ -3,21 +3,85 @@
 
 from __future__ import division
 
-from .common import version
+from .common import version, safe_print_for_PHP
 import string
 import random
 import re
 import os
+import codecs
 from .file_helpers import read_contents
 from .dynamic import Dynamic
+from math import hypot
+try:
+    from importlib.machinery import SourceFileLoader
+except ImportError: # Python 2
+    SourceFileLoader = None
 
-def main(mcd, common):
-    params = common.params
+commands = {
+    "round_rect":         """<rect x="%(x)s" y="%(y)s" width="%(w)s" height="%(h)s" fill="%(color)s" rx="%(radius)s" stroke="%(stroke_color)s" stroke-width="%(stroke_depth)s"/>""",
+    "lower_round_rect":   """<path d="%(path)s" fill="%(color)s" stroke="%(stroke_color)s" stroke-width="%(stroke_depth)s"/>""",
+    "upper_round_rect":   """<path d="%(path)s" fill="%(color)s" stroke="%(stroke_color)s" stroke-width="%(stroke_depth)s"/>""",
+    "arrow":              """<path d="%(path)s" fill="%(stroke_color)s" stroke-width="0"/>""",
+    "curve":              """<path d="M%(x0)s %(y0)s C %(x1)s %(y1)s %(x2)s %(y2)s %(x3)s %(y3)s" fill="none" stroke="%(stroke_color)s" stroke-width="%(stroke_depth)s"/>""",
+    "line":               """<line x1="%(x0)s" y1="%(y0)s" x2="%(x1)s" y2="%(y1)s" stroke="%(stroke_color)s" stroke-width="%(stroke_depth)s"/>""",
+    "dash_line":          """<line x1="%(x0)s" y1="%(y)s" x2="%(x1)s" y2="%(y)s" style="fill:none;stroke:%(stroke_color)s;stroke-width:%(stroke_depth)s;stroke-dasharray:%(dash_width)s;"/>""",
+    "rect":               """<rect x="%(x)s" y="%(y)s" width="%(w)s" height="%(h)s" fill="%(color)s" stroke="%(stroke_color)s" stroke-width="%(stroke_depth)s"/>""",
+    "circle":             """<circle cx="%(cx)s" cy="%(cy)s" r="%(r)s" stroke="%(stroke_color)s" stroke-width="%(stroke_depth)s" fill="%(color)s"/>""",
+    "text":               """<text x="%(x)s" y="%(y)s" fill="%(text_color)s" font-family="%(family)s" font-size="%(size)s">%(text)s</text>""",
+    "straight_leg":       """<line x1="%(ex)s" y1="%(ey)s" x2="%(ax)s" y2="%(ay)s" stroke="%(stroke_color)s" stroke-width="%(stroke_depth)s"/>""",
+    "straight_card":      """<text x="%(tx)s" y="%(ty)s" fill="%(text_color)s" font-family="%(family)s" font-size="%(size)s">%(text)s</text>""",
+    "straight_arrow":     """<path d="%(path)s" fill="%(stroke_color)s" stroke-width="0"/>""",
+    "straight_card_note": """<text x="%(tx)s" y="%(ty)s" fill="%(text_color)s" font-family="%(family)s" font-size="%(size)s" onmouseover="show(evt,'%(annotation)s')" onmouseout="hide(evt)" style="cursor: pointer;">%(text)s</text>""",
+    "curved_leg":         """<path d="M%(x0)s %(y0)s C %(x1)s %(y1)s %(x2)s %(y2)s %(x3)s %(y3)s" fill="none" stroke="%(stroke_color)s" stroke-width="%(stroke_depth)s"/>""",
+    "curved_card":        """<text x="%(tx)s" y="%(ty)s" fill="%(text_color)s" font-family="%(family)s" font-size="%(size)s">%(text)s</text>""",
+    "curved_arrow":       """<path d="%(path)s" fill="%(stroke_color)s" stroke-width="0"/>""",
+    "curved_card_note":   """<text x="%(tx)s" y="%(ty)s" fill="%(text_color)s" font-family="%(family)s" font-size="%(size)s" onmouseover="show(evt,'%(annotation)s')" onmouseout="hide(evt)" style="cursor: pointer;">%(text)s</text>""",
+    "card_underline":     """<line x1="%(tx)s" y1="%(uy)s" x2="%(ux)s" y2="%(uy)s" stroke="%(stroke_color)s" stroke-width="%(stroke_depth)s"/>""",
+    "begin":              """<g id="%(id)s">""",
+    "end":                """</g>""",
+}
+
+constant_names = ["card_max_width", "card_max_height", "card_margin", "arrow_width", "arrow_half_height", "arrow_axis", "card_baseline"]
+
+compiled_helpers = {}
+
+annotation_script = """
+
+<!-- Annotations -->
+<script type="text/ecmascript">
+<![CDATA[
+	function show(evt, text) {
+		var pos = (evt.target.getAttribute("y") < %(top)s) ? "bottom" : "top"
+		var annotation = document.getElementById(pos + "_annotation_%(salt)s")
+		annotation.textContent = text
+		annotation.setAttributeNS(null, "visibility", "visible");
+		document.getElementById(pos + "_overlay_%(salt)s").setAttributeNS(null, "visibility", "visible");
+	}
+	function hide(evt) {
+		document.getElementById("top_annotation_%(salt)s").setAttributeNS(null, "visibility", "hidden");
+		document.getElementById("top_overlay_%(salt)s").setAttributeNS(null, "visibility", "hidden");
+		document.getElementById("bottom_annotation_%(salt)s").setAttributeNS(null, "visibility", "hidden");
+		document.getElementById("bottom_overlay_%(salt)s").setAttributeNS(null, "visibility", "hidden");
+	}
+]]>
+</script>
+<rect id="top_overlay_%(salt)s" x="0" y="0" width="%(width)s" height="%(annotation_overlay_height)s" fill="%(annotation_color)s" stroke-width="0" opacity="%(annotation_opacity)s" visibility="hidden"/>
+<text id="top_annotation_%(salt)s" text-anchor="middle" x="%(half_width)s" y="%(annotation_baseline)s" fill="%(annotation_text_color)s" font-family="%(annotation_family)s" font-size="%(annotation_size)s" visibility="hidden"></text>
+<rect id="bottom_overlay_%(salt)s" x="0" y="%(bottom_overlay_y)s" width="%(width)s" height="%(annotation_overlay_height)s" fill="%(annotation_color)s" stroke-width="0" opacity="%(annotation_opacity)s" visibility="hidden"/>
+<text id="bottom_annotation_%(salt)s" text-anchor="middle" x="%(half_width)s" y="%(bottom_annotation_y)s" fill="%(annotation_text_color)s" font-family="%(annotation_family)s" font-size="%(annotation_size)s" visibility="hidden"></text>"""
+
+def load_style(mcd, common):
     style = common.load_style()
     for (k, v) in style.items():
         if k.endswith("_color") and v is None:
             style[k] = "none"
     mcd.calculate_size(style)
+    return style
+
+
+def generate_script(mcd, common):
+    params = common.params
+    style = load_style(mcd, common)
     result = []
     result.append("#!/usr/bin/env python")
     result.append("# encoding: utf-8")
@@ -25,7 +89,7 @@ def main(mcd, common):
     result.append("from __future__ import division\nfrom math import hypot\n")
     result.append("import time, codecs\n")
     result.extend(common.process_geometry(mcd, style))
-    for name in ["card_max_width", "card_max_height", "card_margin", "arrow_width", "arrow_half_height", "arrow_axis", "card_baseline"]:
+    for name in constant_names:
         result.append("%s = %s" % (name, style[name]))
     result.append(read_contents(os.path.join(params["script_directory"], "drawing_helpers.py")))
     result.append(read_contents(os.path.join(params["script_directory"], "drawing_helpers_svg.py")))
@@ -33,29 +97,6 @@ def main(mcd, common):
     result.append("""lines += '\\n\\n<svg width="%s" height="%s" view_box="0 0 %s %s"\\nxmlns="http://www.w3.org/2000/svg"\\nxmlns:link="http://www.w3.org/1999/xlink">' % (width,height,width,height)""")
     result.append(_("""lines += u'\\n\\n<desc>Generated by Mocodo {version} on {date}</desc>'""").format(version=version, date="%s") + """ % time.strftime("%a, %d %b %Y %H:%M:%S", time.localtime())""")
     result.append("""lines += '\\n\\n<rect id="frame" x="0" y="0" width="%s" height="%s" fill="%s" stroke="none" stroke-width="0"/>' % (width,height,colors['background_color'] if colors['background_color'] else "none")""")
-    commands = {
-        "round_rect":         """<rect x="%(x)s" y="%(y)s" width="%(w)s" height="%(h)s" fill="%(color)s" rx="%(radius)s" stroke="%(stroke_color)s" stroke-width="%(stroke_depth)s"/>""",
-        "lower_round_rect":   """<path d="%(path)s" fill="%(color)s" stroke="%(stroke_color)s" stroke-width="%(stroke_depth)s"/>""",
-        "upper_round_rect":   """<path d="%(path)s" fill="%(color)s" stroke="%(stroke_color)s" stroke-width="%(stroke_depth)s"/>""",
-        "arrow":              """<path d="%(path)s" fill="%(stroke_color)s" stroke-width="0"/>""",
-        "curve":              """<path d="M%(x0)s %(y0)s C %(x1)s %(y1)s %(x2)s %(y2)s %(x3)s %(y3)s" fill="none" stroke="%(stroke_color)s" stroke-width="%(stroke_depth)s"/>""",
-        "line":               """<line x1="%(x0)s" y1="%(y0)s" x2="%(x1)s" y2="%(y1)s" stroke="%(stroke_color)s" stroke-width="%(stroke_depth)s"/>""",
-        "dash_line":          """<line x1="%(x0)s" y1="%(y)s" x2="%(x1)s" y2="%(y)s" style="fill:none;stroke:%(stroke_color)s;stroke-width:%(stroke_depth)s;stroke-dasharray:%(dash_width)s;"/>""",
-        "rect":               """<rect x="%(x)s" y="%(y)s" width="%(w)s" height="%(h)s" fill="%(color)s" stroke="%(stroke_color)s" stroke-width="%(stroke_depth)s"/>""",
-        "circle":             """<circle cx="%(cx)s" cy="%(cy)s" r="%(r)s" stroke="%(stroke_color)s" stroke-width="%(stroke_depth)s" fill="%(color)s"/>""",
-        "text":               """<text x="%(x)s" y="%(y)s" fill="%(text_color)s" font-family="%(family)s" font-size="%(size)s">%(text)s</text>""",
-        "straight_leg":       """<line x1="%(ex)s" y1="%(ey)s" x2="%(ax)s" y2="%(ay)s" stroke="%(stroke_color)s" stroke-width="%(stroke_depth)s"/>""",
-        "straight_card":      """<text x="%(tx)s" y="%(ty)s" fill="%(text_color)s" font-family="%(family)s" font-size="%(size)s">%(text)s</text>""",
-        "straight_arrow":     """<path d="%(path)s" fill="%(stroke_color)s" stroke-width="0"/>""",
-        "straight_card_note": """<text x="%(tx)s" y="%(ty)s" fill="%(text_color)s" font-family="%(family)s" font-size="%(size)s" onmouseover="show(evt,'%(annotation)s')" onmouseout="hide(evt)" style="cursor: pointer;">%(text)s</text>""",
-        "curved_leg":         """<path d="M%(x0)s %(y0)s C %(x1)s %(y1)s %(x2)s %(y2)s %(x3)s %(y3)s" fill="none" stroke="%(stroke_color)s" stroke-width="%(stroke_depth)s"/>""",
-        "curved_card":        """<text x="%(tx)s" y="%(ty)s" fill="%(text_color)s" font-family="%(family)s" font-size="%(size)s">%(text)s</text>""",
-        "curved_arrow":       """<path d="%(path)s" fill="%(stroke_color)s" stroke-width="0"/>""",
-        "curved_card_note":   """<text x="%(tx)s" y="%(ty)s" fill="%(text_color)s" font-family="%(family)s" font-size="%(size)s" onmouseover="show(evt,'%(annotation)s')" onmouseout="hide(evt)" style="cursor: pointer;">%(text)s</text>""",
-        "card_underline":     """<line x1="%(tx)s" y1="%(uy)s" x2="%(ux)s" y2="%(uy)s" stroke="%(stroke_color)s" stroke-width="%(stroke_depth)s"/>""",
-        "begin":              """<g id="%(id)s">""",
-        "end":                """</g>""",
-    }
     others = {}
     tabs = 0
     rex = re.compile(r"(?<=%\().+?(?=\)s)")
@@ -132,6 +173,129 @@ def main(mcd, common):
         result.append("""lines += '\\n<rect id="bottom_overlay_%s" x="0" y="%%s" width="%%s" height="%%s" fill="%%s" stroke-width="0" opacity="%%s" visibility="hidden"/>' %% (height-annotation_overlay_height, width, annotation_overlay_height, annotation_color, annotation_opacity)""" % salt)
         result.append("""lines += '\\n<text id="bottom_annotation_%s" text-anchor="middle" x="%%s" y="%%s" fill="%%s" font-family="%%s" font-size="%%s" visibility="hidden"></text>' %% (width/2, height-annotation_overlay_height+annotation_baseline, annotation_text_color, annotation_font['family'], annotation_font['size'])""" % salt)
     result.append("""lines += u'\\n</svg>'""")
+    return result
+
+
+def get_compiled_helpers(script_directory):
+    
+    def get_code(name):
+        path = os.path.join(script_directory, name)
+        if SourceFileLoader: # reuse (or create) the bytecode cached by the import system
+            return SourceFileLoader(name[:-len(".py")], path).get_code(None)
+        return compile(read_contents(path), name, "exec")
+    
+    if script_directory not in compiled_helpers:
+        compiled_helpers[script_directory] = [get_code(name) for name in ("drawing_helpers.py", "drawing_helpers_svg.py")]
+    return compiled_helpers[script_directory]
+
+
+def render(mcd, common, write=None):
+    """ Draw the SVG without generating any intermediate Python script. The
+        output is streamed through `write`, or returned as a string if omitted. """
+    if write is None:
+        chunks = []
+        render(mcd, common, chunks.append)
+        return "".join(chunks)
+    params = common.params
+    style = load_style(mcd, common)
+    geometry = common.geometry(mcd, style)
+    (width, height) = geometry.pop(0)[1]
+    env = dict((name, dict(items)) for (name, items) in geometry)
+    env.update((name, style[name]) for name in constant_names)
+    env.update(hypot=hypot, width=width, height=height)
+    for code in get_compiled_helpers(params["script_directory"]):
+        exec(code, env)
+    colors = env["colors"]
+    expressions = {}
+    
+    def evaluate(expression):
+        if expression not in expressions:
+            expressions[expression] = compile(expression, "<mocodo>", "eval")
+        return eval(expressions[expression], env)
+    
+    def value(x):
+        return evaluate(x) if isinstance(x, Dynamic) else x
+    
+    write('<?xml version="1.0" standalone="no"?>\n<!DOCTYPE svg PUBLIC "-//W3C//DTD SVG 1.1//EN"\n"http://www.w3.org/Graphics/SVG/1.1/DTD/svg11.dtd">')
+    write('\n\n<svg width="%s" height="%s" view_box="0 0 %s %s"\nxmlns="http://www.w3.org/2000/svg"\nxmlns:link="http://www.w3.org/1999/xlink">' % (width, height, width, height))
+    write(u'\n\n<desc>%s</desc>' % common.timestamp())
+    write('\n\n<rect id="frame" x="0" y="0" width="%s" height="%s" fill="%s" stroke="none" stroke-width="0"/>' % (width, height, colors['background_color'] if colors['background_color'] else "none"))
+    others = {}
+    tabs = 0
+    rex = re.compile(r"(?<=%\().+?(?=\)s)")
+    has_note_card = False
+    for d in mcd.description():
+        if isinstance(d, dict):
+            if d["key"] == "env":
+                values = [evaluate(expression) for (_, expression) in d["env"]]
+                for (names, x) in zip((names for (names, _) in d["env"]), values):
+                    if "," in names:
+                        env.update(zip(names.split(","), x))
+                    else:
+                        env[names] = x
+            else:
+                if d["key"] == "straight_leg":
+                    env["leg"] = env["straight_leg_factory"](*([value(d[k]) for k in ("ex", "ey", "ew", "eh", "ax", "ay", "aw", "ah")] + [d["cw"] + 2 * env["card_margin"], d["ch"] + 2 * env["card_margin"]]))
+                elif d["key"] in ("straight_card", "straight_card_note"):
+                    (env["tx"], env["ty"]) = env["offset"](*env["leg"].card_pos(d["twist"], env["shift"][d["leg_identifier"]]))
+                elif d["key"] in ("curved_card", "curved_card_note"):
+                    (env["tx"], env["ty"]) = env["offset"](*env["leg"].card_pos(env["shift"][d["leg_identifier"]]))
+                elif d["key"] == "curved_leg":
+                    env["leg"] = env["curved_leg_factory"](*([value(d[k]) for k in ("ex", "ey", "ew", "eh", "ax", "ay", "aw", "ah")] + [d["cw"] + 2 * env["card_margin"], d["ch"] + 2 * env["card_margin"], d["spin"]]))
+                    env.update(zip(("x0", "y0", "x1", "y1", "x2", "y2", "x3", "y3"), env["leg"].points))
+                elif d["key"] in ("straight_arrow", "curved_arrow"):
+                    env["path"] = env["arrow"](*env["leg"].arrow_pos(d["direction"], env["ratio"][d["leg_identifier"]]))
+                elif d["key"] == "card_underline":
+                    (env["ux"], env["uy"]) = (env["tx"] + d["w"], env["ty"] - d["skip"])
+                elif d["key"] in ("upper_round_rect", "lower_round_rect"):
+                    env["path"] = env[d["key"]](*[value(d[k]) for k in ("x", "y", "w", "h", "radius")])
+                elif d["key"] == "arrow":
+                    env["path"] = env["arrow"](*[value(d[k]) for k in ("x", "y", "a", "b")])
+                elif d["key"] in ("color", "stroke_color"):
+                    others[d["key"]] = Dynamic(d[d["key"]])
+                elif d["key"] == "stroke_depth":
+                    others["stroke_depth"] = d["stroke_depth"]
+                if d["key"].endswith("note"):
+                    has_note_card = True
+                tabs -= (1 if d["key"] == "end" else 0)
+                if d["key"] in commands:
+                    d.update(others)
+                    line = commands[d["key"]]
+                    sub_dict = {}
+                    for k in rex.findall(line):
+                        if k not in d:
+                            sub_dict[k] = env[k]
+                        elif isinstance(d[k], Dynamic):
+                            sub_dict[k] = evaluate(d[k])
+                        else:
+                            sub_dict[k] = d[k]
+                    write(u"\n" + "\t" * tabs + line % sub_dict)
+                tabs = tabs + (1 if d["key"] == "begin" else 0)
+        else:
+            write(u"\n\n<!-- %s -->" % d)
+    if has_note_card and not params["hide_annotations"]:
+        salt = ''.join(random.SystemRandom().choice(string.ascii_letters + string.digits) for _ in range(8)) # prevent the same identifiers to appear in several figures of the same notebook
+        data = dict(style, salt=salt, width=width, height=height, half_width=width / 2)
+        data["top"] = height - style["annotation_overlay_height"] - style["card_margin"]
+        data["bottom_overlay_y"] = height - style["annotation_overlay_height"]
+        data["bottom_annotation_y"] = height - style["annotation_overlay_height"] + style["annotation_baseline"]
+        data["annotation_family"] = style["annotation_font"]["family"]
+        data["annotation_size"] = style["annotation_font"]["size"]
+        write(annotation_script % data)
+    write(u'\n</svg>')
+
+
+def dump_svg_file(mcd, common):
+    path = u"%(output_name)s.svg" % common.params
+    svg = render(mcd, common) # nothing is written if the rendering fails
+    with codecs.open(path, "w", "utf8") as f:
+        f.write(svg)
+    safe_print_for_PHP(common.output_success_message(path))
+
+
+def main(mcd, common):
+    params = common.params
+    result = generate_script(mcd, common)
     result.append("""\nwith codecs.open(r"%(output_name)s.svg", "w", "utf8") as f:\n    f.write(lines)""" % params)
     result.append((_("""safe_print_for_PHP(r'Output file "{output_name}.svg" successfully generated.')""").format(output_name=params["output_name"])))
     common.dump_output_file("\n".join(result))
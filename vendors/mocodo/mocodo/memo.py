@@ -0,0 +1,52 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+from collections import namedtuple, OrderedDict
+
+try:
+    from functools import lru_cache
+except ImportError: # Python 2
+    lru_cache = None
+
+MEMO_MAXSIZE = 1 << 16 # default number of results kept by a memoized function
+
+CacheInfo = namedtuple("CacheInfo", "hits misses maxsize currsize")
+
+class LruMemo(object):
+    """ Pure Python version of functools.lru_cache, which Python 2 lacks. """
+
+    def __init__(self, func, maxsize):
+        self.func = func
+        self.maxsize = maxsize
+        self.cache = OrderedDict()
+        self.hits = self.misses = 0
+
+    def __call__(self, *args):
+        try:
+            result = self.cache.pop(args)
+            self.hits += 1
+        except KeyError:
+            result = self.func(*args)
+            self.misses += 1
+            if self.maxsize is not None and len(self.cache) >= self.maxsize:
+                self.cache.popitem(last=False)
+        self.cache[args] = result
+        return result
+
+    def cache_info(self):
+        return CacheInfo(self.hits, self.misses, self.maxsize, len(self.cache))
+
+    def cache_clear(self):
+        self.cache.clear()
+        self.hits = self.misses = 0
+
+def memoize(func=None, maxsize=MEMO_MAXSIZE):
+    """ Decorator caching the results of a function, either directly (@memoize) or with a given size
+        (@memoize(maxsize=...)). At most maxsize results are kept (no limit if None), the least recently
+        used being evicted first. As with functools.lru_cache, the decorated function provides the
+        counters cache_info() and the hook cache_clear(). """
+    if func is None:
+        return lambda func: memoize(func, maxsize)
+    if lru_cache:
+        return lru_cache(maxsize)(func)
+    return LruMemo(func, maxsize)
@@ -1,13 +1,14 @@
 #!/usr/bin/env python
 # encoding: utf-8
 
-import textwrap
 import sys
 
 class MocodoError(Exception):
     
     def __init__(self, errno, message):
+        self.errno = errno
         if sys.version_info.major == 2:
             message = message.encode("utf-8")
+        import textwrap # deferred, since most runs raise no error
         message = textwrap.fill("Mocodo Err.%s - %s" % (errno, message), 80)
         super(MocodoError, self).__init__(message)
@@ -9,24 +9,100 @@ import random
 from .file_helpers import read_contents
 import itertools
 import os
-from .damerau_levenshtein import damerau_levenshtein
+from collections import Counter
+from .damerau_levenshtein import bounded_damerau_levenshtein
 from .mocodo_error import MocodoError
 
+words_cache = {} # lorem text -> list of its distinct words
+
+
+DELETION_VARIANTS_MAX = 2000 # beyond, the chunks are indexed by their bigrams
+
+
+class ChunkIndex:
+    """ The chunks accepted so far, indexed in order to compare a candidate with the only chunks
+        which may lie within the given Damerau-Levenshtein distance (the bound).
+        
+        When the chunks are short enough, they are indexed by their variants obtained by deleting
+        up to bound characters: any edit operation between two strings can be emulated by deleting
+        at most one character in each of them, thus two strings within the bound have a variant
+        in common.
+        
+        Otherwise, they are bucketed by length and indexed by their bigrams: a string of length n
+        has n - 1 bigrams, and each edit operation destroys at most three of them, thus two
+        strings of lengths n and m at a distance d share at least max(n, m) - 1 - 3 * d bigrams. """
+    
+    def __init__(self, bound, max_length):
+        self.bound = bound
+        self.chunks = []
+        variant_count = combinations = 1
+        for i in range(1, bound + 1):
+            combinations = combinations * (max_length - i + 1) // i
+            variant_count += combinations
+        self.by_variant = {} if variant_count <= DELETION_VARIANTS_MAX else None
+        self.by_length = {}
+        self.by_bigram = {} # bigram -> list of (chunk index, number of occurrences)
+    
+    def add(self, chunk):
+        i = len(self.chunks)
+        self.chunks.append(chunk)
+        if self.by_variant is not None:
+            for variant in get_deletion_variants(chunk, self.bound):
+                self.by_variant.setdefault(variant, []).append(i)
+            return
+        self.by_length.setdefault(len(chunk), []).append(i)
+        for (bigram, occurrences) in get_bigrams(chunk).items():
+            self.by_bigram.setdefault(bigram, []).append((i, occurrences))
+    
+    def get_candidates(self, chunk):
+        """ Return the indexes of the chunks which may lie within the bound distance of the given one. """
+        if self.by_variant is not None:
+            candidates = set()
+            for variant in get_deletion_variants(chunk, self.bound):
+                candidates.update(self.by_variant.get(variant, ()))
+            return candidates
+        shared_bigrams = Counter()
+        for (bigram, occurrences) in get_bigrams(chunk).items():
+            for (i, other_occurrences) in self.by_bigram.get(bigram, ()):
+                shared_bigrams[i] += min(occurrences, other_occurrences)
+        candidates = []
+        for length in range(max(0, len(chunk) - self.bound), len(chunk) + self.bound + 1):
+            threshold = max(len(chunk), length) - 1 - 3 * self.bound
+            candidates.extend(i for i in self.by_length.get(length, ()) if shared_bigrams[i] >= threshold)
+        return candidates
+    
+    def has_neighbor(self, chunk):
+        """ Tell whether some chunk lies within the bound distance of the given one. """
+        for i in self.get_candidates(chunk):
+            if bounded_damerau_levenshtein(chunk, self.chunks[i], self.bound) <= self.bound:
+                # print "_%s_ (possible confusion with _%s_)," % (chunk, self.chunks[i])
+                return True
+        return False
+
+
+def get_deletion_variants(chunk, count):
+    result = layer = set([chunk])
+    for _ in range(count):
+        layer = set(string[:i] + string[i + 1:] for string in layer for i in range(len(string)))
+        result = result.union(layer)
+    return result
+
+def get_bigrams(chunk):
+    return Counter(chunk[i:i + 2] for i in range(len(chunk) - 1))
+
 def random_chunks_of(lorem_text, obfuscation_max_length, params):
-    words = list(set(word.lower() for word in re.findall(r"(?u)[^\W\d]+", lorem_text)))
+    if lorem_text not in words_cache:
+        words_cache[lorem_text] = list(set(word.lower() for word in re.findall(r"(?u)[^\W\d]+", lorem_text)))
+    words = list(words_cache[lorem_text])
     random.shuffle(words)
     if obfuscation_max_length is None:
         obfuscation_max_length = max(map(len, words))
         raw_chunks = iter(textwrap.wrap(" ".join(words), width=obfuscation_max_length))
     else:
         raw_chunks = iter(label for label in textwrap.wrap(" ".join(words), width=obfuscation_max_length, break_long_words=False) if len(label) <= obfuscation_max_length)
-    previous_chunks = set()
+    previous_chunks = ChunkIndex(params["obfuscation_min_distance"] - 1, obfuscation_max_length)
     for chunk in raw_chunks:
-        for previous_chunk in previous_chunks:
-            if damerau_levenshtein(chunk, previous_chunk) < params["obfuscation_min_distance"]:
-                # print "_%s_ (possible confusion with _%s_)," % (chunk, previous_chunk)
-                break
-        else:
+        if not previous_chunks.has_neighbor(chunk):
             yield chunk
             previous_chunks.add(chunk)
 
@@ -4,12 +4,121 @@
 from __future__ import division
 
 import re
+import json
+import string
 import collections
 import itertools
-import unicodedata
 import os
 from .file_helpers import write_contents
 from .mocodo_error import MocodoError
+from .memo import memoize
+
+compiled_transformations = {}
+TEMPLATE_MEMO_MAXSIZE = 1 << 6 # number of compiled templates kept by the process
+TRANSFORM_MEMO_MAXSIZE = 1 << 12 # number of transformed strings kept by each compiled template
+
+def compile_transformation(rules):
+    """ Compile once a list of search/replace rules, possibly shared by several templates. """
+    key = json.dumps(rules, sort_keys=True)
+    if key not in compiled_transformations:
+        compiled_transformations[key] = [(re.compile(rule["search"]), rule["replace"], rule.get("iterated")) for rule in rules]
+    return compiled_transformations[key]
+
+def compile_template(template):
+    """ Return the compiled version of a relation template (or the template itself if it is already
+        compiled), cached by contents. """
+    if isinstance(template, RelationTemplate):
+        return template
+    return compile_template_contents(json.dumps(template, sort_keys=True))
+
+@memoize(maxsize=TEMPLATE_MEMO_MAXSIZE)
+def compile_template_contents(contents):
+    return RelationTemplate(json.loads(contents))
+
+
+class RelationTemplate:
+    """ A relation template with its defaults resolved, its regular expressions compiled, and its
+        composition strings turned into formatting functions. Only the case variants (lowercase,
+        uppercase, titlecase) actually referred to by the composition strings are computed. """
+
+    def __init__(self, template):
+        
+        def set_defaults(template):
+            result = {
+              "transform_attribute": [],
+              "transform_title": [],
+              "transform_data_type": [],
+              "compose_label_disambiguated_by_annotation": u"{raw_label} {leg_annotation}",
+              "compose_label_disambiguated_by_number": u"{label}.{disambiguation_number}",
+              "compose_primary_key": u"_{label}_",
+              "compose_normal_attribute": u"{label}",
+              "compose_foreign_key": u"#{label}",
+              "compose_foreign_primary_key": u"_#{label}_",
+              "transform_relation_name": [],
+              "column_sorting_key": {
+                "search": "(.+)",
+                "replace": "\\1"
+              },
+              "column_separator": ", ",
+              "compose_relation": u"{this_relation_name} ({columns})",
+              "transform_single_column_relation": [],
+              "transform_relation": [],
+              "relation_separator": "\n",
+              "relation_sorting_key": {
+                "search": "(.+)",
+                "replace": "\\1"
+              },
+              "compose_relational_schema": u"{relations}",
+              "transform_relational_schema": [],
+            }
+            result.update(template)
+            result.setdefault("compose_strengthening_primary_key", result["compose_foreign_primary_key"])
+            result.setdefault("compose_demoted_foreign_key", result["compose_foreign_key"])
+            result.setdefault("compose_promoting_foreign_key", result["compose_foreign_key"])
+            result.setdefault("compose_foreign_attribute", result["compose_normal_attribute"])
+            result.setdefault("compose_association_attribute", result["compose_normal_attribute"])
+            return result
+        
+        def make_sorting_key(d):
+            (search, replace) = (re.compile(d["search"]), d["replace"])
+            return lambda string: search.sub(replace, string)
+        
+        self.template = set_defaults(template)
+        self.transformations = dict((key, compile_transformation(value)) for (key, value) in self.template.items() if key.startswith("transform_"))
+        self.transform = memoize(self.apply_transformation, maxsize=TRANSFORM_MEMO_MAXSIZE)
+        self.compose = dict((key[len("compose_"):], value.format) for (key, value) in self.template.items() if key.startswith("compose_"))
+        self.column_sorting_key = make_sorting_key(self.template["column_sorting_key"])
+        self.relation_sorting_key = make_sorting_key(self.template["relation_sorting_key"])
+        fields = set()
+        for (key, value) in self.template.items():
+            if key.startswith("compose_"):
+                for (_, field, _, _) in string.Formatter().parse(value):
+                    if field:
+                        fields.add(re.match(r"[^.[]*", field).group())
+        self.case_variants = collections.defaultdict(list)
+        for (suffix, method) in (("_lowercase", "lower"), ("_uppercase", "upper"), ("_titlecase", "capitalize")):
+            for field in fields:
+                if field.endswith(suffix):
+                    self.case_variants[field[:-len(suffix)]].append((field, method))
+
+    def __getitem__(self, key):
+        return self.template[key]
+
+    def apply_transformation(self, string, transformation):
+        """ Apply a chain of rules. Called through self.transform, which memoizes the result. """
+        for (search, replace, iterated) in self.transformations[transformation]:
+            while True:
+                (string, n) = search.subn(replace, string)
+                if n == 0 or not iterated:
+                    break
+        return string
+
+    def add_case_variants(self, d, key):
+        """ Add to the dictionary d the case variants of d[key] referred to by the template. """
+        value = d[key]
+        for (field, method) in self.case_variants.get(key, ()):
+            d[field] = value and getattr(value, method)()
+
 
 class Relations:
 
@@ -17,15 +126,11 @@ class Relations:
         
         def set_disambiguation_strategy(strategy):
             if strategy == "numbers_only":
-                def inner_function(template):
-                    for relation in self.relations.values():
-                        for column in relation["columns"]:
-                            column["label"] = column["raw_label"]
+                def inner_function(template, column):
+                    return column["raw_label"]
             elif strategy == "annotations":
-                def inner_function(template):
-                    for relation in self.relations.values():
-                        for column in relation["columns"]:
-                            column["label"] = column["raw_label"] if column["leg_annotation"] is None else template["compose_label_disambiguated_by_annotation"].format(**column)
+                def inner_function(template, column):
+                    return column["raw_label"] if column["leg_annotation"] is None else template.compose["label_disambiguated_by_annotation"](**column)
             else:
                 raise NotImplemented
             return inner_function
@@ -44,6 +149,7 @@ class Relations:
                 return
             title = counter.most_common(1)[0][0][0]
             title = title.lower().replace(u"œ", "oe").replace(u"æ", "ae")
+            import unicodedata
             title = unicodedata.normalize('NFKD', title).encode('ascii', 'ignore')
             title = re.sub("[^-A-Za-z0-9 _]", "", title)
             if params["language"].startswith("fr"):
@@ -63,132 +169,112 @@ class Relations:
         self.strengthen_weak_identifiers()
         self.process_associations()
         self.add_sorting_this_relation_number()
-        self.may_disambiguate_with_leg_annotations = set_disambiguation_strategy(params["disambiguation"])
+        self.sorted_relations = sorted(self.relations.values(), key=lambda v: v["this_relation_number"])
+        self.labels = {}
+        self.disambiguate_with_leg_annotations = set_disambiguation_strategy(params["disambiguation"])
         may_update_params_with_guessed_title()
 
     
+    def get_texts(self, templates):
+        """ Generate the relational schemas of several templates from the same column model. Yield the
+            pairs (template, text) in the order of the templates, as soon as they are available. """
+        for template in templates:
+            template = compile_template(template)
+            yield (template, self.get_text(template))
+
+    def get_labels(self, template):
+        """ Return, for each relation, the raw label, the label and the disambiguation number of its
+            columns. They only depend on the attribute transformation and on the composition of the
+            disambiguated labels, and are thus shared by most templates. """
+        key = (
+            id(template.transformations["transform_attribute"]),
+            template["compose_label_disambiguated_by_annotation"],
+            template["compose_label_disambiguated_by_number"],
+        )
+        if key in self.labels:
+            return self.labels[key]
+        transform = template.transform
+        compose_label_disambiguated_by_number = template.compose["label_disambiguated_by_number"]
+        result = {}
+        for relation in self.relations.values():
+            columns = []
+            for column in relation["columns"]:
+                raw_label = transform(column["attribute"], "transform_attribute")
+                column = dict(column,
+                    raw_label=raw_label,
+                    raw_label_lowercase=raw_label.lower(),
+                    raw_label_uppercase=raw_label.upper(),
+                    raw_label_titlecase=raw_label.capitalize(),
+                )
+                column["label"] = self.disambiguate_with_leg_annotations(template, column)
+                columns.append(column)
+            occurrences = collections.Counter(column["label"] for column in columns)
+            occurrences = dict(c for c in occurrences.items() if c[1] > 1)
+            for column in reversed(columns):
+                column["disambiguation_number"] = None
+                if column["label"] in occurrences:
+                    occurrences[column["label"]] -= 1
+                    if occurrences[column["label"]]:
+                        column["disambiguation_number"] = occurrences[column["label"]]
+                        column["label"] = compose_label_disambiguated_by_number(**column)
+            result[relation["this_relation_number"]] = [(column["raw_label"], column["label"], column["disambiguation_number"]) for column in columns]
+        self.labels[key] = result
+        return result
+
     def get_text(self, template):
-        
-        def transform(string, transformation):
-            for d in template[transformation]:
-                while True:
-                    (string, n) = re.subn(d["search"], d["replace"], string)
-                    if n == 0 or not d.get("iterated"):
-                        break
-            return string
-        
-        def extract_sorting_key(string, transformation):
-            d = template[transformation]
-            return re.sub(d["search"], d["replace"], string)
-        
-        def set_defaults(template):
-            result = {
-              "transform_attribute": [],
-              "transform_title": [],
-              "transform_data_type": [],
-              "compose_label_disambiguated_by_annotation": u"{raw_label} {leg_annotation}",
-              "compose_label_disambiguated_by_number": u"{label}.{disambiguation_number}",
-              "compose_primary_key": u"_{label}_",
-              "compose_normal_attribute": u"{label}",
-              "compose_foreign_key": u"#{label}",
-              "compose_foreign_primary_key": u"_#{label}_",
-              "transform_relation_name": [],
-              "column_sorting_key": {
-                "search": "(.+)",
-                "replace": "\\1"
-              },
-              "column_separator": ", ",
-              "compose_relation": u"{this_relation_name} ({columns})",
-              "transform_single_column_relation": [],
-              "transform_relation": [],
-              "relation_separator": "\n",
-              "relation_sorting_key": {
-                "search": "(.+)",
-                "replace": "\\1"
-              },
-              "compose_relational_schema": u"{relations}",
-              "transform_relational_schema": [],
-            }
-            result.update(template)
-            result.setdefault("compose_strengthening_primary_key", result["compose_foreign_primary_key"])
-            result.setdefault("compose_demoted_foreign_key", result["compose_foreign_key"])
-            result.setdefault("compose_promoting_foreign_key", result["compose_foreign_key"])
-            result.setdefault("compose_foreign_attribute", result["compose_normal_attribute"])
-            result.setdefault("compose_association_attribute", result["compose_normal_attribute"])
-            return result
-        template = set_defaults(template)
-        
-        def make_raw_labels_from_attributes():
-            for relation in self.relations.values():
-                for column in relation["columns"]:
-                    column["raw_label"] = transform(column["attribute"], "transform_attribute")
-                    column["raw_label_lowercase"] = column["raw_label"].lower()
-                    column["raw_label_uppercase"] = column["raw_label"].upper()
-                    column["raw_label_titlecase"] = column["raw_label"].capitalize()
-        make_raw_labels_from_attributes()
-        
-        def make_labels_from_raw_labels():
-            self.may_disambiguate_with_leg_annotations(template)
-            for relation in self.relations.values():
-                occurrences = collections.Counter(column["label"] for column in relation["columns"])
-                occurrences = dict(c for c in occurrences.items() if c[1] > 1)
-                for column in reversed(relation["columns"]):
-                    if column["label"] in occurrences:
-                        occurrences[column["label"]] -= 1
-                        if occurrences[column["label"]]:
-                            column["disambiguation_number"] = occurrences[column["label"]]
-                            column["label"] = template["compose_label_disambiguated_by_number"].format(**column)
-                        else:
-                            column["disambiguation_number"] = None
-                    else:
-                        column["disambiguation_number"] = None
-                    column["label_lowercase"] = column["label"].lower()
-                    column["label_uppercase"] = column["label"].upper()
-                    column["label_titlecase"] = column["label"].capitalize()
-        make_labels_from_raw_labels()
+        template = compile_template(template)
+        transform = template.transform
+        add_case_variants = template.add_case_variants
+        labels = self.get_labels(template)
         
         # pprint.pprint(self.relations)
+        compose = template.compose
         data = {}
         data["title"] = transform(self.mcd.title, "transform_title")
-        data["title_lowercase"] = data["title"].lower()
-        data["title_uppercase"] = data["title"].upper()
-        data["title_titlecase"] = data["title"].capitalize()
+        add_case_variants(data, "title")
         lines = []
-        for relation in sorted(self.relations.values(), key=lambda v: v["this_relation_number"]):
+        for relation in self.sorted_relations:
             data["this_relation_name"] = transform(relation["this_relation_name"], "transform_relation_name")
-            data["this_relation_name_lowercase"] = data["this_relation_name"].lower()
-            data["this_relation_name_uppercase"] = data["this_relation_name"].upper()
-            data["this_relation_name_titlecase"] = data["this_relation_name"].capitalize()
+            add_case_variants(data, "this_relation_name")
             data["this_relation_number"] = relation["this_relation_number"]
             fields = []
-            for column in relation["columns"]:
+            for (column, (raw_label, label, disambiguation_number)) in zip(relation["columns"], labels[relation["this_relation_number"]]):
                 data.update(column)
-                data["primary_relation_name_lowercase"] = data["primary_relation_name"] and data["primary_relation_name"].lower()
-                data["primary_relation_name_uppercase"] = data["primary_relation_name"] and data["primary_relation_name"].upper()
-                data["primary_relation_name_titlecase"] = data["primary_relation_name"] and data["primary_relation_name"].capitalize()
-                data["association_name_lowercase"] = data["association_name"] and data["association_name"].lower()
-                data["association_name_uppercase"] = data["association_name"] and data["association_name"].upper()
-                data["association_name_titlecase"] = data["association_name"] and data["association_name"].capitalize()
-                fields.append(template["compose_%s" % column["nature"]].format(**data))
-            data["sorted_columns"] = template["column_separator"].join(sorted(fields, key=lambda field: extract_sorting_key(field, "column_sorting_key")))
+                data["raw_label"] = raw_label
+                data["label"] = label
+                data["disambiguation_number"] = disambiguation_number
+                add_case_variants(data, "raw_label")
+                add_case_variants(data, "label")
+                add_case_variants(data, "primary_relation_name")
+                add_case_variants(data, "association_name")
+                fields.append(compose[column["nature"]](**data))
+            data["sorted_columns"] = template["column_separator"].join(sorted(fields, key=template.column_sorting_key))
             data["columns"] = template["column_separator"].join(fields)
-            line = template["compose_relation"].format(**data)
+            line = compose["relation"](**data)
             if len(relation["columns"]) == 1:
                 line = transform(line, "transform_single_column_relation")
             line = transform(line, "transform_relation")
             lines.append(line)
         if template["extension"] == ".mld":
+            lines_by_relation_name = {}
+            for line in lines:
+                lines_by_relation_name.setdefault(line.split(":", 1)[0], line)
+            def find_line(cartouche):
+                if ":" not in cartouche:
+                    return lines_by_relation_name.get(cartouche)
+                for line in lines:
+                    if line.startswith(cartouche + ":"):
+                        return line
             rows = [[]]
             all_commas = [True] * self.mcd.col_count
             for row in self.mcd.rows:
                 for (i, box) in enumerate(row):
-                    for line in lines:
-                        if line.startswith(box.cartouche + ":"):
-                            rows[-1].append(line)
-                            all_commas[i] = False
-                            break
-                    else:
+                    line = find_line(box.cartouche)
+                    if line is None:
                         rows[-1].append(":")
+                    else:
+                        rows[-1].append(line)
+                        all_commas[i] = False
                 rows.append([])
             rows.pop()
             for row in rows:
@@ -202,8 +288,8 @@ class Relations:
                 lines.append("\n")
             lines.pop()
         data["relations"] = template["relation_separator"].join(lines)
-        data["sorted_relations"] = template["relation_separator"].join(sorted(lines, key=lambda line: extract_sorting_key(line, "relation_sorting_key")))
-        data["relations"] = template["compose_relational_schema"].format(**data)
+        data["sorted_relations"] = template["relation_separator"].join(sorted(lines, key=template.relation_sorting_key))
+        data["relations"] = compose["relational_schema"](**data)
         result = transform(data["relations"], "transform_relational_schema")
         return result
 
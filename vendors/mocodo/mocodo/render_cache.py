@@ -0,0 +1,88 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+from __future__ import division
+
+import os
+import json
+import hashlib
+from .file_helpers import read_contents, write_contents
+from .version_number import version
+
+RENDERING_PARAMS = ["df", "card_format", "strengthen_card", "flex", "tkinter", "hide_annotations", "disambiguation", "title", "language"]
+
+
+class RenderCache:
+    """ On-disk cache of the SVG and relational outputs. An entry is keyed by a hash of everything
+        these outputs depend on: the clauses, the effective style, the contents of the relation
+        templates, the options affecting the rendering and the version of Mocodo. The least recently
+        used entries are evicted as soon as the total size of the directory exceeds max_size bytes. """
+
+    def __init__(self, directory, max_size):
+        self.directory = directory
+        self.max_size = max_size
+
+    def get_key(self, common, clauses, with_svg=True):
+        """ Return the key of the outputs of the given clauses, or None if some relation template
+            cannot be loaded (the regular path will then report the problem). """
+        try:
+            relation_templates = [common.load_relation_template(name) for name in common.params["relations"]]
+        except (IOError, OSError, ValueError):
+            return None
+        contents = {
+            "version": version,
+            "clauses": clauses,
+            "style": common.load_style(),
+            "relation_templates": relation_templates,
+            "params": dict((key, common.params.get(key)) for key in RENDERING_PARAMS),
+            "svg": with_svg,
+        }
+        return hashlib.sha1(json.dumps(contents, sort_keys=True, ensure_ascii=False).encode("utf8")).hexdigest()
+
+    def get_path(self, key):
+        return os.path.join(self.directory, "%s.json" % key)
+
+    def load(self, key):
+        """ Return the entry {svg, mld} of the given key, and mark it as recently used. """
+        path = self.get_path(key)
+        try:
+            entry = json.loads(read_contents(path))
+            os.utime(path, None)
+        except (IOError, OSError, ValueError):
+            return None
+        return entry
+
+    def save(self, key, svg, mld):
+        """ Store the SVG (None if not drawn) and the texts of the relational schemas, in the order
+            of the relation templates. """
+        if not os.path.isdir(self.directory):
+            os.makedirs(self.directory)
+        path = self.get_path(key)
+        write_contents(path + ".tmp", json.dumps({"svg": svg, "mld": mld}, ensure_ascii=False))
+        if os.path.exists(path):
+            os.remove(path)
+        os.rename(path + ".tmp", path)
+        self.evict(path)
+
+    def evict(self, keep=None):
+        entries = []
+        for filename in os.listdir(self.directory):
+            path = os.path.join(self.directory, filename)
+            if filename.endswith(".json") and path != keep:
+                try:
+                    stat = os.stat(path)
+                except OSError: # removed by a concurrent process
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+        entries.sort()
+        total_size = sum(size for (_, size, _) in entries)
+        if keep:
+            total_size += os.path.getsize(keep)
+        for (_, size, path) in entries:
+            if total_size <= self.max_size:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            total_size -= size
@@ -0,0 +1,77 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+from __future__ import division
+import sys
+sys.path[0:0] = ["."]
+
+import os
+import json
+import shutil
+import tempfile
+import unittest
+import mocodo
+from mocodo.api import get_default_params
+from mocodo.common import Common, style_cache, relation_template_cache
+from mocodo.mocodo_error import MocodoError
+
+import gettext
+gettext.NullTranslations().install()
+
+clauses = u"""
+    CLIENT: Réf. client, Nom, Prénom, Adresse
+    PASSER, 0N CLIENT, 11 COMMANDE
+    COMMANDE: Num commande, Date, Montant
+""".replace("    ", "")
+
+class ApiTest(unittest.TestCase):
+
+    def test_svg_and_relations(self):
+        result = mocodo.render(clauses, relations=["text", "markdown"])
+        self.assertTrue(result["svg"].startswith("<?xml"))
+        self.assertTrue(result["svg"].endswith("</svg>"))
+        self.assertEqual(sorted(result["mld"]), ["markdown", "text"])
+        self.assertEqual(result["mld"]["text"], u"CLIENT (_Réf. client_, Nom, Prénom, Adresse)\nCOMMANDE (_Num commande_, Date, Montant, #Réf. client)")
+
+    def test_relations_as_string(self):
+        result = mocodo.render(clauses, relations="text", no_mcd=True)
+        self.assertIsNone(result["svg"])
+        self.assertEqual(list(result["mld"]), ["text"])
+
+    def test_unknown_template(self):
+        self.assertRaisesRegex(MocodoError, r"^Mocodo Err\.23 - ", mocodo.render, clauses, relations=["foobar"])
+
+    def test_caches(self):
+        mocodo.render(clauses, relations=["text"])
+        self.assertTrue(style_cache)
+        self.assertTrue(any(path.endswith("text.json") for (path, _, _) in relation_template_cache))
+        common = Common(get_default_params())
+        style = common.load_style()
+        style["card_font"]["family"] = "foobar"
+        self.assertNotEqual(common.load_style()["card_font"]["family"], "foobar")
+        template = common.load_relation_template("text")
+        template["extension"] = "foobar"
+        self.assertNotEqual(common.load_relation_template("text")["extension"], "foobar")
+
+    def test_edited_style_is_reloaded(self):
+        directory = tempfile.mkdtemp()
+        try:
+            params = dict(get_default_params())
+            path = os.path.join(params["script_directory"], "colors", params["colors"] + ".json")
+            with open(path) as f:
+                colors = json.load(f)
+            params["colors"] = os.path.join(directory, "custom")
+            colors["card_text_color"] = "#000001"
+            with open(params["colors"] + ".json", "w") as f:
+                json.dump(colors, f)
+            common = Common(params)
+            self.assertEqual(common.load_style()["card_text_color"], "#000001")
+            colors["card_text_color"] = "#00000002" # another size, whatever the resolution of the mtime
+            with open(params["colors"] + ".json", "w") as f:
+                json.dump(colors, f)
+            self.assertEqual(common.load_style()["card_text_color"], "#00000002")
+        finally:
+            shutil.rmtree(directory)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -9,9 +9,11 @@ from mocodo.arrange_bb import *
 
 import unittest
 from mocodo.mcd import Mcd
-from mocodo.argument_parser import parsed_arguments
+from mocodo.argument_parser import parsed_arguments, has_expired
 from time import time
 from random import seed
+import random
+from math import hypot
 
 # WARNING: by default, this should fail for Python 3.
 # Set PYTHONHASHSEED to 0 before launching the tests.
@@ -274,6 +276,121 @@ class ArrangeBB(unittest.TestCase):
         result = mcd.get_clauses()
         self.assertEqual(expected, result)
 
+    def test_portfolio_does_not_depend_on_workers(self):
+        clauses = u"""
+            SUSPENDISSE: diam
+            SOLLICITUDIN, 0N SUSPENDISSE, 0N CONSECTETUER, 0N LOREM: lectus
+            CONSECTETUER: elit, sed
+            MAECENAS, 1N DIGNISSIM, 1N DIGNISSIM
+
+            DF1, 11 LOREM, 1N SUSPENDISSE
+            LOREM: ipsum, dolor, sit
+            TORTOR, 0N RISUS, 11 DIGNISSIM, 1N CONSECTETUER: nec
+            DIGNISSIM: ligula, massa, varius
+
+            DF, 11 RISUS, 0N RISUS
+            AMET, 11> LOREM, 01 CONSECTETUER: adipiscing
+            RISUS: ultricies, _cras, elementum
+            SEMPER, 0N RISUS, 1N DIGNISSIM
+        """.replace("  ", "")
+        params = parsed_arguments()
+        mcd = Mcd(clauses.split("\n"), params)
+        params.update(mcd.get_layout_data())
+        params["timeout"] = None
+        params["verbose"] = False
+        results = []
+        for workers in (2, 3):
+            params["workers"] = workers
+            seed(42)
+            results.append(arrange(**params))
+        self.assertEqual(results[0], results[1])
+        self.assertEqual(results[0]["crossings"], 0)
+        self.assertEqual(sorted(results[0]["coords"]), list(range(12)))
+
+    def test_organic_portfolio_with_unlinked_boxes(self):
+        clauses = u"""
+            A: a
+            R, 11 A, 1N B
+            B: b
+            C: c
+            D: d
+            E: e
+            F: f
+        """.replace("  ", "")
+        params = parsed_arguments()
+        mcd = Mcd(clauses.split("\n"), params)
+        params.update(mcd.get_layout_data())
+        params["organic"] = True
+        params["min_objective"] = 0
+        params["max_objective"] = 3
+        params["timeout"] = None
+        params["verbose"] = False
+        params["workers"] = 2
+        for i in range(10):
+            seed(i)
+            self.assertTrue(arrange(**params))
+
+    def test_portfolio_deadline_starts_with_the_command(self):
+        params = parsed_arguments()
+        mcd = Mcd(u"A: a\nR, 11 A, 1N B\nB: b\nS, 11 B, 1N C\nC: c".split("\n"), params)
+        params.update(mcd.get_layout_data())
+        params["timeout"] = 60
+        params["has_expired"] = has_expired(-1) # budget already spent before the layout
+        params["verbose"] = False
+        params["workers"] = 2
+        self.assertRaises(MocodoError, arrange, **params)
+
+    def test_expired_worker(self):
+        settings = {
+            "col_count": 2,
+            "row_count": 1,
+            "successors": [set([1]), set([0])],
+            "multiplicity": {(0, 1): 1, (1, 0): 1},
+            "organic": False,
+            "call_limit": 10,
+        }
+        init_searcher(settings, None)
+        (expired, result) = search_in_worker((0, 0, 42))
+        self.assertFalse(expired)
+        self.assertEqual(result["distances"], 0)
+        init_searcher(settings, 0)
+        self.assertEqual(search_in_worker((0, 0, 42)), (True, None))
+
+    def test_incremental_hull(self):
+        
+        def brute_force_hull(hull):
+            result = set()
+            for (x, y) in hull.occupied:
+                result.update(hull.neighbors(x, y))
+            return result.difference(hull.occupied)
+        
+        rng = random.Random(42)
+        for hull in (Hull(4, 3), Hull()):
+            placed = []
+            for _ in range(200):
+                if placed and rng.random() < 0.4:
+                    hull.remove(*placed.pop())
+                else:
+                    cell = (rng.randrange(-1, 5), rng.randrange(-1, 4)) if hull.col_count is None else (rng.randrange(4), rng.randrange(3))
+                    if cell not in hull.occupied:
+                        hull.place(*cell)
+                        placed.append(cell)
+                self.assertEqual(hull.size, len(brute_force_hull(hull)))
+
+    def test_bitboards(self):
+        from mocodo.cross import cross
+        (col_count, row_count, radius) = (4, 3, 3)
+        distances = [[hypot(i, j) - 1 for j in range(radius + 1)] for i in range(radius + 1)]
+        grid = Bitboards(col_count, row_count, radius, distances)
+        cells = lambda mask: set(grid.coords[cell] for cell in range(col_count * row_count) if mask >> cell & 1)
+        for (cell, (x1, y1)) in enumerate(grid.coords):
+            self.assertEqual(cells(grid.neighborhoods[cell]), set((x2, y2) for (x2, y2) in grid.coords if 0 < abs(x1 - x2) + abs(y1 - y2) <= radius))
+            self.assertEqual(cells(grid.adjacent_cells[cell]), set((x2, y2) for (x2, y2) in grid.coords if abs(x1 - x2) + abs(y1 - y2) == 1))
+        for (segment_id, segment) in enumerate(grid.segments):
+            mask = grid.get_crossing_mask(segment_id)
+            for (other_id, other_segment) in enumerate(grid.segments):
+                self.assertEqual(mask >> other_id & 1, int(bool(cross(*(segment + other_segment)))))
+
 
 if __name__ == '__main__':
     unittest.main()
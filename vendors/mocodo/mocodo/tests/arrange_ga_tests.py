@@ -74,5 +74,70 @@ class ArrangeGA(unittest.TestCase):
         result = mcd.get_clauses()
         self.assertEqual(expected, result)
 
+    def test_islands_do_not_depend_on_workers(self):
+        clauses = u"""
+            SUSPENDISSE: diam
+            SOLLICITUDIN, 0N SUSPENDISSE, 0N CONSECTETUER, 0N LOREM: lectus
+            CONSECTETUER: elit, sed
+            MAECENAS, 1N DIGNISSIM, 1N DIGNISSIM
+
+            DF1, 11 LOREM, 1N SUSPENDISSE
+            LOREM: ipsum, dolor, sit
+            TORTOR, 0N RISUS, 11 DIGNISSIM, 1N CONSECTETUER: nec
+            DIGNISSIM: ligula, massa, varius
+
+            DF, 11 RISUS, 0N RISUS
+            AMET, 11> LOREM, 01 CONSECTETUER: adipiscing
+            RISUS: ultricies, _cras, elementum
+            SEMPER, 0N RISUS, 1N DIGNISSIM
+        """.replace("  ", "")
+        params = parsed_arguments()
+        mcd = Mcd(clauses.split("\n"), params)
+        params.update(mcd.get_layout_data())
+        params["max_generations"] = 20
+        params["population_size"] = 60
+        params["islands"] = 3
+        params["migration_interval"] = 4
+        params["timeout"] = None
+        params["verbose"] = False
+        results = []
+        for workers in (1, 2):
+            params["workers"] = workers
+            seed(42)
+            results.append(arrange(**params))
+        self.assertEqual(results[0], results[1])
+        self.assertEqual(sorted(results[0]["layout"]), list(range(12)))
+
+    def test_workers_do_not_change_the_result(self):
+        clauses = u"""
+            SUSPENDISSE: diam
+            SOLLICITUDIN, 0N SUSPENDISSE, 0N CONSECTETUER, 0N LOREM: lectus
+            CONSECTETUER: elit, sed
+            MAECENAS, 1N DIGNISSIM, 1N DIGNISSIM
+
+            DF1, 11 LOREM, 1N SUSPENDISSE
+            LOREM: ipsum, dolor, sit
+            TORTOR, 0N RISUS, 11 DIGNISSIM, 1N CONSECTETUER: nec
+            DIGNISSIM: ligula, massa, varius
+
+            DF, 11 RISUS, 0N RISUS
+            AMET, 11> LOREM, 01 CONSECTETUER: adipiscing
+            RISUS: ultricies, _cras, elementum
+            SEMPER, 0N RISUS, 1N DIGNISSIM
+        """.replace("  ", "")
+        params = parsed_arguments()
+        mcd = Mcd(clauses.split("\n"), params)
+        params.update(mcd.get_layout_data())
+        params["max_generations"] = 10
+        params["population_size"] = 50
+        params["timeout"] = None
+        params["verbose"] = False
+        results = []
+        for workers in (1, 2):
+            params["workers"] = workers
+            seed(42)
+            results.append(arrange(**params))
+        self.assertEqual(results[0], results[1])
+
 if __name__ == '__main__':
     unittest.main()
@@ -5,7 +5,9 @@ from __future__ import division
 import sys
 sys.path[0:0] = ["."]
 
-from arrange_lp import *
+from mocodo.arrange_lp import *
+from mocodo.fitness import fitness
+from mocodo.mocodo_error import MocodoError
 
 import unittest
 from mocodo.mcd import Mcd
@@ -13,6 +15,12 @@ from mocodo.argument_parser import parsed_arguments
 from time import time
 from random import seed
 
+try:
+    import scipy.optimize
+    has_scipy = hasattr(scipy.optimize, "milp")
+except ImportError:
+    has_scipy = False
+
 clauses = u"""
     SUSPENDISSE: diam
     SOLLICITUDIN, 0N SUSPENDISSE, 0N CONSECTETUER, 0N LOREM: lectus
@@ -86,6 +94,43 @@ class ArrangeLP(unittest.TestCase):
             DF, 11 RISUS, 0N RISUS
         """.strip().replace("  ", ""))
     
+    @unittest.skipIf(not has_scipy, "SciPy is not installed")
+    def test_with_highs(self):
+        small_clauses = u"""
+            CLIENT: Réf. client, Nom
+            PASSER, 0N CLIENT, 11 COMMANDE
+            COMMANDE: Num commande, Date
+
+            PRODUIT: Réf. produit, Libellé
+            INCLURE, 1N COMMANDE, 0N PRODUIT: Quantité
+            LIVRER, 0N CLIENT, 0N PRODUIT
+        """.replace("  ", "")
+        small_params = parsed_arguments()
+        small_mcd = Mcd(small_clauses.split("\n"), small_params)
+        small_params.update(small_mcd.get_layout_data())
+        small_params["engine"] = "highs"
+        small_params["verbose"] = False
+        rearrangement = arrange(**small_params)
+        self.assertEqual(rearrangement["crossings"], 0)
+        self.assertEqual(round(rearrangement["distances"], 4), 0.0)
+        self.assertEqual(sorted(rearrangement["layout"]), list(range(6)))
+        evaluate = fitness(small_params["links"], small_params["multiplicity"], small_params["col_count"], small_params["row_count"])
+        self.assertEqual(evaluate(rearrangement["layout"]), (0, 0.0))
+        solution = solve_with_highs(build_model(decomposed=True, **small_params))
+        self.assertEqual(round(solution["distances"], 4), 0.0)
+        self.assertEqual(solution["gap"], 0)
+    
+    def test_highs_without_scipy(self):
+        saved_modules = dict((name, sys.modules.get(name)) for name in ("scipy", "scipy.optimize"))
+        sys.modules.update(dict.fromkeys(saved_modules)) # any import of SciPy now fails
+        try:
+            self.assertRaises(MocodoError, arrange, **dict(params, engine=None))
+        finally:
+            for (name, module) in saved_modules.items():
+                if module is None:
+                    del sys.modules[name]
+                else:
+                    sys.modules[name] = module
 
 
 if __name__ == '__main__':
@@ -0,0 +1,60 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+from __future__ import division
+import sys
+sys.path[0:0] = ["."]
+
+import unittest
+import io
+import os
+import json
+import tempfile
+from mocodo.batch import *
+from mocodo.api import get_default_params
+
+import gettext
+gettext.NullTranslations().install()
+
+records = [
+    {"id": 1, "source": u"CLIENT: Réf. client, Nom\nPASSER, 0N CLIENT, 11 COMMANDE\nCOMMANDE: Num commande, Date", "params": {"relations": ["text"]}},
+    {"id": "two", "source": u"FOO: bar", "params": {"relations": ["foobar"]}},
+    {"id": 3, "source": u"FOO: bar", "params": {"relations": ["text", "markdown"], "no_mcd": True}},
+]
+
+class BatchTest(unittest.TestCase):
+
+    def run_batch(self, lines, **params):
+        params = dict(get_default_params(), **dict({"batch": "-"}, **params))
+        stdout = io.StringIO()
+        run_batch(params, io.StringIO(u"\n".join(lines)), stdout)
+        return [json.loads(line) for line in stdout.getvalue().splitlines()]
+
+    def test_ndjson(self):
+        responses = self.run_batch([json.dumps(record) for record in records] + [u"", u"{oops"])
+        self.assertEqual([response["id"] for response in responses], [1, "two", 3, None])
+        self.assertEqual([response["ok"] for response in responses], [True, False, True, False])
+        self.assertTrue(responses[0]["svg"].endswith("</svg>"))
+        self.assertEqual(responses[0]["mld"], {"text": u"CLIENT (_Réf. client_, Nom)\nCOMMANDE (_Num commande_, Date, #Réf. client)"})
+        self.assertEqual(responses[1]["errno"], 23)
+        self.assertIsNone(responses[2]["svg"])
+        self.assertEqual(sorted(responses[2]["mld"]), ["markdown", "text"])
+        self.assertTrue(responses[3]["error"].startswith("Invalid record"))
+
+    def test_manifest_as_a_list(self):
+        (handle, path) = tempfile.mkstemp(suffix=".json")
+        os.close(handle)
+        try:
+            with io.open(path, "w", encoding="utf8") as f:
+                f.write(json.dumps(records, ensure_ascii=False))
+            responses = self.run_batch([], batch=path)
+        finally:
+            os.remove(path)
+        self.assertEqual([response["id"] for response in responses], [1, "two", 3])
+
+    def test_workers(self):
+        lines = [json.dumps(record) for record in records]
+        self.assertEqual(self.run_batch(lines, workers=2), self.run_batch(lines))
+
+if __name__ == '__main__':
+    unittest.main()
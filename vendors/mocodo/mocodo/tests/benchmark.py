@@ -0,0 +1,207 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+""" Time the stages of the pipeline on generated diagrams, and emit the results as JSON.
+
+Run from the directory of mocodo.py, e.g.:
+
+    python mocodo/tests/benchmark.py --sizes 10 50 200 1000 --output benchmark.json
+
+Each stage is run `repeat` times (the rearrangements once, under `arrange_timeout`), then once
+more under tracemalloc to record its peak memory. Compare two JSON files for regressions, or two
+runs with different options (e.g. `--options layout_engine=naive`) for algorithm variants. """
+
+from __future__ import division, print_function
+import sys
+sys.path[0:0] = ["."]
+
+import argparse
+import json
+import math
+import platform
+import random
+from datetime import datetime
+
+try:
+    from time import perf_counter as clock
+except ImportError: # Python 2
+    from time import time as clock
+
+try:
+    import tracemalloc
+except ImportError: # Python 2
+    tracemalloc = None
+
+import gettext
+gettext.NullTranslations().install()
+
+from mocodo.api import get_default_params, get_font_metrics
+from mocodo.argument_parser import has_expired
+from mocodo.common import Common
+from mocodo.mcd import Mcd
+from mocodo.relations import Relations
+from mocodo.mocodo_error import MocodoError
+from mocodo.version_number import version
+from mocodo import mcd_to_svg
+
+SIZES = [10, 50, 200, 1000]
+STAGES = ["parse", "calculate_size", "description", "svg", "relations", "arrange_bb", "arrange_ga"]
+TEMPLATES = ["html", "text", "markdown", "json", "latex", "mysql", "sqlite", "diagram"]
+CARDINALITIES = ["0N", "1N", "01", "11"]
+
+
+def generate_clauses(box_count, seed=0):
+    """ Return the clauses of a diagram of box_count boxes (half entities, half associations) laid
+        out on a square grid. Each association links two or three entities placed nearby. """
+    rng = random.Random(seed)
+    entity_count = (box_count + 1) // 2
+    col_count = int(math.ceil(math.sqrt(box_count)))
+    boxes = []
+    for i in range(box_count):
+        if i % 2 == 0:
+            entity = i // 2
+            attributes = ["id entity %s" % entity] + ["attribute %s %s" % (entity, j) for j in range(rng.randrange(5))]
+            boxes.append(u"ENTITY %s: %s" % (entity, ", ".join(attributes)))
+        else:
+            window = range(max(0, i // 2 - col_count), min(entity_count, i // 2 + col_count + 1))
+            entities = rng.sample(window, min(len(window), rng.choice([2, 2, 2, 3])))
+            legs = ["%s ENTITY %s" % (rng.choice(CARDINALITIES), entity) for entity in entities]
+            attributes = ": attribute %s" % i if rng.random() < 0.3 else ""
+            boxes.append(u"ASSOCIATION %s, %s%s" % (i, ", ".join(legs), attributes))
+    rows = [boxes[i:i + col_count] for i in range(0, box_count, col_count)]
+    return "\n\n".join("\n".join(row) for row in rows).split("\n")
+
+
+def measure(setup, run, repeat):
+    """ Call run(setup()) repeat times. Return the list of its durations, the peak memory allocated
+        by an extra traced call (None if not available), and the result of the last call. """
+    times = []
+    for _ in range(repeat):
+        argument = setup()
+        start = clock()
+        result = run(argument)
+        times.append(clock() - start)
+    peak_memory = None
+    if tracemalloc:
+        argument = setup()
+        tracemalloc.start()
+        try:
+            run(argument)
+            peak_memory = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+    return (times, peak_memory, result)
+
+
+def run_benchmark(sizes=SIZES, stages=STAGES, templates=TEMPLATES, repeat=3, arrange_timeout=10, options=None, log=None):
+    params = dict(get_default_params(), **(options or {}))
+    params["added_keys"] = list(params["added_keys"])
+    common = Common(params)
+    style = common.load_style() # the SVG stage loads its own
+    for (k, v) in style.items():
+        if k.endswith("_color") and v is None:
+            style[k] = "none"
+    font_metrics = get_font_metrics(params)
+    relation_templates = [(name, common.load_relation_template(name)) for name in templates]
+    results = []
+
+    def record(box_count, stage, times, peak_memory, **extra):
+        result = {
+            "boxes": box_count,
+            "stage": stage,
+            "times": times,
+            "min": min(times),
+            "median": sorted(times)[len(times) // 2],
+            "peak_memory": peak_memory,
+        }
+        result.update(extra)
+        results.append(result)
+        if log:
+            log("%5s boxes  %-28s %10.2f ms %12s" % (box_count, stage, 1000 * result["min"], "" if peak_memory is None else "%.1f KiB" % (peak_memory / 1024)))
+
+    def parsed_mcd():
+        mcd = Mcd(clauses, params, font_metrics)
+        mcd.calculate_size(dict(style))
+        return mcd
+
+    def arrange_stage(module_name, box_count):
+        module = __import__("mocodo.%s" % module_name, fromlist=["arrange"])
+
+        def setup():
+            mcd = Mcd(clauses, params, font_metrics)
+            arrange_params = dict(params, timeout=arrange_timeout, has_expired=has_expired(arrange_timeout), verbose=False)
+            arrange_params.update(mcd.get_layout_data())
+            random.seed(42)
+            return arrange_params
+
+        def run(arrange_params):
+            try:
+                return module.arrange(**arrange_params) or {}
+            except MocodoError as err: # expired
+                return {"error": err.errno}
+
+        (times, peak_memory, result) = measure(setup, run, 1)
+        outcome = dict((key, result[key]) for key in ("crossings", "distances", "error") if key in result)
+        record(box_count, module_name, times, peak_memory, outcome=outcome)
+
+    for box_count in sizes:
+        clauses = generate_clauses(box_count)
+        if "parse" in stages:
+            record(box_count, "parse", *measure(lambda: None, lambda _: Mcd(clauses, params, font_metrics), repeat)[:2])
+        if "calculate_size" in stages:
+            record(box_count, "calculate_size", *measure(lambda: Mcd(clauses, params, font_metrics), lambda mcd: mcd.calculate_size(dict(style)), repeat)[:2])
+        if "description" in stages:
+            record(box_count, "description", *measure(parsed_mcd, lambda mcd: mcd.description(), repeat)[:2])
+        if "svg" in stages:
+            record(box_count, "svg", *measure(lambda: Mcd(clauses, params, font_metrics), lambda mcd: mcd_to_svg.render(mcd, common), repeat)[:2])
+        if "relations" in stages:
+            record(box_count, "relations", *measure(parsed_mcd, lambda mcd: Relations(mcd, params), repeat)[:2])
+            for (name, template) in relation_templates:
+                setup = lambda: Relations(parsed_mcd(), params)
+                record(box_count, "relations:%s" % name, *measure(setup, lambda relations: relations.get_text(template), repeat)[:2])
+        for module_name in ("arrange_bb", "arrange_ga"):
+            if module_name in stages:
+                arrange_stage(module_name, box_count)
+    return {
+        "version": version,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "date": datetime.now().isoformat(),
+        "settings": {
+            "repeat": repeat,
+            "arrange_timeout": arrange_timeout,
+            "options": options or {},
+        },
+        "results": results,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time the stages of the pipeline on generated diagrams.")
+    parser.add_argument("--sizes", metavar="NAT", type=int, nargs="*", default=SIZES, help="numbers of boxes of the generated diagrams")
+    parser.add_argument("--stages", nargs="*", choices=STAGES, default=STAGES, help="stages to run")
+    parser.add_argument("--templates", metavar="NAME", nargs="*", default=TEMPLATES, help="relation templates to time")
+    parser.add_argument("--repeat", metavar="NAT", type=int, default=3, help="number of timed runs of each stage")
+    parser.add_argument("--arrange_timeout", metavar="SECONDS", type=float, default=10, help="time limit of each rearrangement")
+    parser.add_argument("--options", metavar="KEY=JSON", nargs="*", default=[], help="override the default parameters of Mocodo")
+    parser.add_argument("--output", metavar="PATH", help="write the JSON results in the given file instead of the standard output")
+    args = parser.parse_args()
+    options = {}
+    for option in args.options:
+        (key, value) = option.split("=", 1)
+        try:
+            options[key] = json.loads(value)
+        except ValueError:
+            options[key] = value
+    log = lambda line: print(line, file=sys.stderr)
+    report = run_benchmark(args.sizes, args.stages, args.templates, args.repeat, args.arrange_timeout, options, log)
+    output = json.dumps(report, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,31 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+from __future__ import division
+import sys
+sys.path[0:0] = ["."]
+
+import unittest
+import json
+from mocodo.tests.benchmark import *
+
+class BenchmarkTest(unittest.TestCase):
+
+    def test_generate_clauses(self):
+        for box_count in (1, 10, 50):
+            mcd = Mcd(generate_clauses(box_count), get_default_params())
+            self.assertEqual(len([box for box in mcd.boxes if box.kind != "phantom"]), box_count)
+        self.assertEqual(generate_clauses(50), generate_clauses(50))
+
+    def test_run_benchmark(self):
+        report = run_benchmark(sizes=[10], templates=["text"], repeat=2, arrange_timeout=0.5, options={"population_size": 20})
+        report = json.loads(json.dumps(report))
+        stages = [result["stage"] for result in report["results"]]
+        self.assertEqual(stages, ["parse", "calculate_size", "description", "svg", "relations", "relations:text", "arrange_bb", "arrange_ga"])
+        for result in report["results"]:
+            self.assertEqual(len(result["times"]), 1 if result["stage"].startswith("arrange") else 2)
+            self.assertLessEqual(result["min"], result["median"])
+        self.assertIn("crossings", report["results"][-1]["outcome"])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -6,7 +6,9 @@ import sys
 sys.path[0:0] = ["."]
 
 import unittest
-from mocodo.cross import cross
+from mocodo.cross import *
+from mocodo.memo import LruMemo, MEMO_MAXSIZE
+import itertools
 
 class CrossTests(unittest.TestCase):
 
@@ -85,5 +87,67 @@ class CrossTests(unittest.TestCase):
         self.assertTrue(cross(0,0, 6,3, 2,1, 6,3))
         self.assertTrue(cross(0,0, 6,3, 0,0, 4,2))
 
+class CrossMatrixTests(unittest.TestCase):
+
+    segments = [(x1, y1, x2, y2) for ((x1, y1), (x2, y2)) in itertools.combinations(itertools.product(range(3), range(3)), 2)]
+
+    def test_python_cross_matrix(self):
+        matrix = python_cross_matrix(self.segments)
+        for (i, (x1, y1, x2, y2)) in enumerate(self.segments):
+            for (j, (x3, y3, x4, y4)) in enumerate(self.segments):
+                self.assertEqual(matrix[i][j], cross(x1, y1, x2, y2, x3, y3, x4, y4))
+
+    @unittest.skipIf(numpy is None, "NumPy is not installed")
+    def test_numpy_cross_matrix(self):
+        self.assertEqual(numpy_cross_matrix(self.segments).tolist(), python_cross_matrix(self.segments))
+
+    def test_crossing_pairs(self):
+        matrix = python_cross_matrix(self.segments)
+        expected = [(i, j) for (i, j) in itertools.combinations(range(len(self.segments)), 2) if matrix[i][j]]
+        self.assertEqual(crossing_pairs(self.segments), expected)
+        self.assertEqual(count_crossings(self.segments), len(expected))
+        self.assertEqual(crossing_pairs([]), [])
+        self.assertEqual(count_crossings([]), 0)
+
+    @unittest.skipIf(numpy is None, "NumPy is not installed")
+    def test_crossing_pairs_by_blocks(self):
+        import mocodo.cross
+        expected = crossing_pairs(self.segments)
+        block_size = mocodo.cross.CROSS_BLOCK_SIZE
+        mocodo.cross.CROSS_BLOCK_SIZE = 7
+        try:
+            self.assertEqual(crossing_pairs(self.segments), expected)
+            self.assertEqual(count_crossings(self.segments), len(expected))
+        finally:
+            mocodo.cross.CROSS_BLOCK_SIZE = block_size
+
+class MemoizeTests(unittest.TestCase):
+
+    def check_memo(self, memo):
+        calls = []
+        @memo
+        def square(x):
+            calls.append(x)
+            return x * x
+        for x in [1, 2, 1, 3, 1, 4]:
+            self.assertEqual(square(x), x * x)
+        self.assertEqual(calls, [1, 2, 3, 4]) # 2 was evicted, 1 was recently used
+        (hits, misses, maxsize, currsize) = square.cache_info()
+        self.assertEqual((hits, misses, maxsize, currsize), (2, 4, 3, 3))
+        square(2)
+        self.assertEqual(calls[-1], 2)
+        square.cache_clear()
+        self.assertEqual(tuple(square.cache_info()), (0, 0, 3, 0))
+
+    def test_memoize(self):
+        self.check_memo(memoize(maxsize=3))
+
+    def test_pure_python_memo(self):
+        self.check_memo(lambda func: LruMemo(func, 3))
+
+    def test_default_size(self):
+        self.assertEqual(cross.cache_info().maxsize, MEMO_MAXSIZE)
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -11,6 +11,7 @@ import unittest
 from mocodo.mcd import Mcd
 from mocodo.argument_parser import parsed_arguments
 from math import hypot
+import random
 
 class ArrangeBB(unittest.TestCase):
     
@@ -163,7 +164,61 @@ class ArrangeBB(unittest.TestCase):
         size = d["col_count"] * d["row_count"]
         (crossing_count, total_distances) = evaluate(list(range(size)))
         self.assertEqual(crossing_count, 3)
-    
+
+    def test_incremental_fitness(self):
+        clauses = u"""
+            DIGNISSIM: nec sem, nunc, vulputate
+            RHONCUS, 1N DIGNISSIM, 1N IMPERDIET, 1N TINCIDUNT
+            IMPERDIET: a praesent, nibh, semper
+
+            SODALES, 1N DIGNISSIM, 1N IMPERDIET, 1N TINCIDUNT
+            TINCIDUNT: faucibus, orci, cursus
+            QUIS ENIM, 1N DIGNISSIM, 1N IMPERDIET, 1N TINCIDUNT
+        """.replace("  ", "")
+        params = parsed_arguments()
+        mcd = Mcd(clauses.split("\n"), params)
+        d = mcd.get_layout_data()
+        evaluate = fitness(d["links"], d["multiplicity"], d["col_count"], d["row_count"])
+        (evaluate_full, evaluate_child) = incremental_fitness(d["links"], d["multiplicity"], d["col_count"], d["row_count"])
+        size = d["col_count"] * d["row_count"]
+        rand = random.Random(42)
+        layout = list(range(size))
+        (score, state) = evaluate_full(layout)
+        self.assertEqual(score, evaluate(layout))
+        for _ in range(200):
+            child = layout[:]
+            (i, j) = rand.sample(range(size), 2)
+            (child[i], child[j]) = (child[j], child[i])
+            (score, child_state) = evaluate_child(child, state)
+            self.assertEqual(score, evaluate(child))
+            self.assertEqual((score, child_state), evaluate_full(child))
+            (layout, state) = (child, child_state)
+
+    def test_incremental_fitness_closest_parent(self):
+        clauses = u"""
+            DIGNISSIM: nec sem, nunc, vulputate
+            IMPERDIET: a praesent, nibh, semper
+            TINCIDUNT: faucibus, orci, cursus
+
+            RHONCUS, 1N DIGNISSIM, 1N IMPERDIET, 1N TINCIDUNT
+            SODALES, 1N DIGNISSIM, 1N IMPERDIET, 1N TINCIDUNT
+            QUIS ENIM, 1N DIGNISSIM, 1N IMPERDIET, 1N TINCIDUNT
+        """.replace("  ", "")
+        params = parsed_arguments()
+        mcd = Mcd(clauses.split("\n"), params)
+        d = mcd.get_layout_data()
+        evaluate = fitness(d["links"], d["multiplicity"], d["col_count"], d["row_count"])
+        (evaluate_full, evaluate_child) = incremental_fitness(d["links"], d["multiplicity"], d["col_count"], d["row_count"])
+        size = d["col_count"] * d["row_count"]
+        rand = random.Random(1)
+        for _ in range(100):
+            parent_1 = rand.sample(range(size), size)
+            parent_2 = rand.sample(range(size), size)
+            child = parent_1[:size // 2] + [i for i in parent_2 if i not in parent_1[:size // 2]]
+            (score, state) = evaluate_child(child, evaluate_full(parent_1)[1], evaluate_full(parent_2)[1])
+            self.assertEqual(score, evaluate(child))
+            self.assertEqual(state, evaluate_full(child)[1])
+
 
 if __name__ == '__main__':
     unittest.main()
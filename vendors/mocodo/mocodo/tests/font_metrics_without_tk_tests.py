@@ -0,0 +1,48 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+from __future__ import division
+import sys
+sys.path[0:0] = ["."]
+
+import unittest
+import os
+from mocodo.font_metrics import *
+
+params = {}
+params["tkinter"] = False
+params["script_directory"] = os.path.join(os.path.dirname(os.path.realpath(__file__)), "..")
+get_font_metrics = font_metrics_factory(params)
+
+
+class FontMetricsWithoutTkTest(unittest.TestCase):
+
+    def test_shared_instance(self):
+        font = get_font_metrics({"family": "Times New Roman", "size": 12})
+        self.assertIs(font, get_font_metrics({"family": "Times New Roman", "size": 12}))
+        self.assertIsNot(font, get_font_metrics({"family": "Times New Roman", "size": 14}))
+
+    def test_missing_family(self):
+        font = {"family": "No Such Family", "size": 12}
+        metrics = get_font_metrics(font)
+        self.assertEqual(font["family"], "Courier New")
+        self.assertIs(metrics, get_font_metrics({"family": "Courier New", "size": 12}))
+
+    def test_get_pixel_width(self):
+        font = get_font_metrics({"family": "Courier New", "size": 12})
+        self.assertEqual(font.get_pixel_width(""), 1)
+        self.assertEqual(font.get_pixel_width("My string"), font.get_pixel_width("My string"))
+
+    def test_bounded_memo(self):
+        font = get_font_metrics({"family": "Courier New", "size": 13})
+        for i in range(WIDTH_MEMO_MAXSIZE + 10):
+            font.get_pixel_width("label %s" % i)
+        self.assertEqual(font.get_pixel_width.cache_info().currsize, WIDTH_MEMO_MAXSIZE)
+
+    def test_monospace_width(self):
+        font = get_font_metrics({"family": "Courier New", "size": 12})
+        self.assertEqual(font.get_pixel_width("iiii") - 1, font.get_pixel_width("WWWW") - 1)
+        self.assertGreater(font.get_pixel_width("WWWW"), font.get_pixel_width("WW"))
+
+if __name__ == '__main__':
+    unittest.main()
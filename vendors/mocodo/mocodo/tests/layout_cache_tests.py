@@ -0,0 +1,116 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+from __future__ import division
+import sys
+sys.path[0:0] = ["."]
+
+import unittest
+import shutil
+import tempfile
+from random import seed
+from mocodo.layout_cache import *
+from mocodo.mcd import Mcd
+from mocodo.argument_parser import parsed_arguments
+from mocodo.arrange_ga import arrange
+
+clauses = u"""
+    SUSPENDISSE: diam
+    SOLLICITUDIN, 0N SUSPENDISSE, 0N CONSECTETUER, 0N LOREM: lectus
+    CONSECTETUER: elit, sed
+    MAECENAS, 1N DIGNISSIM, 1N DIGNISSIM
+
+    DF1, 11 LOREM, 1N SUSPENDISSE
+    LOREM: ipsum, dolor, sit
+    TORTOR, 0N RISUS, 11 DIGNISSIM, 1N CONSECTETUER: nec
+    DIGNISSIM: ligula, massa, varius
+
+    DF, 11 RISUS, 0N RISUS
+    AMET, 11> LOREM, 01 CONSECTETUER: adipiscing
+    RISUS: ultricies, _cras, elementum
+    SEMPER, 0N RISUS, 1N DIGNISSIM
+""".replace("  ", "")
+
+class LayoutCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.cache = LayoutCache(self.directory)
+        self.calls = []
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def get_params(self, clauses, algorithm):
+        params = parsed_arguments()
+        mcd = Mcd(clauses.split("\n"), params)
+        params.update(mcd.get_layout_data())
+        params.update(arrange=algorithm, max_generations=10, population_size=50, timeout=None, verbose=False)
+        return (mcd, params)
+
+    def spy(self, **params):
+        self.calls.append(params)
+        seed(42)
+        return arrange(**params)
+
+    def test_hit(self):
+        (mcd, params) = self.get_params(clauses, "ga")
+        result = self.cache.arrange(mcd, params, self.spy)
+        self.assertEqual(len(self.calls), 1)
+        (mcd, params) = self.get_params(clauses.replace("diam", "diam, nonummy"), "ga")
+        self.assertEqual(self.cache.arrange(mcd, params, self.spy), result)
+        self.assertEqual(len(self.calls), 1)
+        mcd.set_layout(**result)
+
+    def test_key_depends_on_algorithm_params(self):
+        (mcd, params) = self.get_params(clauses, "ga")
+        self.cache.arrange(mcd, params, self.spy)
+        params["mutation_rate"] = 0.1
+        self.cache.arrange(mcd, params, self.spy)
+        self.assertEqual(len(self.calls), 2)
+
+    def test_warm_start(self):
+        (mcd, params) = self.get_params(clauses, "ga")
+        self.cache.arrange(mcd, params, self.spy)
+        (mcd, params) = self.get_params(clauses + u"\nNIBH, 1N RISUS, 11 SUSPENDISSE", "ga")
+        result = self.cache.arrange(mcd, params, self.spy)
+        self.assertEqual(len(self.calls), 2)
+        (initial_layout,) = self.calls[1]["initial_layouts"]
+        self.assertEqual(sorted(initial_layout), list(range(len(mcd.boxes))))
+        self.assertEqual(sorted(result["layout"]), list(range(len(mcd.boxes))))
+
+    def test_no_warm_start_for_a_different_diagram(self):
+        (mcd, params) = self.get_params(clauses, "ga")
+        self.cache.arrange(mcd, params, self.spy)
+        (mcd, params) = self.get_params(u"FOO: bar\nBAZ, 11 FOO, 0N QUX\nQUX: quux", "ga")
+        self.cache.arrange(mcd, params, self.spy)
+        self.assertNotIn("initial_layouts", self.calls[1])
+
+    def fake_bb(self, **params):
+        self.calls.append(params)
+        return {"layout": list(range(len(params["successors"]))), "distances": 5.0, "crossings": 0}
+
+    def test_bb_warm_start_on_a_grid_not_larger(self):
+        (mcd, params) = self.get_params(clauses + u"\n:", "bb")
+        self.cache.arrange(mcd, params, self.fake_bb)
+        (mcd, params) = self.get_params(clauses + u"\nNIBH, 1N RISUS, 11 SUSPENDISSE", "bb")
+        self.cache.arrange(mcd, params, self.fake_bb)
+        self.assertEqual(self.calls[1]["min_objective"], 5)
+
+    def test_no_bb_warm_start_on_a_larger_grid(self):
+        (mcd, params) = self.get_params(clauses, "bb")
+        self.cache.arrange(mcd, params, self.fake_bb)
+        (mcd, params) = self.get_params(clauses + u"\nNIBH, 1N RISUS, 11 SUSPENDISSE", "bb")
+        self.cache.arrange(mcd, params, self.fake_bb)
+        self.assertEqual(self.calls[1]["min_objective"], params["min_objective"])
+
+    def test_warm_layout(self):
+        entry = {
+            "names": ["A", "B", " 0", "C"],
+            "col_count": 2,
+            "result": {"layout": [3, 0, 1, 2]},
+        }
+        self.assertEqual(self.cache.get_warm_layout(entry, ["A", "B", "C", "D", " 0", " 1"], 3, 2), [2, 0, 3, 1, 4, 5])
+
+if __name__ == '__main__':
+    unittest.main()
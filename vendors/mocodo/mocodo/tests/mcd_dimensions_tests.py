@@ -147,6 +147,22 @@ class McdGeometryTest(unittest.TestCase):
             {'name': u'A PÈRE', 'x': 241, 'y': 177, 'w': 44, 'h': 42},
             {'name': u' 1', 'x': 353, 'y': 198, 'w': 0, 'h': 0}
         ])
-    
+
+    def test_layout_engines(self):
+        clauses = []
+        for j in range(6):
+            for i in range(12):
+                if (i * 7 + j * 5) % 9 == 0:
+                    clauses.append(u":")
+                else:
+                    attributes = ", ".join(u"a" * ((i * j + k) % 13 + 1) for k in range((i + 2 * j) % 5 + 1))
+                    clauses.append(u"E%s_%s%s: %s" % (i, j, u"x" * ((i + j) % 11), attributes))
+            clauses.append(u"")
+        dimensions = {}
+        for engine in ("naive", "sweep"):
+            mcd = Mcd(clauses, dict(params, layout_engine=engine), stub_for_get_font_metrics)
+            dimensions[engine] = (get_dimensions(mcd), mcd.w, mcd.h)
+        self.assertEqual(dimensions["naive"], dimensions["sweep"])
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,78 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+from __future__ import division
+import sys
+sys.path[0:0] = ["."]
+
+import unittest
+import json
+import os
+import re
+import shutil
+import tempfile
+from mocodo.mcd import Mcd
+from mocodo.mcd_to_svg import render, generate_script, dump_svg_file
+from mocodo.common import Common
+from mocodo.relations import Relations
+from mocodo.file_helpers import read_contents
+from mocodo.argument_parser import parsed_arguments
+from mocodo.font_metrics import font_metrics_factory
+
+import gettext
+gettext.NullTranslations().install()
+
+params = parsed_arguments()
+common = Common(params)
+get_font_metrics = font_metrics_factory(params)
+
+def normalized(svg):
+    svg = re.sub(r"<desc>.*</desc>", "", svg)
+    return re.sub(r"_(annotation|overlay)_\w{8}", r"_\1_SALT", svg)
+
+def rendered_by_script(clauses):
+    namespace = {}
+    exec(compile("\n".join(generate_script(Mcd(clauses, params, get_font_metrics), common)), "<script>", "exec"), namespace)
+    return namespace["lines"]
+
+class McdToSvgTest(unittest.TestCase):
+
+    def test_sandbox(self):
+        clauses = read_contents(os.path.join(params["script_directory"], "pristine_sandbox.mcd")).splitlines()
+        self.assertEqual(normalized(render(Mcd(clauses, params, get_font_metrics), common)), normalized(rendered_by_script(clauses)))
+
+    def test_diagram_links(self):
+        clauses = read_contents(os.path.join(params["script_directory"], "pristine_sandbox.mcd")).splitlines()
+        template = json.loads(read_contents(os.path.join(params["script_directory"], "relation_templates", "diagram.json")))
+        clauses = Relations(Mcd(clauses, params, get_font_metrics), params).get_text(template).replace('"', '').splitlines()
+        self.assertEqual(normalized(render(Mcd(clauses, params, get_font_metrics), common)), normalized(rendered_by_script(clauses)))
+
+    def test_writer(self):
+        clauses = [
+            u"CLIENT: Réf. client, Nom, Prénom, Adresse",
+            u"PASSER, 0N CLIENT, 11 COMMANDE",
+            u"COMMANDE: Num commande, Date, Montant",
+            u"INCLURE, 1N COMMANDE, 0N PRODUIT: Quantité",
+            u"PRODUIT: Réf. produit, Libellé, Prix unitaire",
+        ]
+        chunks = []
+        self.assertIsNone(render(Mcd(clauses, params, get_font_metrics), common, chunks.append))
+        svg = "".join(chunks)
+        self.assertTrue(svg.endswith("</svg>"))
+        self.assertEqual(normalized(svg), normalized(rendered_by_script(clauses)))
+
+    def test_no_file_left_on_failure(self):
+        directory = tempfile.mkdtemp()
+        try:
+            failing_common = Common(dict(params, output_name=os.path.join(directory, "failure")))
+            def geometry(mcd, style):
+                raise ValueError("card_pos")
+            failing_common.geometry = geometry
+            mcd = Mcd([u"CLIENT: Réf. client, Nom"], params, get_font_metrics)
+            self.assertRaises(ValueError, dump_svg_file, mcd, failing_common)
+            self.assertEqual(os.listdir(directory), [])
+        finally:
+            shutil.rmtree(directory)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,50 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+from __future__ import division
+import sys
+sys.path[0:0] = ["."]
+
+import unittest
+import random
+from mocodo.obfuscate import *
+from mocodo.damerau_levenshtein import damerau_levenshtein, bounded_damerau_levenshtein
+
+class ObfuscateTest(unittest.TestCase):
+
+    def random_strings(self, rng, alphabet, max_length, count):
+        return ["".join(rng.choice(alphabet) for _ in range(rng.randrange(max_length + 1))) for _ in range(count)]
+
+    def test_bounded_damerau_levenshtein(self):
+        rng = random.Random(42)
+        strings = self.random_strings(rng, "abc", 8, 200)
+        for (seq1, seq2) in zip(strings, reversed(strings)):
+            for bound in range(6):
+                self.assertEqual(bounded_damerau_levenshtein(seq1, seq2, bound), min(damerau_levenshtein(seq1, seq2), bound + 1))
+
+    def test_chunk_index(self):
+        rng = random.Random(42)
+        for (bound, max_length) in [(0, 10), (2, 10), (3, 10), (3, 40)]:
+            index = ChunkIndex(bound, max_length)
+            self.assertEqual(index.by_variant is None, max_length == 40)
+            accepted = []
+            for chunk in self.random_strings(rng, "ab c", 10, 300):
+                expected = any(damerau_levenshtein(chunk, other) <= bound for other in accepted)
+                self.assertEqual(index.has_neighbor(chunk), expected)
+                if not expected:
+                    index.add(chunk)
+                    accepted.append(chunk)
+
+    def test_random_chunks_of(self):
+        lorem_text = u"lorem ipsum dolor sit amet consectetur adipiscing elit sed do eiusmod tempor"
+        for min_distance in (1, 3, 5):
+            random.seed(1)
+            chunks = list(random_chunks_of(lorem_text, 12, {"obfuscation_min_distance": min_distance}))
+            self.assertTrue(chunks)
+            self.assertTrue(all(len(chunk) <= 12 for chunk in chunks))
+            for (i, chunk) in enumerate(chunks):
+                for other in chunks[:i]:
+                    self.assertGreaterEqual(damerau_levenshtein(chunk, other), min_distance)
+
+if __name__ == '__main__':
+    unittest.main()
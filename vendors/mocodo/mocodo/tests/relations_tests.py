@@ -678,6 +678,57 @@ class relationsTest(unittest.TestCase):
         self.assertEqual(d["relations"][1]["columns"][1]["raw_label"], u"num_chien")
         self.assertEqual(d["relations"][1]["columns"][1]["label"],     u"num_chien_1")
 
+    def test_compiled_template_is_shared(self):
+        template = compile_template(minimal_template)
+        self.assertIs(template, compile_template(deepcopy(minimal_template)))
+        self.assertIs(template, compile_template(template))
+        self.assertIsNot(template, compile_template(json_template))
+        self.assertIs(template.transformations["transform_title"], compile_template(json_template).transformations["transform_title"])
+
+    def test_memos_are_bounded(self):
+        self.assertEqual(compile_template_contents.cache_info().maxsize, TEMPLATE_MEMO_MAXSIZE)
+        template = compile_template(dict(minimal_template, transform_title=[{"search": "a", "replace": "A"}]))
+        template.transform.cache_clear()
+        for i in range(TRANSFORM_MEMO_MAXSIZE + 10):
+            self.assertEqual(template.transform(u"a%s" % i, "transform_title"), u"A%s" % i)
+        self.assertEqual(template.transform.cache_info().currsize, TRANSFORM_MEMO_MAXSIZE)
+        self.assertEqual(template.transform(u"a0", "transform_title"), u"A0")
+
+    def test_compiled_template_gives_the_same_text(self):
+        clauses = u"""
+            Riot: clue
+            Into, 11 Form, 1N Riot: goat
+            Form: land, hide
+        """
+        t = Relations(Mcd(clauses.split("\n"), params), params)
+        template = compile_template(minimal_template)
+        self.assertEqual(t.get_text(minimal_template), t.get_text(template))
+        self.assertEqual(t.get_text(template), u"Riot (_clue_)\nForm (_land_, hide, #clue, goat)")
+
+    def test_case_variants_only_for_referred_fields(self):
+        template = compile_template(dict(minimal_template, compose_relation=u"{this_relation_name_uppercase} ({columns})"))
+        d = {"this_relation_name": u"Riot", "label": u"clue"}
+        template.add_case_variants(d, "this_relation_name")
+        template.add_case_variants(d, "label")
+        self.assertEqual(d, {"this_relation_name": u"Riot", "this_relation_name_uppercase": u"RIOT", "label": u"clue"})
+
+
+    def test_several_templates_in_one_pass(self):
+        clauses = u"""
+            Riot: clue
+            Into, 11 Form, 1N Riot: goat
+            Form: land, hide
+            Tuck, 1N Read, 1N Form: thin
+            Read: wage
+        """
+        templates = [minimal_template, json_template, dict(minimal_template, transform_attribute=[{"search": "a", "replace": "A"}])]
+        t = Relations(Mcd(clauses.split("\n"), params), params)
+        expected = [Relations(Mcd(clauses.split("\n"), params), params).get_text(template) for template in templates]
+        self.assertEqual([text for (_, text) in t.get_texts(templates)], expected)
+        self.assertEqual(len(t.labels), 2) # the labels are shared by the two first templates
+        self.assertNotIn("label", t.relations["Riot"]["columns"][0]) # the column model is left untouched
+
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,79 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+from __future__ import division
+import sys
+sys.path[0:0] = ["."]
+
+import unittest
+import os
+import shutil
+import tempfile
+import subprocess
+import mocodo
+from mocodo.render_cache import *
+from mocodo.api import get_default_params
+from mocodo.common import Common
+
+import gettext
+gettext.NullTranslations().install()
+
+clauses = u"""
+    CLIENT: Réf. client, Nom, Prénom, Adresse
+    PASSER, 0N CLIENT, 11 COMMANDE
+    COMMANDE: Num commande, Date, Montant
+""".replace("    ", "")
+
+class RenderCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def get_key(self, clauses, **options):
+        params = dict(get_default_params(), **options)
+        return RenderCache(self.directory, 1024).get_key(Common(params), clauses.splitlines())
+
+    def test_key(self):
+        key = self.get_key(clauses)
+        self.assertEqual(key, self.get_key(clauses))
+        self.assertNotEqual(key, self.get_key(clauses + u"\nFOO: bar"))
+        self.assertNotEqual(key, self.get_key(clauses, scale=2))
+        self.assertNotEqual(key, self.get_key(clauses, relations=["text", "html"]))
+        self.assertNotEqual(key, self.get_key(clauses, df=u"CIF"))
+        self.assertIsNone(self.get_key(clauses, relations=["foobar"]))
+
+    def test_hit(self):
+        result = mocodo.render(clauses, relations=["text"], render_cache=self.directory)
+        self.assertEqual(len(os.listdir(self.directory)), 1)
+        self.assertEqual(mocodo.render(clauses, relations=["text"], render_cache=self.directory), result)
+        self.assertEqual(len(os.listdir(self.directory)), 1)
+        mocodo.render(clauses, relations=["text"], no_mcd=True, render_cache=self.directory)
+        self.assertEqual(len(os.listdir(self.directory)), 2)
+
+    def test_lru_eviction(self):
+        cache = RenderCache(self.directory, 3500)
+        for (i, key) in enumerate("abc"):
+            cache.save(key, "x" * 1000, [])
+            os.utime(cache.get_path(key), (i, i))
+        cache.load("a") # "b" is now the least recently used entry
+        cache.save("d", "x" * 1000, [])
+        self.assertEqual(sorted(os.listdir(self.directory)), ["a.json", "c.json", "d.json"])
+
+    def test_hit_does_not_import_the_drawing_modules(self):
+        script = "; ".join([
+            "import sys",
+            "sys.path[0:0] = ['.']",
+            "import gettext",
+            "gettext.NullTranslations().install()",
+            "import mocodo",
+            "mocodo.render(%r, render_cache=%r)" % (clauses, self.directory),
+            "print(sorted(m for m in ('mocodo.mcd', 'mocodo.relations', 'mocodo.mcd_to_svg') if m in sys.modules))",
+        ])
+        outputs = [subprocess.check_output([sys.executable, "-c", script]).decode("utf8").strip() for _ in range(2)]
+        self.assertEqual(outputs, ["['mocodo.mcd', 'mocodo.mcd_to_svg', 'mocodo.relations']", "[]"])
+
+if __name__ == '__main__':
+    unittest.main()
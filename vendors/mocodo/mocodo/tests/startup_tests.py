@@ -0,0 +1,80 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+from __future__ import division
+import sys
+sys.path[0:0] = ["."]
+
+import unittest
+import os
+import re
+import time
+import shutil
+import tempfile
+import subprocess
+
+clauses = u"""
+    CLIENT: Réf. client, Nom, Prénom, Adresse
+    PASSER, 0N CLIENT, 11 COMMANDE
+    COMMANDE: Num commande, Date, Montant
+    INCLURE, 1N COMMANDE, 0N PRODUIT: Quantité
+    PRODUIT: Réf. produit, Libellé, Prix unitaire
+    FOURNIR, 0N FOURNISSEUR, 1N PRODUIT
+    FOURNISSEUR: Num fournisseur, Raison sociale
+    APPARTENIR, 11 PRODUIT, 0N CATÉGORIE
+    CATÉGORIE: Code catégorie, Libellé
+""".replace("    ", "")
+
+FIRST_BYTE_BUDGET = 0.080 # seconds, on top of the startup of a bare interpreter
+DEFERRED_MODULES = [
+    "mocodo.arrange_bb", "mocodo.arrange_ga", "mocodo.arrange_lp", "mocodo.arrange_lp_large",
+    "mocodo.fitness", "mocodo.cross", "mocodo.layout_cache", "mocodo.obfuscate", "mocodo.batch",
+    "mocodo.render_cache", "mocodo.mcd_to_nodebox", "numpy", "scipy", "tkinter", "Tkinter",
+]
+
+@unittest.skipIf(sys.version_info < (3, 7), "-X importtime requires Python 3.7")
+class StartupTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.directory = tempfile.mkdtemp()
+        cls.input = os.path.join(cls.directory, "five.mcd")
+        with open(cls.input, "wb") as f:
+            f.write(clauses.encode("utf8"))
+        cls.env = dict(os.environ, PYTHONPYCACHEPREFIX=os.path.join(cls.directory, "pycache"))
+        cls.env.pop("PYTHONDONTWRITEBYTECODE", None) # measure the startup of an installed Mocodo
+        cls.mocodo = [sys.executable, "-m", "mocodo", "--input", cls.input, "--params_path", ""]
+        subprocess.check_call(cls.mocodo, env=cls.env, stdout=subprocess.PIPE) # warm the bytecode cache
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.directory)
+
+    def time_to_first_byte(self, command, runs=5):
+        result = []
+        for _ in range(runs):
+            start = time.time()
+            process = subprocess.Popen(command, env=self.env, stdout=subprocess.PIPE)
+            process.stdout.read(1)
+            result.append(time.time() - start)
+            process.communicate()
+        return min(result)
+
+    def test_deferred_imports(self):
+        output = subprocess.check_output([sys.executable, "-X", "importtime"] + self.mocodo[1:], env=self.env, stderr=subprocess.STDOUT).decode("utf8")
+        import_times = dict((name, int(cumulative)) for (cumulative, name) in re.findall(r"(?m)^import time:\s+\d+ \|\s+(\d+) \|\s+(\S+)$", output))
+        self.assertIn("mocodo.mcd", import_times)
+        self.assertEqual([name for name in DEFERRED_MODULES if name in import_times], [])
+        if "-v" in sys.argv:
+            for (name, cumulative) in sorted(import_times.items(), key=lambda x: -x[1])[:10]:
+                print("%8.1f ms  %s" % (cumulative / 1000, name))
+
+    def test_time_to_first_byte(self):
+        bare = self.time_to_first_byte([sys.executable, "-c", "print(0)"])
+        mocodo = self.time_to_first_byte(self.mocodo)
+        if "-v" in sys.argv:
+            print("\nfirst byte after %.1f ms (bare interpreter: %.1f ms)" % (1000 * mocodo, 1000 * bare))
+        self.assertLess(mocodo - bare, FIRST_BYTE_BUDGET)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -13,12 +13,17 @@
 #  See the License for the specific language governing permissions and
 #  limitations under the License.
 
+import itertools
+
 from blockdiag import parser
 from blockdiag.elements import Diagram, DiagramEdge, DiagramNode, NodeGroup
 from blockdiag.plugins import fire_node_event
-from blockdiag.utils import XY, unquote
+from blockdiag.utils import XY, NodeGrid, Occupancy, unquote
 from blockdiag.utils.compat import cmp_to_key
 
+# beyond this many steps, the cycles are not enumerated one by one
+MAX_CIRCULAR_SEARCH_STEPS = 10000
+
 
 class DiagramTreeBuilder:
     def build(self, tree, config):
@@ -137,19 +142,28 @@ class DiagramTreeBuilder:
 
 
 class DiagramLayoutManager:
-    def __init__(self, diagram):
+    def __init__(self, diagram, edges_by_level=None):
         self.diagram = diagram
+        self.edges_by_level = edges_by_level
 
         self.circulars = []
+        self.circular_ids = {}
+        self.circular_index = []
+        self.outer_parents = []
         self.heightRefs = []
-        self.coordinates = []
+        self.coordinates = Occupancy()
 
     def run(self):
+        if self.edges_by_level is None:
+            level = self.diagram.level
+            self.edges_by_level = DiagramEdge.find_by_levels(level)
+
         if isinstance(self.diagram, Diagram):
             for group in self.diagram.traverse_groups():
-                self.__class__(group).run()
+                self.__class__(group, self.edges_by_level).run()
 
-        self.edges = DiagramEdge.find_by_level(self.diagram.level)
+        self.edges = self.edges_by_level.get(self.diagram.level, [])
+        self.index_edges()
         self.do_layout()
         self.diagram.fixiate()
 
@@ -180,30 +194,42 @@ class DiagramLayoutManager:
         for node in self.diagram.nodes:
             if node.xy.x == 0:
                 self.set_node_ypos(node, height)
-                height = max(xy.y for xy in self.coordinates) + 1
+                height = self.coordinates.max_y() + 1
 
-    def get_related_nodes(self, node, parent=False, child=False):
-        uniq = {}
+    def index_edges(self):
+        # parents and children of each node, in order of the edges
+        self.parents = {}
+        self.children = {}
         for edge in self.edges:
             if edge.folded:
                 continue
 
-            if parent and edge.node2 == node:
-                uniq[edge.node1] = 1
-            elif child and edge.node1 == node:
-                uniq[edge.node2] = 1
+            node1, node2 = edge.node1, edge.node2
+            if node1 != node2 and node1.group == node2.group:
+                self.parents.setdefault(node2, {})[node1] = 1
+                self.children.setdefault(node1, {})[node2] = 1
 
-        related = []
-        for uniq_node in uniq.keys():
-            if uniq_node == node:
-                pass
-            elif uniq_node.group != node.group:
-                pass
-            else:
-                related.append(uniq_node)
+        self.sort_related_nodes()
 
-        related.sort(key=lambda x: x.order)
-        return related
+    def sort_related_nodes(self):
+        def by_order(related):
+            return dict((node, sorted(nodes, key=lambda x: x.order))
+                        for node, nodes in related.items())
+
+        self.sorted_parents = by_order(self.parents)
+        self.sorted_children = by_order(self.children)
+
+    def get_related_nodes(self, node, parent=False, child=False):
+        if parent and child:
+            related = dict(self.parents.get(node, {}))
+            related.update(self.children.get(node, {}))
+            return sorted(related, key=lambda x: x.order)
+        elif parent:
+            return list(self.sorted_parents.get(node, []))
+        elif child:
+            return list(self.sorted_children.get(node, []))
+        else:
+            return []
 
     def get_parent_nodes(self, node):
         return self.get_related_nodes(node, parent=True)
@@ -212,57 +238,203 @@ class DiagramLayoutManager:
         return self.get_related_nodes(node, child=True)
 
     def detect_circulars(self):
+        """ Group the nodes in strongly connected components (Tarjan) """
+        index = {}
+        lowlink = {}
+        stack = []
+        onstack = set()
+        components = []
+
+        # when and from which parent each node is reached by the DFS
+        clock = itertools.count()
+        reached = {}
+
+        def visit(node, parent=None):
+            index[node] = lowlink[node] = len(index)
+            reached[node] = [(next(clock), parent)]
+            position = len(stack)
+            stack.append(node)
+            onstack.add(node)
+
+            for child in self.get_child_nodes(node):
+                if child not in index:
+                    visit(child, node)
+                    lowlink[node] = min(lowlink[node], lowlink[child])
+                else:
+                    reached[child].append((next(clock), node))
+                    if child in onstack:
+                        lowlink[node] = min(lowlink[node], index[child])
+
+            if lowlink[node] == index[node]:
+                component = stack[position:]
+                del stack[position:]
+                onstack.difference_update(component)
+                if len(component) > 1:
+                    components.append(component)
+
+        for node in self.diagram.nodes:
+            if node not in index:
+                visit(node)
+
+        if not components:
+            return
+
+        circulars = self.enumerate_circulars(components)
+        if circulars is None:
+            # too many cycles: one circular per component
+            circulars = [self.sort_component(component, reached)
+                         for component in components]
+        else:
+            self.merge_circulars(circulars)
+
+        self.circulars = circulars
+        self.index_circulars()
+
+    def enumerate_circulars(self, components):
+        """ List the cycles in the order the simple paths from each node
+            reach them. Returns None beyond MAX_CIRCULAR_SEARCH_STEPS. """
+        component_ids = {}
+        for i, component in enumerate(components):
+            for node in component:
+                component_ids[node] = i
+
+        circulars = []
+        found = set()
+        circular_nodes = set()
+        entered = set()
+        steps = [0]
+
+        # the paths leading to the first node of a component on the path
+        # cannot come back, so the subtree below it is explored only once
+        def is_entry(node, child):
+            component = component_ids.get(child)
+            return component is None or component != component_ids.get(node)
+
+        def visit(node, parents, onpath):
+            for child in self.get_child_nodes(node):
+                steps[0] += 1
+                if steps[0] > MAX_CIRCULAR_SEARCH_STEPS:
+                    return False
+
+                if child in onpath:
+                    circular = parents[parents.index(child):]
+                    if tuple(circular) not in found:
+                        found.add(tuple(circular))
+                        circulars.append(circular)
+                        circular_nodes.update(circular)
+                    continue
+                elif is_entry(node, child):
+                    if child in entered:
+                        continue
+                    entered.add(child)
+
+                onpath.add(child)
+                if not visit(child, parents + [child], onpath):
+                    return False
+                onpath.remove(child)
+
+            return True
+
         for node in self.diagram.nodes:
-            if not [x for x in self.circulars if node in x]:
-                self.detect_circulars_sub(node, [node])
+            if node not in circular_nodes and node not in entered:
+                entered.add(node)
+                if not visit(node, [node], set([node])):
+                    return None
+
+        return circulars
 
+    def merge_circulars(self, circulars):
         # remove part of other circular
-        for c1 in self.circulars[:]:
-            for c2 in self.circulars:
+        for c1 in circulars[:]:
+            for c2 in circulars:
                 intersect = set(c1) & set(c2)
 
                 if c1 != c2 and set(c1) == intersect:
-                    if c1 in self.circulars:
-                        self.circulars.remove(c1)
+                    if c1 in circulars:
+                        circulars.remove(c1)
                     break
 
                 if c1 != c2 and intersect:
-                    if c1 in self.circulars:
-                        self.circulars.remove(c1)
-                    self.circulars.remove(c2)
-                    self.circulars.append(c1 + c2)
+                    if c1 in circulars:
+                        circulars.remove(c1)
+                    circulars.remove(c2)
+                    circulars.append(c1 + c2)
                     break
 
-    def detect_circulars_sub(self, node, parents):
-        for child in self.get_child_nodes(node):
-            if child in parents:
-                i = parents.index(child)
-                if parents[i:] not in self.circulars:
-                    self.circulars.append(parents[i:])
-            else:
-                self.detect_circulars_sub(child, parents + [child])
+    def sort_component(self, component, reached):
+        members = set(component)
+
+        # the circular starts from the node entered last from outside of it
+        def entered(node):
+            times = [t for t, parent in reached[node] if parent not in members]
+            return min(times, default=-1)
+
+        order = {}
+        path = set()
+        forwards = {}
+        finished = {}
+
+        def visit(node):
+            order[node] = len(order)
+            path.add(node)
+            forwards[node] = []
+            for child in self.get_child_nodes(node):
+                if child in members:
+                    if child not in order:
+                        visit(child)
+
+                    if child not in path:
+                        forwards[node].append(child)
+
+            path.remove(node)
+            finished[node] = len(finished)
+
+        visit(max(component, key=entered))
+
+        # then follows the longest paths without going back
+        depth = dict((node, 0) for node in component)
+        for node in sorted(component, key=lambda x: -finished[x]):
+            for child in forwards[node]:
+                depth[child] = max(depth[child], depth[node] + 1)
+
+        return sorted(component, key=lambda x: (depth[x], order[x]))
+
+    def index_circulars(self):
+        parents = {}
+        for i, circular in enumerate(self.circulars):
+            members = set(circular)
+            positions = {}
+            for position, node in enumerate(circular):
+                positions.setdefault(node, position)
+
+            outer_parents = {}
+            for node in positions:
+                if node not in parents:
+                    parents[node] = self.get_parent_nodes(node)
+                outer_parents[node] = set(parent.order for parent
+                                          in parents[node]
+                                          if parent not in members)
+                self.circular_ids.setdefault(node, []).append(i)
+
+            self.circular_index.append(positions)
+            self.outer_parents.append(outer_parents)
 
     def is_circular_ref(self, node1, node2):
-        for circular in self.circulars:
-            if node1 in circular and node2 in circular:
-                parents = []
-                for node in circular:
-                    for parent in self.get_parent_nodes(node):
-                        if parent not in circular:
-                            parents.append(parent)
-
-                for parent in sorted(parents, key=lambda x: x.order):
-                    children = self.get_child_nodes(parent)
-                    if node1 in children and node2 in children:
-                        if circular.index(node1) > circular.index(node2):
-                            return True
-                    elif node2 in children:
-                        return True
-                    elif node1 in children:
-                        return False
-                else:
-                    if circular.index(node1) > circular.index(node2):
-                        return True
+        for i in self.circular_ids.get(node1, []):
+            positions = self.circular_index[i]
+            if node2 not in positions:
+                continue
+
+            # the first parent (by order) which leads into the circular decides
+            parents1 = self.outer_parents[i][node1]
+            parents2 = self.outer_parents[i][node2]
+            if positions[node1] > positions[node2]:
+                first1 = min(parents1, default=float('inf'))
+                return first1 >= min(parents2, default=float('inf'))
+            else:
+                parents = parents1 ^ parents2
+                if parents:
+                    return min(parents) in parents2
 
         return False
 
@@ -354,6 +526,7 @@ class DiagramLayoutManager:
                             break
 
         self.diagram.update_order()
+        self.sort_related_nodes()
 
     def compare_child_node_order(self, parent, node1, node2):
         def compare(x, y):
@@ -384,7 +557,7 @@ class DiagramLayoutManager:
     def mark_xy(self, xy, width, height):
         for w in range(width):
             for h in range(height):
-                self.coordinates.append(XY(xy.x + w, xy.y + h))
+                self.coordinates.add(XY(xy.x + w, xy.y + h))
 
     def set_node_ypos(self, node, height=0):
         for x in range(node.colwidth):
@@ -426,9 +599,9 @@ class DiagramLayoutManager:
 
                 if (prev_child and grandchild > 1 and
                    (not self.is_rhombus(prev_child, child))):
-                    coord = [p.y for p in self.coordinates if p.x > child.xy.x]
-                    if coord and max(coord) >= node.xy.y:
-                        height = max(coord) + 1
+                    max_y = self.coordinates.max_y(right_of=child.xy.x)
+                    if max_y is not None and max_y >= node.xy.y:
+                        height = max_y + 1
 
                 while True:
                     if self.set_node_ypos(child, height):
@@ -523,6 +696,7 @@ class EdgeLayoutManager(object):
                 yield edge
 
     def run(self):
+        grid = NodeGrid(self.nodes)
         for edge in self.edges:
             _dir = edge.direction
 
@@ -531,74 +705,64 @@ class EdgeLayoutManager(object):
                     r = range(edge.node1.xy.x + 1, edge.node2.xy.x)
                     for x in r:
                         xy = (x, edge.node1.xy.y)
-                        nodes = [x for x in self.nodes if x.xy == xy]
-                        if len(nodes) > 0:
+                        if xy in grid:
                             edge.skipped = 1
                 elif _dir == 'right-up':
                     r = range(edge.node1.xy.x + 1, edge.node2.xy.x)
                     for x in r:
                         xy = (x, edge.node1.xy.y)
-                        nodes = [x for x in self.nodes if x.xy == xy]
-                        if len(nodes) > 0:
+                        if xy in grid:
                             edge.skipped = 1
                 elif _dir == 'right-down':
                     if self.diagram.edge_layout == 'flowchart':
                         r = range(edge.node1.xy.y, edge.node2.xy.y)
                         for y in r:
                             xy = (edge.node1.xy.x, y + 1)
-                            nodes = [x for x in self.nodes if x.xy == xy]
-                            if len(nodes) > 0:
+                            if xy in grid:
                                 edge.skipped = 1
 
                     r = range(edge.node1.xy.x + 1, edge.node2.xy.x)
                     for x in r:
                         xy = (x, edge.node2.xy.y)
-                        nodes = [x for x in self.nodes if x.xy == xy]
-                        if len(nodes) > 0:
+                        if xy in grid:
                             edge.skipped = 1
                 elif _dir in ('left-down', 'down'):
                     r = range(edge.node1.xy.y + 1, edge.node2.xy.y)
                     for y in r:
                         xy = (edge.node1.xy.x, y)
-                        nodes = [x for x in self.nodes if x.xy == xy]
-                        if len(nodes) > 0:
+                        if xy in grid:
                             edge.skipped = 1
                 elif _dir == 'up':
                     r = range(edge.node2.xy.y + 1, edge.node1.xy.y)
                     for y in r:
                         xy = (edge.node1.xy.x, y)
-                        nodes = [x for x in self.nodes if x.xy == xy]
-                        if len(nodes) > 0:
+                        if xy in grid:
                             edge.skipped = 1
             else:
                 if _dir == 'right':
                     r = range(edge.node1.xy.x + 1, edge.node2.xy.x)
                     for x in r:
                         xy = (x, edge.node1.xy.y)
-                        nodes = [x for x in self.nodes if x.xy == xy]
-                        if len(nodes) > 0:
+                        if xy in grid:
                             edge.skipped = 1
                 elif _dir in ('left-down', 'down'):
                     r = range(edge.node1.xy.y + 1, edge.node2.xy.y)
                     for y in r:
                         xy = (edge.node1.xy.x, y)
-                        nodes = [x for x in self.nodes if x.xy == xy]
-                        if len(nodes) > 0:
+                        if xy in grid:
                             edge.skipped = 1
                 elif _dir == 'right-down':
                     if self.diagram.edge_layout == 'flowchart':
                         r = range(edge.node1.xy.x, edge.node2.xy.x)
                         for x in r:
                             xy = (x + 1, edge.node1.xy.y)
-                            nodes = [x for x in self.nodes if x.xy == xy]
-                            if len(nodes) > 0:
+                            if xy in grid:
                                 edge.skipped = 1
 
                     r = range(edge.node1.xy.y + 1, edge.node2.xy.y)
                     for y in r:
                         xy = (edge.node2.xy.x, y)
-                        nodes = [x for x in self.nodes if x.xy == xy]
-                        if len(nodes) > 0:
+                        if xy in grid:
                             edge.skipped = 1
 
 
@@ -422,6 +422,36 @@ class DiagramEdge(Base):
 
         return edges
 
+    @classmethod
+    def find_by_levels(cls, min_level=0):
+        """ Same as find_by_level() for all levels from min_level at once:
+            {level: edges} """
+        def ancestors(node):
+            # node or its nearest ancestor belonging to a group of each level
+            ret = {}
+            while node.group is not None:
+                ret.setdefault(node.group.level, node)
+                node = node.group
+
+            return ret
+
+        edges = {}
+        for e in cls.find_all():
+            ancestors1 = ancestors(e.node1)
+            ancestors2 = ancestors(e.node2)
+            level1 = e.node1.group.level
+            level2 = e.node2.group.level
+            for level in range(min_level, max(level1, level2) + 1):
+                edge = e.duplicate()
+                if level1 >= level:
+                    edge.node1 = ancestors1[level]
+                if level2 >= level:
+                    edge.node2 = ancestors2[level]
+
+                edges.setdefault(level, []).append(edge)
+
+        return edges
+
     @classmethod
     def clear(cls):
         super(DiagramEdge, cls).clear()
@@ -20,13 +20,13 @@ import re
 from functools import partial, wraps
 from itertools import tee
 
-from PIL import Image, ImageDraw, ImageFilter, ImageFont
+from PIL import Image, ImageDraw, ImageFilter
 
 from blockdiag.imagedraw import base
-from blockdiag.imagedraw.utils import memoize
 from blockdiag.imagedraw.utils.ellipse import dots as ellipse_dots
+from blockdiag.imagedraw.utils.textmetrics import metrics
 from blockdiag.utils import XY, Box, Size, images
-from blockdiag.utils.fontmap import FontMap, parse_fontpath
+from blockdiag.utils.fontmap import FontMap
 from blockdiag.utils.myitertools import istep, stepslice
 
 
@@ -100,16 +100,7 @@ def style2cycle(style, thick):
 
 
 def ttfont_for(font):
-    if font.path:
-        path, index = parse_fontpath(font.path)
-        if index:
-            ttfont = ImageFont.truetype(path, font.size, index=index)
-        else:
-            ttfont = ImageFont.truetype(path, font.size)
-    else:
-        ttfont = None
-
-    return ttfont
+    return metrics.ttfont(font)
 
 
 class ImageDrawExBase(base.ImageDraw):
@@ -269,8 +260,10 @@ class ImageDrawExBase(base.ImageDraw):
         textfolder = super(ImageDrawExBase, self).textfolder
         return partial(textfolder, scale=self.scale_ratio)
 
-    @memoize
     def textlinesize(self, string, font):
+        return metrics.textsize(string, font, self.measure_textline)
+
+    def measure_textline(self, string, font):
         ttfont = ttfont_for(font)
         if ttfont is None:
             size = self.draw.textsize(string, font=None)
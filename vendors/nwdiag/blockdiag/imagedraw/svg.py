@@ -23,8 +23,8 @@ from blockdiag.imagedraw import base as _base
 from blockdiag.imagedraw.simplesvg import (a, defs, desc, ellipse, filter, g,
                                            image, path, pathdata, polygon,
                                            rect, svg, svgclass, text, title)
-from blockdiag.imagedraw.utils import memoize
 from blockdiag.imagedraw.utils.ellipse import endpoints as ellipse_endpoints
+from blockdiag.imagedraw.utils.textmetrics import metrics
 from blockdiag.utils import XY, Box, images, is_Pillow_available
 
 feGaussianBlur = svgclass('feGaussianBlur')
@@ -106,17 +106,18 @@ class SVGImageDrawElement(_base.ImageDraw):
                  stroke_width=thick, **drawing_params(kwargs))
         self.svg.addElement(r)
 
-    @memoize
     def textlinesize(self, string, font, **kwargs):
         if is_Pillow_available():
             if not hasattr(self, '_pil_drawer'):
                 from blockdiag.imagedraw import png
                 self._pil_drawer = png.ImageDrawEx(None)
 
-            return self._pil_drawer.textlinesize(string, font)
+            measure = self._pil_drawer.measure_textline
         else:
             from blockdiag.imagedraw.utils import textsize
-            return textsize(string, font)
+            measure = textsize
+
+        return metrics.textsize(string, font, measure)
 
     def text(self, point, string, font, **kwargs):
         fill = kwargs.get('fill')
@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+#  Copyright 2011 Takeshi KOMIYA
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+from collections import OrderedDict
+
+from blockdiag.utils.fontmap import parse_fontpath
+
+MAXSIZE = 8192
+MAXFONTS = 32
+
+
+class TextMetrics(object):
+    """ Sizes of text lines shared by all drawers, keyed on
+        (font path, index, size, string), with LRU eviction """
+    def __init__(self, maxsize=MAXSIZE, maxfonts=MAXFONTS):
+        self.maxsize = maxsize
+        self.maxfonts = maxfonts
+        self.sizes = OrderedDict()
+        self.ttfonts = OrderedDict()  # (path, index, size) -> FreeTypeFont
+        self.hits = 0
+        self.misses = 0
+
+    def fontkey(self, font):
+        path, index = parse_fontpath(font.path)
+        return (path, index, font.size)
+
+    def ttfont(self, font):
+        """ Shared FreeTypeFont of font (None if font has no path) """
+        key = self.fontkey(font)
+        path, index, size = key
+        if path is None:
+            return None
+
+        if key in self.ttfonts:
+            self.ttfonts.move_to_end(key)
+            return self.ttfonts[key]
+
+        from PIL import ImageFont
+        if index:
+            ttfont = ImageFont.truetype(path, size, index=index)
+        else:
+            ttfont = ImageFont.truetype(path, size)
+
+        self.ttfonts[key] = ttfont
+        if len(self.ttfonts) > self.maxfonts:
+            self.ttfonts.popitem(last=False)
+
+        return ttfont
+
+    def textsize(self, string, font, measure):
+        """ Size of string, measured by measure(string, font) on cache miss """
+        key = self.fontkey(font) + (string,)
+        if key in self.sizes:
+            self.hits += 1
+            self.sizes.move_to_end(key)
+            return self.sizes[key]
+
+        self.misses += 1
+        size = measure(string, font)
+        self.sizes[key] = size
+        if len(self.sizes) > self.maxsize:
+            self.sizes.popitem(last=False)
+
+        return size
+
+    def stats(self):
+        return dict(hits=self.hits, misses=self.misses,
+                    size=len(self.sizes), maxsize=self.maxsize,
+                    fonts=len(self.ttfonts))
+
+    def clear(self):
+        self.sizes.clear()
+        self.ttfonts.clear()
+        self.hits = 0
+        self.misses = 0
+
+
+metrics = TextMetrics()
@@ -13,6 +13,7 @@
 #  See the License for the specific language governing permissions and
 #  limitations under the License.
 
+from blockdiag import builder
 from blockdiag.tests.utils import BuilderTestCase
 
 
@@ -68,6 +69,27 @@ class TestBuilder(BuilderTestCase):
                                     'C': (1, 1), 'D': (2, 1),
                                     'Z': (0, 2)})
 
+    def test_circular_ref_to_every_node_diagram(self):
+        diagram = self.build('circular_ref_to_every_node.diag')
+        self.assertNodeXY(diagram, {'A': (1, 0), 'B': (0, 0),
+                                    'C': (1, 1), 'D': (2, 1),
+                                    'E': (0, 2), 'F': (0, 3),
+                                    'Z': (0, 4)})
+
+    def test_circular_ref_to_every_node_diagram_without_cycles(self):
+        # too many cycles to enumerate: one circular per component
+        limit = builder.MAX_CIRCULAR_SEARCH_STEPS
+        builder.MAX_CIRCULAR_SEARCH_STEPS = 0
+        try:
+            diagram = self.build('circular_ref_to_every_node.diag')
+        finally:
+            builder.MAX_CIRCULAR_SEARCH_STEPS = limit
+
+        self.assertNodeXY(diagram, {'A': (0, 0), 'B': (1, 2),
+                                    'C': (2, 0), 'D': (3, 0),
+                                    'E': (4, 1), 'F': (5, 0),
+                                    'Z': (0, 3)})
+
     def test_labeled_circular_ref_diagram(self):
         diagram = self.build('labeled_circular_ref.diag')
         self.assertNodeXY(diagram, {'A': (0, 0), 'B': (2, 0),
@@ -225,3 +225,16 @@ class TestBuilderGroup(BuilderTestCase):
         diagram = self.build('nested_group_orientation.diag')
         self.assertNodeXY(diagram, {'A': (0, 0), 'B': (0, 1),
                                     'C': (1, 0), 'Z': (0, 2)})
+
+    def test_find_edges_by_levels(self):
+        from blockdiag.elements import DiagramEdge
+
+        def endpoints(edges):
+            return [(e.node1.id, e.node2.id) for e in edges]
+
+        self.build('nested_groups_and_edges.diag')
+        edges = DiagramEdge.find_by_levels()
+        self.assertEqual([0, 1, 2], sorted(edges))
+        for level in edges:
+            self.assertEqual(endpoints(DiagramEdge.find_by_level(level)),
+                             endpoints(edges[level]))
@@ -13,10 +13,13 @@
 #  See the License for the specific language governing permissions and
 #  limitations under the License.
 
+import os
 import unittest
 
 from blockdiag.imagedraw.utils import (hankaku_len, is_zenkaku, string_width,
                                        textsize, zenkaku_len)
+from blockdiag.imagedraw.utils.textmetrics import TextMetrics
+from blockdiag.tests.utils import with_pil
 
 
 class TestUtils(unittest.TestCase):
@@ -68,3 +71,48 @@ class TestUtils(unittest.TestCase):
         # あいう
         font = FontInfo('serif', None, 18)
         self.assertEqual((54, 18), textsize("\u3042\u3044\u3046", font))
+
+    def test_text_metrics(self):
+        from blockdiag.utils.fontmap import FontInfo
+        metrics = TextMetrics(maxsize=2)
+        measured = []
+
+        def measure(string, font):
+            measured.append(string)
+            return textsize(string, font)
+
+        font = FontInfo('serif', None, 11)
+        self.assertEqual((19, 11), metrics.textsize("abc", font, measure))
+        self.assertEqual((19, 11), metrics.textsize("abc", font, measure))
+        self.assertEqual(["abc"], measured)
+
+        # same path and size: measured once whatever the family
+        other = FontInfo('sansserif-bold', None, 11)
+        self.assertEqual((19, 11), metrics.textsize("abc", other, measure))
+        self.assertEqual(["abc"], measured)
+
+        # the least recently used size is evicted
+        metrics.textsize("abc", FontInfo('serif', None, 24), measure)
+        metrics.textsize("de", font, measure)
+        metrics.textsize("abc", font, measure)
+        self.assertEqual(["abc", "abc", "de", "abc"], measured)
+        self.assertEqual(dict(hits=2, misses=4, size=2, maxsize=2, fonts=0),
+                         metrics.stats())
+
+        metrics.clear()
+        self.assertEqual(0, metrics.stats()['size'])
+
+    @with_pil
+    def test_text_metrics_ttfont(self):
+        from blockdiag.utils.fontmap import FontInfo
+        path = os.path.join(os.path.dirname(__file__),
+                            'VLGothic', 'VL-Gothic-Regular.ttf')
+        metrics = TextMetrics(maxfonts=1)
+
+        self.assertEqual(None, metrics.ttfont(FontInfo('serif', None, 11)))
+
+        ttfont = metrics.ttfont(FontInfo('serif', path, 11))
+        self.assertIs(ttfont, metrics.ttfont(FontInfo('sansserif', path, 11)))
+        self.assertIsNot(ttfont, metrics.ttfont(FontInfo('serif', path, 12)))
+        self.assertIsNot(ttfont, metrics.ttfont(FontInfo('serif', path, 11)))
+        self.assertEqual(1, metrics.stats()['fonts'])
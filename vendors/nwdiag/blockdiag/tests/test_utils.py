@@ -15,7 +15,7 @@
 
 import unittest
 
-from blockdiag.utils import Size, unquote
+from blockdiag.utils import XY, NodeGrid, Occupancy, Size, unquote
 
 
 class TestUtils(unittest.TestCase):
@@ -53,3 +53,45 @@ class TestUtils(unittest.TestCase):
         self.assertEqual('test', unquote("'test'"))
         self.assertEqual("'half quoted", unquote("'half quoted"))
         self.assertEqual('"half quoted', unquote('"half quoted'))
+
+    def test_occupancy(self):
+        occupancy = Occupancy()
+        self.assertEqual(None, occupancy.max_y())
+
+        for xy in [XY(0, 0), XY(0, 3), XY(2, 1), XY(2, 1), XY(5, 2)]:
+            occupancy.add(xy)
+
+        self.assertEqual(4, len(occupancy))
+        self.assertIn(XY(0, 3), occupancy)
+        self.assertIn((2, 1), occupancy)
+        self.assertNotIn(XY(1, 1), occupancy)
+        self.assertEqual(3, occupancy.max_y())
+        self.assertEqual(3, occupancy.max_y(right_of=-1))
+        self.assertEqual(2, occupancy.max_y(right_of=0))
+        self.assertEqual(2, occupancy.max_y(right_of=2))
+        self.assertEqual(None, occupancy.max_y(right_of=5))
+
+    def test_node_grid(self):
+        class Node(object):
+            def __init__(self, x, y, colwidth=1, colheight=1):
+                self.xy = XY(x, y)
+                self.colwidth = colwidth
+                self.colheight = colheight
+
+        node1 = Node(0, 0, colwidth=2)
+        node2 = Node(2, 1, colheight=2)
+        node3 = Node(2, 1)
+
+        grid = NodeGrid([node1, node2, node3])
+        self.assertEqual(2, len(grid))
+        self.assertIn(XY(0, 0), grid)
+        self.assertIn((2, 1), grid)
+        self.assertNotIn((1, 0), grid)
+        self.assertEqual([node2, node3], grid[(2, 1)])
+        self.assertEqual([], grid[(2, 2)])
+
+        grid = NodeGrid([node1, node2], span=True)
+        self.assertEqual(4, len(grid))
+        self.assertEqual([node1], grid[(1, 0)])
+        self.assertEqual([node2], grid[(2, 2)])
+        self.assertNotIn((0, 1), grid)
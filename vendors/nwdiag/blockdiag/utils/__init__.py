@@ -17,6 +17,7 @@ from __future__ import division
 
 import math
 import re
+from bisect import bisect_right, insort
 
 
 class XY(tuple):
@@ -167,6 +168,78 @@ class Box(list):
         return Box(*[int(i) for i in self])
 
 
+class Occupancy(object):
+    """ Set of occupied cells, with the highest y of each column """
+    def __init__(self):
+        self.cells = set()
+        self.columns = []  # occupied x, sorted
+        self.heights = {}  # x -> highest occupied y
+
+    def __contains__(self, xy):
+        return xy in self.cells
+
+    def __iter__(self):
+        return iter(self.cells)
+
+    def __len__(self):
+        return len(self.cells)
+
+    def add(self, xy):
+        if xy in self.cells:
+            return
+
+        self.cells.add(xy)
+        x, y = xy
+        if x not in self.heights:
+            insort(self.columns, x)
+            self.heights[x] = y
+        elif self.heights[x] < y:
+            self.heights[x] = y
+
+    def max_y(self, right_of=None):
+        """ Highest occupied y (of the columns right of given x), or None """
+        if right_of is None:
+            columns = self.columns
+        else:
+            columns = self.columns[bisect_right(self.columns, right_of):]
+
+        if columns:
+            return max(self.heights[x] for x in columns)
+        else:
+            return None
+
+
+class NodeGrid(object):
+    """ Nodes indexed by the cell of their top-left corner
+        (or by all the cells they cover if span is True) """
+    def __init__(self, nodes=(), span=False):
+        self.span = span
+        self.cells = {}  # xy -> nodes
+
+        for node in nodes:
+            self.add(node)
+
+    def __contains__(self, xy):
+        return xy in self.cells
+
+    def __getitem__(self, xy):
+        return self.cells.get(xy, [])
+
+    def __len__(self):
+        return len(self.cells)
+
+    def add(self, node):
+        if self.span:
+            xy = node.xy
+            cells = [XY(x, y) for x in range(xy.x, xy.x + node.colwidth)
+                     for y in range(xy.y, xy.y + node.colheight)]
+        else:
+            cells = [node.xy]
+
+        for xy in cells:
+            self.cells.setdefault(xy, []).append(node)
+
+
 def unquote(string):
     """ Remove quotas from string """
     if string:
@@ -13,9 +13,7 @@
 #  See the License for the specific language governing permissions and
 #  limitations under the License.
 
-from collections import defaultdict
-
-from blockdiag.utils import XY, unquote
+from blockdiag.utils import XY, NodeGrid, unquote
 
 from rackdiag import parser
 from rackdiag.elements import Diagram, Rack, RackItem
@@ -76,7 +74,7 @@ class DiagramLayoutManager:
         self.diagram.fixiate()
 
     def layout_rack(self, rack):
-        usage = defaultdict(bool)
+        usage = NodeGrid(span=True)
 
         for item in rack.nodes:
             item.xy = XY(-1, -1)
@@ -89,12 +87,11 @@ class DiagramLayoutManager:
 
             for x in range(255):
                 r = range(y, y + item.colheight)
-                if len([_ for _ in r if usage[(x, _)]]) == 0:
+                if not any((x, _) in usage for _ in r):
                     break
 
             item.xy = XY(x, y)
-            for dy in range(y, y + item.colheight):
-                usage[(x, dy)] = 1
+            usage.add(item)
             self.validate_rack(rack, item)
 
     def validate_rack(self, rack, item):